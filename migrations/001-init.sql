@@ -24,7 +24,7 @@ CREATE TABLE "code_resets" (
   "id" SERIAL PRIMARY KEY,
   "code" varchar,
   "created_at" timestamp DEFAULT NOW(),
-  "updated_at" timestamp DEFAULT NOW(),
+  "updated_at" timestamp DEFAULT NOW()
 );
 
 CREATE TABLE "comments" (
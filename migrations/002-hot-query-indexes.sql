@@ -0,0 +1,27 @@
+-- indexes for the hot listing, search and refresh queries
+
+-- GET /api/tours keyset pagination over active, non deleted tours
+CREATE INDEX IF NOT EXISTS "ix_tours_active_created"
+  ON "tours" ("created_at" DESC, "id" DESC)
+  WHERE "deleted_at" IS NULL AND "is_active";
+
+-- tour search index refresh (updated_at >= last seen)
+CREATE INDEX IF NOT EXISTS "ix_tours_updated_at" ON "tours" ("updated_at");
+
+-- destination pair lookups
+CREATE INDEX IF NOT EXISTS "ix_tours_route"
+  ON "tours" ("from_destination", "to_destination")
+  WHERE "deleted_at" IS NULL AND "is_active";
+
+-- GET /api/comments, with and without ?user_id
+CREATE INDEX IF NOT EXISTS "ix_comments_created"
+  ON "comments" ("created_at" DESC, "id" DESC)
+  WHERE "deleted_at" IS NULL;
+
+CREATE INDEX IF NOT EXISTS "ix_comments_user_created"
+  ON "comments" ("user_id", "created_at" DESC, "id" DESC)
+  WHERE "deleted_at" IS NULL;
+
+-- payment history per user
+CREATE INDEX IF NOT EXISTS "ix_payments_user_date"
+  ON "payments" ("user_id", "payment_date" DESC);
@@ -0,0 +1,4 @@
+-- natural key for operator feeds, bulk imports upsert on it
+ALTER TABLE "tours" ADD COLUMN IF NOT EXISTS "code" varchar;
+
+CREATE UNIQUE INDEX IF NOT EXISTS "ux_tours_code" ON "tours" ("code");
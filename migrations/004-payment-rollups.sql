@@ -0,0 +1,55 @@
+-- payments can point at the tour they pay for
+ALTER TABLE "payments" ADD COLUMN IF NOT EXISTS "tour_id" INT REFERENCES tours(id);
+
+-- rollups maintained by the payments service in the same transaction as
+-- each payment, reports read these instead of scanning payments
+
+CREATE TABLE IF NOT EXISTS "payment_daily_totals" (
+  "day" date PRIMARY KEY,
+  "total" NUMERIC(14,2) NOT NULL DEFAULT 0,
+  "payment_count" integer NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS "payment_user_totals" (
+  "user_id" INT PRIMARY KEY REFERENCES users(id),
+  "total" NUMERIC(14,2) NOT NULL DEFAULT 0,
+  "payment_count" integer NOT NULL DEFAULT 0,
+  "last_payment_at" timestamptz
+);
+
+CREATE INDEX IF NOT EXISTS "ix_payment_user_totals_total"
+  ON "payment_user_totals" ("total" DESC);
+
+CREATE TABLE IF NOT EXISTS "payment_tour_daily_totals" (
+  "tour_id" INT REFERENCES tours(id),
+  "day" date,
+  "total" NUMERIC(14,2) NOT NULL DEFAULT 0,
+  "payment_count" integer NOT NULL DEFAULT 0,
+  PRIMARY KEY ("tour_id", "day")
+);
+
+-- backfill from the payments recorded so far. payment_date has no zone, the
+-- cast reads it back in the session zone it was written in, days are UTC
+-- like the ones the service computes
+INSERT INTO "payment_daily_totals" ("day", "total", "payment_count")
+SELECT ("payment_date"::timestamptz AT TIME ZONE 'UTC')::date, COALESCE(SUM("amount"), 0), COUNT(*)
+FROM "payments"
+WHERE "payment_date" IS NOT NULL
+GROUP BY 1
+ON CONFLICT DO NOTHING;
+
+INSERT INTO "payment_user_totals" ("user_id", "total", "payment_count", "last_payment_at")
+SELECT "user_id", COALESCE(SUM("amount"), 0), COUNT(*), MAX("payment_date")
+FROM "payments"
+WHERE "user_id" IS NOT NULL
+GROUP BY 1
+ON CONFLICT ("user_id") DO UPDATE SET "last_payment_at" = GREATEST(
+  "payment_user_totals"."last_payment_at", EXCLUDED."last_payment_at"
+);
+
+INSERT INTO "payment_tour_daily_totals" ("tour_id", "day", "total", "payment_count")
+SELECT "tour_id", ("payment_date"::timestamptz AT TIME ZONE 'UTC')::date, COALESCE(SUM("amount"), 0), COUNT(*)
+FROM "payments"
+WHERE "tour_id" IS NOT NULL AND "payment_date" IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT DO NOTHING;
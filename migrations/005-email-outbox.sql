@@ -0,0 +1,11 @@
+-- emails are written here in the same transaction as the user change and
+-- relayed to the mail queue by src/mail_outbox.py, rows are deleted once
+-- relayed so the table stays small and the relay scans the primary key
+
+CREATE TABLE IF NOT EXISTS "email_outbox" (
+  "id" BIGSERIAL PRIMARY KEY,
+  "recipients" jsonb NOT NULL,
+  "template_id" varchar NOT NULL,
+  "params" jsonb NOT NULL DEFAULT '{}',
+  "created_at" timestamptz DEFAULT (now())
+);
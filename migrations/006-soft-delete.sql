@@ -0,0 +1,33 @@
+-- soft delete: sessions filter deleted_at IS NULL on their own
+-- (src/db/soft_delete.py), src/db/archive.py moves rows deleted long ago
+-- into the *_archive tables
+
+-- archive candidates, only the deleted rows are indexed
+CREATE INDEX IF NOT EXISTS "ix_comments_deleted_at"
+  ON "comments" ("deleted_at") WHERE "deleted_at" IS NOT NULL;
+CREATE INDEX IF NOT EXISTS "ix_tours_deleted_at"
+  ON "tours" ("deleted_at") WHERE "deleted_at" IS NOT NULL;
+CREATE INDEX IF NOT EXISTS "ix_users_deleted_at"
+  ON "users" ("deleted_at") WHERE "deleted_at" IS NOT NULL;
+CREATE INDEX IF NOT EXISTS "ix_roles_deleted_at"
+  ON "roles" ("deleted_at") WHERE "deleted_at" IS NOT NULL;
+
+-- foreign keys the archiver checks before moving a parent row
+CREATE INDEX IF NOT EXISTS "ix_comments_user_id" ON "comments" ("user_id");
+CREATE INDEX IF NOT EXISTS "ix_payments_tour_id" ON "payments" ("tour_id");
+
+-- same columns, no constraints besides the id, archived rows only grow
+CREATE TABLE IF NOT EXISTS "comments_archive" (LIKE "comments");
+CREATE TABLE IF NOT EXISTS "tours_archive" (LIKE "tours");
+CREATE TABLE IF NOT EXISTS "users_archive" (LIKE "users");
+CREATE TABLE IF NOT EXISTS "roles_archive" (LIKE "roles");
+
+ALTER TABLE "comments_archive" ADD COLUMN IF NOT EXISTS "archived_at" timestamptz DEFAULT (now());
+ALTER TABLE "tours_archive" ADD COLUMN IF NOT EXISTS "archived_at" timestamptz DEFAULT (now());
+ALTER TABLE "users_archive" ADD COLUMN IF NOT EXISTS "archived_at" timestamptz DEFAULT (now());
+ALTER TABLE "roles_archive" ADD COLUMN IF NOT EXISTS "archived_at" timestamptz DEFAULT (now());
+
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_comments_archive_id" ON "comments_archive" ("id");
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_tours_archive_id" ON "tours_archive" ("id");
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_users_archive_id" ON "users_archive" ("id");
+CREATE UNIQUE INDEX IF NOT EXISTS "ix_roles_archive_id" ON "roles_archive" ("id");
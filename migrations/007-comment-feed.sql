@@ -0,0 +1,19 @@
+-- comments belong to a tour and carry their author's name, so a page of
+-- comments is read without joining users
+
+ALTER TABLE "comments" ADD COLUMN IF NOT EXISTS "tour_id" INT REFERENCES tours(id);
+ALTER TABLE "comments" ADD COLUMN IF NOT EXISTS "author_name" varchar;
+
+UPDATE "comments" c
+SET "author_name" = u."full_name"
+FROM "users" u
+WHERE u."id" = c."user_id" AND c."author_name" IS NULL;
+
+-- GET /api/comments/tours/{id} past the pages kept in redis
+CREATE INDEX IF NOT EXISTS "ix_comments_tour_created"
+  ON "comments" ("tour_id", "created_at" DESC, "id" DESC)
+  WHERE "deleted_at" IS NULL;
+
+-- the archiver copies every comments column
+ALTER TABLE "comments_archive" ADD COLUMN IF NOT EXISTS "tour_id" INT;
+ALTER TABLE "comments_archive" ADD COLUMN IF NOT EXISTS "author_name" varchar;
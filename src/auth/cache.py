@@ -0,0 +1,74 @@
+import hashlib
+
+from src.cache import TTLCache
+from src.config import Config
+
+
+class TokenCache(TTLCache):
+    # verified jwt claims keyed by the sha256 of the raw token
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        self._keys_by_jti: dict[str, str] = {}
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get_claims(self, token: str) -> dict | None:
+        return self.get(self.token_key(token))
+
+    def set_claims(self, token: str, claims: dict) -> None:
+        expires_at = claims.get("exp")
+        if not expires_at:
+            return
+
+        key = self.token_key(token)
+        self.set(key, claims, float(expires_at))
+
+        if claims.get("jti"):
+            self._keys_by_jti[claims["jti"]] = key
+
+    def invalidate_jti(self, jti: str) -> None:
+        key = self._keys_by_jti.pop(jti, None)
+
+        if key is not None:
+            self.pop(key)
+
+    def set(self, key, value, expires_at: float) -> None:
+        super().set(key, value, expires_at)
+
+        # keep the jti index from outgrowing the cache after lru evictions
+        if len(self._keys_by_jti) > self.maxsize * 2:
+            self._keys_by_jti = {
+                jti: key for jti, key in self._keys_by_jti.items() if key in self._data
+            }
+
+    def clear(self) -> None:
+        super().clear()
+        self._keys_by_jti.clear()
+
+
+_token_cache = None
+_principal_cache = None
+
+
+def get_token_cache() -> TokenCache:
+    global _token_cache
+
+    if _token_cache is None:
+        _token_cache = TokenCache(maxsize=Config.TOKEN_CACHE_SIZE)
+
+    return _token_cache
+
+
+def get_principal_cache() -> TTLCache:
+    # authenticated users (UserPrincipal) by email. the short ttl bounds how
+    # long another worker can keep serving a user changed through update_user
+    # here.
+    global _principal_cache
+
+    if _principal_cache is None:
+        _principal_cache = TTLCache(maxsize=Config.PRINCIPAL_CACHE_SIZE)
+
+    return _principal_cache
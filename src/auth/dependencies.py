@@ -1,14 +1,15 @@
+import time
 from typing import Any, List
 
 from fastapi import Depends, Request
 from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
-from sqlmodel.ext.asyncio.session import AsyncSession
-
-from src.db.main import get_sesion
-from src.db.models import User
+from src.db.database import is_pinned, read_session
+from src.config import Config
 from src.db.redis import token_in_blocklist
 
+from .cache import get_principal_cache, get_token_cache
+from .schemas import UserPrincipal
 from .service import UserService
 from .utils import decode_token
 from src.errors import (
@@ -16,23 +17,25 @@ from src.errors import (
     RefreshTokenRequired,
     AccessTokenRequired,
     AccountNotVerified,
+    InsufficientPermission,
+    UserNotFound,
 )
 
 user_service = UserService()
 
 
 class TokenBearer(HTTPBearer):
-    def __init__(slef, auto_error=True):
+    def __init__(self, auto_error=True):
         super().__init__(auto_error=auto_error)
 
     async def __call__(self, request: Request) -> HTTPAuthorizationCredentials | None:
-        creds = await super.__call__(request)
+        creds = await super().__call__(request)
 
         token = creds.credentials
 
-        token_data = decode_token(token)
+        token_data = self.get_token_data(token)
 
-        if not self.token_valid(token):
+        if token_data is None:
             raise InvalidToken()
 
         if await token_in_blocklist(token_data["jti"]):
@@ -42,10 +45,20 @@ class TokenBearer(HTTPBearer):
 
         return token_data
 
-    def token_valid(self, token: str) -> bool:
-        token_data = decode_token(token)
+    def get_token_data(self, token: str) -> dict | None:
+        # signature is only verified on a cache miss
+        token_data = get_token_cache().get_claims(token)
+
+        if token_data is None:
+            token_data = decode_token(token)
+
+            if token_data is not None:
+                get_token_cache().set_claims(token, token_data)
 
-        return token_data is not None
+        return token_data
+
+    def token_valid(self, token: str) -> bool:
+        return self.get_token_data(token) is not None
 
     def verify_token_data(self, token_data):
 
@@ -60,20 +73,43 @@ class AccessTokenBearer(TokenBearer):
 
 class RefreshTokenBearer(TokenBearer):
     def verify_token_data(self, token_data: dict) -> None:
-        if token_data and token_data["refresh"]:
-            raise RefreshTokenBearer()
+        if token_data and not token_data["refresh"]:
+            raise RefreshTokenRequired()
 
 
 async def get_current_user(
     token_details: dict = Depends(AccessTokenBearer()),
-    session: AsyncSession = Depends(get_sesion),
-):
+) -> UserPrincipal:
     user_email = token_details["user"]["email"]
 
-    user = await user_service.get_user_by_email(user_email, session)
+    principal = get_principal_cache().get(user_email)
+    if principal is not None:
+        return principal
+
+    # a user that just changed is read from the primary, everyone else from
+    # a replica
+    async with read_session(primary=is_pinned(user_email)) as session:
+        principal = await user_service.get_principal(user_email, session)
+
+    if principal is None:
+        raise UserNotFound()
+
+    get_principal_cache().set(
+        user_email, principal, time.time() + Config.PRINCIPAL_CACHE_TTL_SECONDS
+    )
 
-    return user
+    return principal
 
 
 class RoleChecker:
-    pass
+    def __init__(self, allowed_roles: List[str]) -> None:
+        self.allowed_roles = allowed_roles
+
+    def __call__(self, current_user: UserPrincipal = Depends(get_current_user)) -> Any:
+        if not current_user.is_verified:
+            raise AccountNotVerified()
+
+        if current_user.role in self.allowed_roles:
+            return True
+
+        raise InsufficientPermission()
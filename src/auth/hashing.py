@@ -0,0 +1,99 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config import Config
+from src.errors import HashingPoolBusy
+from src.metrics import PASSWORD_HASH_PENDING, PASSWORD_HASH_SECONDS
+from src.profiling import traced
+
+from .utils import generate_hash_password, verify_password
+
+
+class HashMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avg_ms": (self.total_seconds / self.calls * 1000) if self.calls else 0.0,
+            "max_ms": self.max_seconds * 1000,
+        }
+
+
+class PasswordHasher:
+    # runs pbkdf2 in worker processes so the event loop never does the hashing
+
+    def __init__(self, pool_size: int, queue_limit: int):
+        self.pool_size = pool_size
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.metrics = {"hash": HashMetrics(), "verify": HashMetrics()}
+        self._executor: ProcessPoolExecutor | None = None
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, name: str, func, *args):
+        if self.pending >= self.queue_limit:
+            self.metrics[name].rejected += 1
+            raise HashingPoolBusy()
+
+        self.start()
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            elapsed = time.perf_counter() - start
+            self.metrics[name].observe(elapsed)
+            PASSWORD_HASH_SECONDS.labels(operation=name).observe(elapsed)
+
+    @traced("hash_password")
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", generate_hash_password, password)
+
+    @traced("verify_password")
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "queue_limit": self.queue_limit,
+            "pending": self.pending,
+            **{name: metrics.snapshot() for name, metrics in self.metrics.items()},
+        }
+
+
+_password_hasher = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    global _password_hasher
+
+    if _password_hasher is None:
+        _password_hasher = PasswordHasher(
+            pool_size=Config.HASH_POOL_SIZE, queue_limit=Config.HASH_QUEUE_LIMIT
+        )
+        PASSWORD_HASH_PENDING.set_function(lambda: _password_hasher.pending)
+
+    return _password_hasher
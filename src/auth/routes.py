@@ -2,8 +2,6 @@ from datetime import timedelta, datetime
 
 
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
 from sqlalchemy.exc import NoResultFound
 
 from sqlmodel.ext.asyncio.session import AsyncSession
@@ -23,74 +21,77 @@ from .schemas import (
     PasswordResetRequestModel,
     PasswordResetConfirmModel,
 )
+from .cache import get_token_cache
+from .hashing import get_password_hasher
 from .utils import (
-    verify_password,
     create_access_token,
     decode_token,
     create_url_safe_token,
     decode_url_safe_token,
-    generate_hash_password,
 )
 
 from src.config import Config
-from src.celery_tasks import send_email
 from src.errors import UserAlreadyExists, UserNotFound, InvalidCredentials, InvalidToken
 
-from src.db.main import get_session
-from ..db import models, database
+from src.db.database import get_session
+from src.mail_outbox import add_email
+from src.rate_limit import login_rate_limit, password_reset_rate_limit
+from src.responses import ORJSONResponse
 from . import schemas, utils
 
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
-user_service = UserService
-# RoleChecker = RoleChecker()
+user_service = UserService()
+role_checker = RoleChecker(["admin", "user"])
 
 REFRESH_TOKEN_EXPIRY = 2
 
 
-@router.post("/send_email", response_model=schemas.EmailModelm)
-async def send_email(emails: schemas.EmailModel):
-    emails = emails.addresses
+def enqueue_email(
+    session: AsyncSession, recipients: list[str], template_id: str, params: dict
+):
+    # written to the outbox and committed with the rest of the request,
+    # src/mail_outbox.py hands it to the mail queue
+    add_email(session, recipients, template_id, params)
+
 
-    html = "<h1>Welcome to the app<h1>"
-    subject = "Welcome to the app"
+@router.post("/send_email")
+async def send_welcome_email(
+    emails: schemas.EmailModel, session: AsyncSession = Depends(get_session)
+):
+    emails = emails.addresses
 
-    send_email(emails, html, subject)
+    enqueue_email(session, emails, "welcome", {})
+    await session.commit()
 
     return {"message": "email sent sucessfully"}
 
 
-@router.post(
-    "/signup", response_model=schemas.UserCreate, status_code=status.HTTP_201_CREATED
-)
+@router.post("/signup", status_code=status.HTTP_201_CREATED)
 async def create_user_account(
-    user: schemas.UserCreate, db: Session = Depends(database.get_db)
+    user: schemas.UserCreate, session: AsyncSession = Depends(get_session)
 ):
     email = user.email
 
-    existing_user = (
-        db.query(models.User).filter(models.User.email == user.email).first()
+    # a deleted account still holds its email until it is archived
+    existing_user = await user_service.get_user_by_email(
+        email, session, include_deleted=True
     )
     if existing_user:
         raise UserAlreadyExists()
 
-    new_user = await user_service.create_user(user, Session)
-
-    token = create_url_safe_token({"email: email"})
+    token = create_url_safe_token({"email": email})
 
     link = f"http://{Config.DOMAIN}/api/v1/auth/verify/{token}"
 
-    html = f"""<h1>Verify Your email<h1>
-    <p> Please click this <a = href"{link}>link</a> to verify your email</p>
-    """
-    emails = [email]
-    subject = "Verify your email"
+    # committed together with the user by create_user
+    enqueue_email(session, [email], "verification", {"link": link})
 
-    send_email.delay(emails, subject, html)
+    new_user = await user_service.create_user(user, session)
 
     return {
         "message": "Account created check your email to verify it",
-        "user": new_user,
+        "user": schemas.UserResponse.model_validate(new_user),
     }
 
 
@@ -106,62 +107,69 @@ async def create_user_account(
 
 @router.post("/verify/{token}")
 async def verify_user_account(
-    token: str, Session: AsyncSession = Depends(database.get_db)
+    token: str, session: AsyncSession = Depends(get_session)
 ):
     token_data = decode_url_safe_token(token)
 
     user_email = token_data.get("email")
     if user_email:
-        user = await user_service.get_user_by_email(user_email, Session)
+        user = await user_service.get_user_by_email(user_email, session)
 
         if not user:
             raise UserNotFound()
-        await user_service.update_user(user, {"is_verified": True}, Session)
+        await user_service.update_user(user, {"is_verified": True}, session)
 
-        return JSONResponse(
+        return ORJSONResponse(
             content={"message": "Account verified sucessfully"},
             status_code=status.HTTP_200_OK,
         )
 
-    return JSONResponse(
+    return ORJSONResponse(
         content={"message": "Error occured during verification"},
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
     )
 
 
-@router.post("/login", response_model=schemas.UserLoginModel)
+@router.post(
+    "/login",
+    response_model=schemas.UserLoginModel,
+    dependencies=[Depends(login_rate_limit)],
+)
 async def log(
-    login_data: schemas.UserLoginModel, session: AsyncSession = Depends(database.get_db)
+    login_data: schemas.UserLoginModel, session: AsyncSession = Depends(get_session)
 ):
     email = login_data.email
     password = login_data.password
 
-    user = await user_service.get_user_by_email(email, Session)
+    user = await user_service.get_user_by_email(email, session)
     if user is not None:
-        password_valid = verify_password(password, user.password_hash)
+        password_valid = await get_password_hasher().verify(
+            password, user.password_hash
+        )
 
         if password_valid:
             access_token = create_access_token(
                 user_data={
-                    "user": user.email,
-                    "user_uid": str(user.uid),
+                    "email": user.email,
+                    "user_uid": str(user.id),
                     # "role": user.role
                 }
             )
             refresh_token = create_access_token(
-                user_data={"email": user.email, "user_uid": str(user.uid)},
+                user_data={"email": user.email, "user_uid": str(user.id)},
                 refresh=True,
                 expiry=timedelta(days=REFRESH_TOKEN_EXPIRY),
             )
-            return JSONResponse(
+            return ORJSONResponse(
                 content={
                     "message": "Login was sucessful",
                     "acess_token": access_token,
                     "refresh_token": refresh_token,
-                    "user": {"email": user.email, "uid": str(user.uid)},
+                    "user": {"email": user.email, "uid": str(user.id)},
                 }
             )
 
+    await login_rate_limit.record_failure(email)
     raise InvalidCredentials()
 
 
@@ -172,25 +180,35 @@ async def get_new_access_token(token_details: dict = Depends(RefreshTokenBearer(
     if datetime.fromtimestamp(expiry_timestamp) > datetime.now():
         new_access_token = create_access_token(user_data=token_details["user"])
 
-        return JSONResponse(content={"access_token": new_access_token})
+        return ORJSONResponse(content={"access_token": new_access_token})
 
     return InvalidToken
 
 
+@router.get("/me", response_model=schemas.UserResponse)
+async def get_me(user=Depends(get_current_user), _: bool = Depends(role_checker)):
+    return user
+
+
 @router.get("/logout")
 async def revoke_token(token_details: dict = Depends(AccessTokenBearer())):
     jti = token_details["jti"]
 
     await add_jti_to_blocklist(jti)
+    get_token_cache().invalidate_jti(jti)
 
-    return JSONResponse(
+    return ORJSONResponse(
         content={"message": "Loged out sucessfully"}, status_code=status.HTTP_200_OK
     )
 
 
-@router.post("/password-reset-request", response_model=schemas.UserResponse)
-def password_reset_request(
-    email_data: PasswordResetConfirmModel, db: Session = Depends(database.get_db)
+@router.post(
+    "/password-reset-request",
+    response_model=schemas.UserResponse,
+    dependencies=[Depends(password_reset_rate_limit)],
+)
+async def password_reset_request(
+    email_data: PasswordResetRequestModel, session: AsyncSession = Depends(get_session)
 ):
     email = email_data.email
 
@@ -198,15 +216,9 @@ def password_reset_request(
 
     link = f"http://{Config.DOMAIN}/api/v1/auth/password-reset-confirm/{token}"
 
-    html_message = """
-    <h1>Reset your Password<h1>
-    <p>Please click thi <a href = "{link}">link</a> to reset your password<p>
-    """
-
-    subject = "reset your password"
-
-    send_email.delay([email], subject, html_message)
-    return JSONResponse(
+    enqueue_email(session, [email], "password_reset", {"link": link})
+    await session.commit()
+    return ORJSONResponse(
         content={
             "message": "please check your email for further instructions to reset your password"
         },
@@ -218,7 +230,7 @@ def password_reset_request(
 async def reset_account_password(
     token: str,
     passwords: PasswordResetConfirmModel,
-    Session: AsyncSession = Depends(database.get_db),
+    session: AsyncSession = Depends(get_session),
 ):
     new_password = passwords.new_password
     confirm_password = passwords.new_password
@@ -232,21 +244,21 @@ async def reset_account_password(
     user_email = token_data.get("email")
 
     if user_email:
-        user = await user_service.get_user_by_email(user_email, Session)
+        user = await user_service.get_user_by_email(user_email, session)
 
         if not user:
             raise UserNotFound()
 
-        password_hash = generate_hash_password(new_password)
+        password_hash = await get_password_hasher().hash(new_password)
 
-        await user_service.update_user(user, {"password_hash": password_hash}, Session)
+        await user_service.update_user(user, {"password_hash": password_hash}, session)
 
-        return JSONResponse(
+        return ORJSONResponse(
             content={"message": "Password reset sucessfully"},
             status_code=status.HTTP_200_OK,
         )
 
-    return JSONResponse(
+    return ORJSONResponse(
         content={"message": "Error ocured during password reset"},
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
     )
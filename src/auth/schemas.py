@@ -11,7 +11,7 @@ class UserCreate(BaseModel):
 
 
 class UserResponse(BaseModel):
-    uid: uuid
+    id: int
     full_name: str
     email: EmailStr
     is_verified: bool
@@ -20,18 +20,29 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class UserPrincipal(BaseModel):
+    id: int
+    email: str
+    full_name: str
+    is_verified: bool
+    role: str | None = None
+
+    class Config:
+        frozen = True
+
+
 class EmailModel(BaseModel):
     addresses: List[str]
 
 
 class UserModel(BaseModel):
-    uid: uuid
+    uid: uuid.UUID
     full_name: str
     email: EmailStr
     is_verified: bool
     password_hash: str = Field(exclude=True)
-    created_at: datetime
-    updated_at: datetime
+    created_at: datetime.datetime
+    updated_at: datetime.datetime
 
 
 class UserLoginModel(BaseModel):
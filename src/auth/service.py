@@ -1,27 +1,59 @@
+from sqlalchemy.orm import joinedload
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.db.models import User
+from src.db.database import pin_to_primary
+from src.db.models import Role, User
+from src.db.soft_delete import include_deleted as with_deleted
+from src.profiling import traced
 
-from .schemas import UserCreate
-from .utils import generate_hash_password
+from .schemas import UserCreate, UserPrincipal
+from .cache import get_principal_cache
+from .hashing import get_password_hasher
 
 
 class UserService:
-    async def get_user_by_email(self, email: str, session: AsyncSession):
+    @traced("user_service.get_user_by_email")
+    async def get_user_by_email(
+        self, email: str, session: AsyncSession, include_deleted: bool = False
+    ):
         statement = select(User).where(User.email == email)
+        if include_deleted:
+            statement = with_deleted(statement)
         result = await session.exec(statement)
         user = result.first()
 
         return user
 
+    @traced("user_service.get_principal")
+    async def get_principal(self, email: str, session: AsyncSession):
+        # role joined into the same query, role checks never lazy load it
+        statement = (
+            select(User).options(joinedload(User.role)).where(User.email == email)
+        )
+        result = await session.exec(statement)
+        user = result.first()
+
+        if user is None:
+            return None
+
+        return UserPrincipal(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_verified=user.is_verified,
+            role=user.role.role if user.role else None,
+        )
+
+    @traced("user_service.create_user")
     async def create_user(self, user_data: UserCreate, session: AsyncSession):
         user_data_dict = user_data.model_dump()
+        password = user_data_dict.pop("password")
 
         new_user = User(**user_data_dict)
 
-        new_user.password_hash = generate_hash_password(user_data_dict["password"])
-        new_user.role = "user"
+        new_user.password_hash = await get_password_hasher().hash(password)
+        new_user.role = await self.get_role("user", session)
 
         session.add(new_user)
 
@@ -29,11 +61,25 @@ class UserService:
 
         return new_user
 
+    async def get_role(self, role: str, session: AsyncSession):
+        result = await session.exec(select(Role).where(Role.role == role))
+        existing_role = result.first()
+
+        if existing_role is None:
+            existing_role = Role(role=role)
+            session.add(existing_role)
+
+        return existing_role
+
+    @traced("user_service.update_user")
     async def update_user(self, user: User, user_data: dict, session: AsyncSession):
 
         for k, v in user_data.items():
             setattr(user, k, v)
 
         await session.commit()
+        # replicas may lag, read this user back from the primary for a while
+        pin_to_primary(user.email)
+        get_principal_cache().pop(user.email)
 
         return user
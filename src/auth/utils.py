@@ -1,23 +1,37 @@
-from passlib.context import CryptContext
 import jwt
 import uuid
 import logging
-from datetime import timedelta, datetime
-from itsdangerous import URLSafeTimedSearializer
+from datetime import timedelta, datetime, timezone
+from itsdangerous import URLSafeTimedSerializer
 from src.config import Config
+from src.profiling import traced
 
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+_pwd_context = None
+
+ACCESS_TOKEN_EXPIRY = 3600
+
+
+def get_pwd_context():
+    # passlib is only imported by the processes that actually hash
+    global _pwd_context
+
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+    return _pwd_context
 
 
 def generate_hash_password(password: str) -> str:
-    hash = pwd_context.hash(password)
+    hash = get_pwd_context().hash(password)
 
     return hash
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def create_access_token(
@@ -26,19 +40,20 @@ def create_access_token(
     payload = {}
 
     payload["user"] = user_data
-    payload["exp"] = datetime.now() + (
+    payload["exp"] = datetime.now(timezone.utc) + (
         expiry if expiry is not None else timedelta(seconds=ACCESS_TOKEN_EXPIRY)
     )
     payload["jti"] = str(uuid.uuid4())
     payload["refresh"] = refresh
 
-    token = jwt.decode(
+    token = jwt.encode(
         payload=payload, key=Config.JWT_SECRET, algorithm=Config.JWT_ALGORITHM
     )
 
     return token
 
 
+@traced("decode_token")
 def decode_token(token: str) -> dict:
     try:
         token_data = jwt.decode(
@@ -50,20 +65,29 @@ def decode_token(token: str) -> dict:
         return None
 
 
-serializer = URLSafeTimedSearializer(
-    secret_key=Config.JWT_SECRET, salt="email-configuration"
-)
+_serializer = None
+
+
+def get_serializer() -> URLSafeTimedSerializer:
+    global _serializer
+
+    if _serializer is None:
+        _serializer = URLSafeTimedSerializer(
+            secret_key=Config.JWT_SECRET, salt="email-configuration"
+        )
+
+    return _serializer
 
 
 def create_url_safe_token(data: dict):
-    token = serializer.dumps(data)
+    token = get_serializer().dumps(data)
 
     return token
 
 
 def decode_url_safe_token(token: str):
     try:
-        token_data = serializer.loads(token)
+        token_data = get_serializer().loads(token)
 
         return token_data
     except Exception as e:
@@ -1,14 +1,15 @@
 from celery import Celery
-from src.mail import mail, create_message
-from asgiref.sync import async_to_sync
+from src.mail_worker import queue_email
+from src.config import celery_config
 
 c_app = Celery()
-
-c_app.config_from_object("src.config")
+# a callable is only evaluated once celery first reads its configuration
+c_app.add_defaults(celery_config)
 
 
+# the app itself writes mail through the outbox, the task stays for
+# producers outside it that still send by task name
 @c_app.task()
 def send_email(recipients: list[str], subject: str, body: str):
-    message = create_message(recipients=recipients, subject=subject, body=body)
-    async_to_sync(mail.send_message)(message)
-    print("email sent")
+    # delivery happens in batches in src/mail_worker.py over pooled smtp connections
+    queue_email(recipients=recipients, subject=subject, body=body)
@@ -0,0 +1,408 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from redis.exceptions import RedisError
+from sqlmodel import select
+
+from src.config import Config
+from src.db import database
+from src.db import redis as redis_module
+from src.db.models import Comment, Tour
+from src.db.pagination import encode_cursor
+from src.errors import TourNotFound
+from src.metrics import (
+    COMMENT_FEED_READS,
+    COMMENT_WRITE_BATCH_SIZE,
+    REDIS_COMMAND_SECONDS,
+    timed,
+)
+
+from .schemas import CommentModel
+from .service import CommentService
+
+KEY_PREFIX = "comments:tour:"
+
+# the newest comments are a sorted set scored by created_at in microseconds.
+# equal scores are ordered by member, and members start with the zero padded
+# id, so the set is in the same (created_at, id) order as the keyset pages
+# whatever order the pushes arrive in.
+ID_WIDTH = 20
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# a new comment bumps the tour's generation and, if the set is loaded, is
+# added to it. a fill that already read the row from the database has put
+# it there, with the same score, so only members at that score are checked
+# for the id prefix.
+#   KEYS: newest, ready, generation
+#   ARGV: member, size, ttl, member id prefix, score
+PUSH_SCRIPT = """
+redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+if redis.call('EXISTS', KEYS[2]) == 0 then
+  return 0
+end
+local prefix = ARGV[4]
+for _, item in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[5], ARGV[5])) do
+  if string.sub(item, 1, #prefix) == prefix then
+    return 0
+  end
+end
+redis.call('ZADD', KEYS[1], ARGV[5], ARGV[1])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -tonumber(ARGV[2]) - 1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+
+# replaces the set with rows read from the database, unless a comment was
+# written since the generation was read. KEYS as above
+# ARGV: generation seen before the read, ttl, then score and member pairs
+FILL_SCRIPT = """
+local generation = redis.call('GET', KEYS[3]) or ''
+if generation ~= ARGV[1] then
+  return 0
+end
+redis.call('DEL', KEYS[1])
+for i = 3, #ARGV, 2 do
+  redis.call('ZADD', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('SET', KEYS[2], '1', 'EX', ARGV[2])
+if #ARGV > 2 then
+  redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+comment_service = CommentService()
+
+
+def feed_keys(tour_id: int) -> list[str]:
+    prefix = f"{KEY_PREFIX}{tour_id}"
+    return [f"{prefix}:newest", f"{prefix}:ready", f"{prefix}:generation"]
+
+
+def feed_score(created_at: datetime) -> int:
+    # sqlite hands back naive utc timestamps
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return (created_at - EPOCH) // timedelta(microseconds=1)
+
+
+def feed_member_prefix(comment_id: int) -> bytes:
+    return b"%0*d:" % (ID_WIDTH, comment_id)
+
+
+def feed_entry(comment: CommentModel) -> tuple[int, bytes]:
+    member = feed_member_prefix(comment.id) + comment.model_dump_json().encode()
+    return feed_score(comment.created_at), member
+
+
+def page_key(tour_id: int, limit: int, cursor: str) -> str:
+    return f"{KEY_PREFIX}{tour_id}:page:{limit}:{cursor}"
+
+
+def page_body(items: list[bytes], next_cursor: str | None) -> bytes:
+    # items are already serialized, only the envelope is built here
+    return b"".join(
+        [
+            b'{"results":[',
+            b",".join(items),
+            b'],"next_cursor":',
+            orjson.dumps(next_cursor),
+            b"}",
+        ]
+    )
+
+
+class CommentFeed:
+    # the newest `size` comments of each tour live in a redis sorted set, so the
+    # first page never touches postgres. older pages are cached as they are
+    # read: a keyset page only holds comments older than its cursor, new
+    # comments never change it and it just expires.
+
+    def __init__(self, size: int, ttl: int, page_ttl: int):
+        self.size = size
+        self.ttl = ttl
+        self.page_ttl = page_ttl
+        self._scripts = {}
+
+    def script(self, source: str):
+        client = redis_module.get_redis()
+        script = self._scripts.get(source)
+        if script is None or script.registered_client is not client:
+            script = self._scripts[source] = client.register_script(source)
+        return script
+
+    async def push(self, comment: CommentModel) -> None:
+        score, member = feed_entry(comment)
+        await redis_module.get_command_batcher().run_script(
+            self.script(PUSH_SCRIPT),
+            keys=feed_keys(comment.tour_id),
+            args=[
+                member,
+                self.size,
+                self.ttl,
+                feed_member_prefix(comment.id),
+                score,
+            ],
+        )
+
+    async def newest(self, tour_id: int, limit: int) -> list[bytes] | None:
+        # None when the set is not loaded
+        batcher = redis_module.get_command_batcher()
+        newest, ready, _ = feed_keys(tour_id)
+        members, loaded = await asyncio.gather(
+            batcher.call("ZREVRANGE", newest, 0, limit),
+            batcher.call("EXISTS", ready),
+        )
+
+        if not loaded:
+            return None
+
+        return [member[ID_WIDTH + 1 :] for member in members]
+
+    async def fill(self, tour_id: int, limit: int) -> list[bytes]:
+        batcher = redis_module.get_command_batcher()
+        generation = await batcher.call("GET", feed_keys(tour_id)[2])
+
+        # from the primary, a lagging replica would seed a set missing
+        # comments whose generation bump it has already seen
+        async with database.read_session(primary=True) as session:
+            comments, _ = await comment_service.get_comments_page(
+                self.size, None, session, tour_id=tour_id
+            )
+        entries = [
+            feed_entry(CommentModel.model_validate(comment)) for comment in comments
+        ]
+
+        await batcher.run_script(
+            self.script(FILL_SCRIPT),
+            keys=feed_keys(tour_id),
+            args=[
+                generation or b"",
+                self.ttl,
+                *(arg for entry in entries for arg in entry),
+            ],
+        )
+
+        return [member[ID_WIDTH + 1 :] for _, member in entries[: limit + 1]]
+
+    async def first_page(self, tour_id: int, limit: int) -> bytes:
+        with timed(REDIS_COMMAND_SECONDS, command="comment_feed"):
+            items = await self.newest(tour_id, limit)
+        source = "redis"
+
+        if items is None:
+            items = await self.fill(tour_id, limit)
+            source = "database"
+
+        COMMENT_FEED_READS.labels(source=source).inc()
+
+        # limit + 1 items were asked for, the extra one means there is more.
+        # limit is below the set size, so a smaller set holds every comment
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(CommentModel.model_validate_json(items[-1]))
+
+        return page_body(items, next_cursor)
+
+    async def older_page(self, tour_id: int, limit: int, cursor: str) -> bytes:
+        batcher = redis_module.get_command_batcher()
+        key = page_key(tour_id, limit, cursor)
+
+        body = await batcher.call("GET", key)
+        if body is not None:
+            COMMENT_FEED_READS.labels(source="page_cache").inc()
+            return body
+
+        async with database.read_session() as session:
+            comments, next_cursor = await comment_service.get_comments_page(
+                limit, cursor, session, tour_id=tour_id
+            )
+        body = page_body(
+            [
+                CommentModel.model_validate(comment).model_dump_json().encode()
+                for comment in comments
+            ],
+            next_cursor,
+        )
+        COMMENT_FEED_READS.labels(source="database").inc()
+
+        await batcher.call("SET", key, body, "EX", self.page_ttl)
+
+        return body
+
+    async def page(self, tour_id: int, limit: int, cursor: str | None) -> bytes:
+        try:
+            if cursor is None:
+                return await self.first_page(tour_id, limit)
+            return await self.older_page(tour_id, limit, cursor)
+        except RedisError as e:
+            logging.warning("comment feed cache unavailable: %s", e)
+
+        async with database.read_session() as session:
+            comments, next_cursor = await comment_service.get_comments_page(
+                limit, cursor, session, tour_id=tour_id
+            )
+        COMMENT_FEED_READS.labels(source="database").inc()
+
+        return page_body(
+            [
+                CommentModel.model_validate(comment).model_dump_json().encode()
+                for comment in comments
+            ],
+            next_cursor,
+        )
+
+
+class CommentWriter:
+    # posts are queued and written by one task per worker. whatever queued up
+    # while a transaction was in flight goes into the next one together, each
+    # request still waits for its own row and gets its id back.
+
+    def __init__(self, feed: CommentFeed, batch_size: int, maxsize: int):
+        self.feed = feed
+        self.batch_size = batch_size
+        self.maxsize = maxsize
+        self.queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    async def submit(self, comment: Comment) -> CommentModel:
+        future = asyncio.get_running_loop().create_future()
+        # a full queue makes the request wait, that is the backpressure
+        await self.queue.put((comment, future))
+
+        return await future
+
+    def take_batch(self, first) -> list:
+        batch = [first]
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        # None is the stop marker
+        return [entry for entry in batch if entry is not None]
+
+    async def insert(self, batch: list) -> list:
+        async with database.async_session_maker() as session:
+            tour_ids = {comment.tour_id for comment, _ in batch}
+            # deleted tours are filtered out by the session
+            statement = select(Tour.id).where(Tour.id.in_(tour_ids))
+            live = set((await session.exec(statement)).all())
+
+            written = []
+            for comment, future in batch:
+                if comment.tour_id in live:
+                    session.add(comment)
+                    written.append((comment, future))
+                elif not future.done():
+                    future.set_exception(TourNotFound())
+
+            await session.commit()
+
+        return written
+
+    async def write(self, batch: list) -> None:
+        COMMENT_WRITE_BATCH_SIZE.observe(len(batch))
+
+        try:
+            written = await self.insert(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                raise
+            # one bad row fails the whole transaction, so each is tried on its
+            # own and only the request that sent it gets the error
+            logging.warning("comment batch of %s failed, retrying: %s", len(batch), e)
+            written = []
+            for comment, future in batch:
+                if future.done():
+                    continue
+                try:
+                    written += await self.insert([(comment, future)])
+                except Exception as error:
+                    future.set_exception(error)
+
+        models = [CommentModel.model_validate(comment) for comment, _ in written]
+        results = await asyncio.gather(
+            *(self.feed.push(model) for model in models), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                # the set catches up when it expires
+                logging.warning("comment feed push failed: %s", result)
+
+        for model, (_, future) in zip(models, written):
+            if not future.done():
+                future.set_result(model)
+
+    async def _run(self) -> None:
+        while True:
+            batch = self.take_batch(await self.queue.get())
+            try:
+                if batch:
+                    await self.write(batch)
+            except Exception as e:
+                logging.warning("comment batch of %s failed: %s", len(batch), e)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            if self._stopping and self.queue.empty():
+                return
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self.queue = asyncio.Queue(self.maxsize)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # not cancelled, comments queued at shutdown are written before the
+        # pool closes
+        if self._task is not None:
+            self._stopping = True
+            await self.queue.put(None)
+            await self._task
+            self._task = None
+
+
+_comment_feed = None
+_comment_writer = None
+
+
+def get_comment_feed() -> CommentFeed:
+    global _comment_feed
+
+    if _comment_feed is None:
+        _comment_feed = CommentFeed(
+            size=Config.COMMENT_FEED_SIZE,
+            ttl=Config.COMMENT_FEED_TTL_SECONDS,
+            page_ttl=Config.COMMENT_PAGE_CACHE_TTL_SECONDS,
+        )
+
+    return _comment_feed
+
+
+def get_comment_writer() -> CommentWriter:
+    global _comment_writer
+
+    if _comment_writer is None:
+        _comment_writer = CommentWriter(
+            get_comment_feed(),
+            batch_size=Config.COMMENT_WRITE_BATCH_SIZE,
+            maxsize=Config.COMMENT_WRITE_QUEUE_SIZE,
+        )
+
+    return _comment_writer
+
+
+def new_comment(user_id: int, author_name: str, tour_id: int, message: str) -> Comment:
+    # created_at set here so the feed entry matches the row without a refresh
+    return Comment(
+        user_id=user_id,
+        author_name=author_name,
+        tour_id=tour_id,
+        message=message,
+        created_at=datetime.now(timezone.utc),
+    )
@@ -0,0 +1,67 @@
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import Response, StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.dependencies import RoleChecker, get_current_user
+from src.auth.schemas import UserPrincipal
+from src.db import database
+from src.db.database import get_read_session
+
+from .feed import get_comment_feed, get_comment_writer, new_comment
+from .schemas import CommentCreateModel, CommentListResponse, CommentModel
+from .service import CommentService
+
+router = APIRouter(prefix="/api/comments", tags=["Comments"])
+comment_service = CommentService()
+role_checker = RoleChecker(["admin", "user"])
+
+
+@router.get("", response_model=CommentListResponse)
+async def list_comments(
+    user_id: int | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    session: AsyncSession = Depends(get_read_session),
+):
+    comments, next_cursor = await comment_service.get_comments_page(
+        limit, cursor, session, user_id=user_id
+    )
+
+    return {"results": comments, "next_cursor": next_cursor}
+
+
+@router.get("/export")
+async def export_comments(user_id: int | None = None):
+    async def rows():
+        # own session, the response outlives the request dependencies
+        async with database.read_session() as session:
+            async for comment in comment_service.stream_comments(session, user_id):
+                yield CommentModel.model_validate(comment).model_dump_json() + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@router.get("/tours/{tour_id}", response_model=CommentListResponse)
+async def list_tour_comments(
+    tour_id: int,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+):
+    body = await get_comment_feed().page(tour_id, limit, cursor)
+
+    return Response(content=body, media_type="application/json")
+
+
+@router.post(
+    "/tours/{tour_id}", response_model=CommentModel, status_code=status.HTTP_201_CREATED
+)
+async def create_tour_comment(
+    tour_id: int,
+    comment_data: CommentCreateModel,
+    user: UserPrincipal = Depends(get_current_user),
+    _: bool = Depends(role_checker),
+):
+    # the author's name comes from the cached principal, no user query
+    comment = new_comment(user.id, user.full_name, tour_id, comment_data.message)
+
+    return await get_comment_writer().submit(comment)
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class CommentModel(BaseModel):
+    id: int
+    user_id: int
+    tour_id: int | None = None
+    author_name: str | None = None
+    message: str | None = None
+    created_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class CommentListResponse(BaseModel):
+    results: List[CommentModel]
+    next_cursor: str | None = None
+
+
+class CommentCreateModel(BaseModel):
+    message: str = Field(min_length=1, max_length=2000)
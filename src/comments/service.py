@@ -0,0 +1,36 @@
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.models import Comment
+from src.db.pagination import paginate, stream_rows
+
+
+class CommentService:
+    def _statement(self, user_id: int | None, tour_id: int | None = None):
+        statement = select(Comment)
+
+        if user_id is not None:
+            statement = statement.where(Comment.user_id == user_id)
+        if tour_id is not None:
+            statement = statement.where(Comment.tour_id == tour_id)
+
+        return statement
+
+    async def get_comments_page(
+        self,
+        limit: int,
+        cursor: str | None,
+        session: AsyncSession,
+        user_id: int | None = None,
+        tour_id: int | None = None,
+    ):
+        return await paginate(
+            session,
+            Comment,
+            self._statement(user_id, tour_id),
+            limit=limit,
+            cursor=cursor,
+        )
+
+    def stream_comments(self, session: AsyncSession, user_id: int | None = None):
+        return stream_rows(session, Comment, self._statement(user_id))
@@ -1,11 +1,73 @@
+from functools import lru_cache
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_ECHO: bool = False
+    # comma separated, empty means every read goes to the primary
+    DATABASE_REPLICA_URLS: str = ""
+    DB_REPLICA_HEALTH_INTERVAL: int = 10
+    DB_REPLICA_HEALTH_TIMEOUT: float = 2.0
+    # reads of a user who just changed go to the primary for this long, in
+    # the worker that served the change. tour cache fills do the same after
+    # any tour change, in every worker
+    DB_PRIMARY_PIN_SECONDS: int = 5
+    DB_PRIMARY_PIN_SIZE: int = 10000
     JWT_SECRET: str
     JWT_ALGORITHM: str
+    HASH_POOL_SIZE: int = 4
+    HASH_QUEUE_LIMIT: int = 64
+    TOKEN_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    TOUR_INDEX_REFRESH_SECONDS: int = 30
+    # overlap each refresh re-reads, covers transactions committing late
+    TOUR_INDEX_LOOKBACK_SECONDS: int = 60
+    # full rebuild for anything slower than the lookback, 0 turns it off
+    TOUR_INDEX_RELOAD_SECONDS: int = 3600
+    TOUR_CACHE_TTL_SECONDS: int = 300
+    TOUR_CACHE_L1_TTL_SECONDS: int = 5
+    TOUR_CACHE_L1_SIZE: int = 1000
+    TOUR_IMPORT_BATCH_SIZE: int = 5000
+    # newest comments per tour kept in redis, must cover the largest page
+    COMMENT_FEED_SIZE: int = 200
+    COMMENT_FEED_TTL_SECONDS: int = 600
+    COMMENT_PAGE_CACHE_TTL_SECONDS: int = 300
+    COMMENT_WRITE_BATCH_SIZE: int = 100
+    COMMENT_WRITE_QUEUE_SIZE: int = 10000
+    # soft deleted rows older than this move to the *_archive tables
+    ARCHIVE_AFTER_DAYS: int = 30
+    ARCHIVE_BATCH_SIZE: int = 1000
+    ARCHIVE_INTERVAL_SECONDS: int = 3600
     REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0
+    REDIS_SOCKET_TIMEOUT: float = 2.0
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    REDIS_RETRY_ATTEMPTS: int = 2
+    # connection failures in a row before calls fail fast, and for how long
+    REDIS_BREAKER_THRESHOLD: int = 5
+    REDIS_BREAKER_RESET_SECONDS: float = 10.0
+    REDIS_BATCH_MAX: int = 256
+    BLOCKLIST_RESYNC_SECONDS: int = 300
+    # (attempts, window seconds) per client ip and per email
+    RATE_LIMIT_ENABLED: bool = True
+    LOGIN_IP_LIMIT: int = 30
+    LOGIN_IP_WINDOW: int = 60
+    LOGIN_EMAIL_LIMIT: int = 5
+    LOGIN_EMAIL_WINDOW: int = 300
+    PASSWORD_RESET_IP_LIMIT: int = 10
+    PASSWORD_RESET_IP_WINDOW: int = 3600
+    PASSWORD_RESET_EMAIL_LIMIT: int = 3
+    PASSWORD_RESET_EMAIL_WINDOW: int = 3600
     MAIL_USERNAME: str
     MAIL_PASSWORD: str
     MAIL_FROM: str
@@ -16,12 +78,70 @@ class Settings(BaseSettings):
     MAIL_SSL_TLS: bool = False
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
+    MAIL_POOL_SIZE: int = 2
+    MAIL_BATCH_SIZE: int = 50
+    MAIL_FLUSH_INTERVAL: float = 1.0
+    MAIL_MAX_RETRIES: int = 3
+    MAIL_RETRY_BACKOFF: float = 0.5
+    # a worker that stops renewing its lease for this long is presumed dead and
+    # the emails it had taken go back to the queue
+    MAIL_LEASE_SECONDS: int = 60
+    OUTBOX_BATCH_SIZE: int = 200
+    OUTBOX_POLL_INTERVAL: float = 0.5
     DOMAIN: str
+    ACCESS_LOG_SAMPLE_RATE: float = 0.1
+    ACCESS_LOG_SLOW_MS: float = 500
+    PROFILING_ENABLED: bool = False
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_ADMIN_TOKEN: str | None = None
+    PROFILE_MODE: str = "sample"
+    PROFILE_INTERVAL: float = 0.001
+    PROFILE_DIR: str = "profiles"
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
-Config = Settings()
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+class LazySettings:
+    # .env is parsed on first attribute access, not when this module is imported
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+
+Config = LazySettings()
+
+
+def redis_options() -> dict:
+    # shared by the app pool, the mail worker and celery's broker and backend
+    settings = get_settings()
+
+    return {
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+        "socket_keepalive": True,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+        "retry_on_timeout": True,
+    }
+
+
+def celery_config() -> dict:
+    settings = get_settings()
+    options = redis_options()
 
-broker_url = Config.REDIS_URL
-result_backend = Config.REDIS_URL
-broker_connection_retry_on_startup = True
+    return {
+        "broker_url": settings.REDIS_URL,
+        "result_backend": settings.REDIS_URL,
+        "broker_connection_retry_on_startup": True,
+        "broker_pool_limit": options["max_connections"],
+        "broker_transport_options": options,
+        "redis_max_connections": options["max_connections"],
+        "redis_socket_timeout": options["socket_timeout"],
+        "redis_socket_connect_timeout": options["socket_connect_timeout"],
+        "redis_socket_keepalive": options["socket_keepalive"],
+        "redis_backend_health_check_interval": options["health_check_interval"],
+        "redis_retry_on_timeout": options["retry_on_timeout"],
+    }
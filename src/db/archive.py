@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, exists, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import Config
+
+from . import database
+from .models import ARCHIVE_TABLES, Base
+from .soft_delete import include_deleted
+
+logger = logging.getLogger("samanid.archive")
+
+
+def still_referenced(table) -> list:
+    # rows some foreign key still points at stay where they are,
+    # a tour with payments is never archived
+    return [
+        exists().where(fk.parent == fk.column)
+        for other in Base.metadata.sorted_tables
+        for fk in other.foreign_keys
+        if fk.column.table is table
+    ]
+
+
+class Archiver:
+    # moves rows soft deleted more than `after_days` ago into the archive
+    # tables, one batch per transaction. SKIP LOCKED lets every worker run it.
+
+    def __init__(self, after_days: int, batch_size: int, interval: int):
+        self.after_days = after_days
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+
+    async def archive_batch(
+        self, session: AsyncSession, table, archive, cutoff: datetime
+    ) -> int:
+        candidates = (
+            select(table.c.id)
+            .where(
+                table.c.deleted_at < cutoff,
+                *(~clause for clause in still_referenced(table)),
+            )
+            .order_by(table.c.deleted_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        ids = (await session.exec(include_deleted(candidates))).all()
+        if not ids:
+            return 0
+
+        columns = [column.name for column in table.columns]
+        await session.exec(
+            insert(archive).from_select(
+                columns, select(*table.c).where(table.c.id.in_(ids))
+            )
+        )
+        await session.exec(delete(table).where(table.c.id.in_(ids)))
+        await session.commit()
+
+        return len(ids)
+
+    async def run_once(self) -> dict[str, int]:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.after_days)
+        moved = {}
+
+        for name, archive in ARCHIVE_TABLES.items():
+            table = Base.metadata.tables[name]
+            moved[name] = 0
+
+            while True:
+                async with database.async_session_maker() as session:
+                    count = await self.archive_batch(session, table, archive, cutoff)
+                moved[name] += count
+
+                if count < self.batch_size:
+                    break
+
+        if any(moved.values()):
+            logger.info("archived %s", json.dumps(moved))
+
+        return moved
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                # e.g. a child row appeared mid batch, the next run retries
+                logger.warning("archiving failed: %s", e)
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_archiver = None
+
+
+def get_archiver() -> Archiver:
+    global _archiver
+
+    if _archiver is None:
+        _archiver = Archiver(
+            after_days=Config.ARCHIVE_AFTER_DAYS,
+            batch_size=Config.ARCHIVE_BATCH_SIZE,
+            interval=Config.ARCHIVE_INTERVAL_SECONDS,
+        )
+
+    return _archiver
+
+
+async def main(after_days: int) -> None:
+    database.init_engine()
+    try:
+        archiver = get_archiver()
+        archiver.after_days = after_days
+        print(json.dumps(await archiver.run_once()))
+    finally:
+        await database.dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="archive long deleted rows")
+    parser.add_argument("--after-days", type=int, default=Config.ARCHIVE_AFTER_DAYS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args.after_days))
@@ -1,22 +1,69 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from .import models, database
+
+from . import database
+from .archive import get_archiver
+from .database import get_session
+from .redis import close_redis, get_local_blocklist, open_redis
+from ..auth.hashing import get_password_hasher
 from ..auth.routes import router as auth_router
-from src.config import Config 
-from sqlmodel import SQLModel
+from ..comments.feed import get_comment_writer
+from ..comments.routers import router as comments_router
+from ..config import Config
+from ..errors import register_all_errors
+from ..mail_templates import load_templates
+from ..metrics import router as metrics_router
+from ..middleware import get_access_log, register_middleware
+from ..payments.routers import router as payments_router
+from ..profiling import register_profiling
+from ..tours.index import tour_index
+from ..tours.routers import router as tours_router
+
 
-from typing import AsyncGenerator
-from sqlalchemy.exc.asyncio import AsyncSession, create_async_engine, async_sessionmaker 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_access_log().start()
+    database.init_engine()
+    await database.replicas.check()
+    database.replicas.start()
+    load_templates()
+    get_password_hasher().start()
+    await open_redis()
+    get_local_blocklist().start()
 
+    await tour_index.reload()
+    tour_index.start(
+        Config.TOUR_INDEX_REFRESH_SECONDS,
+        Config.TOUR_INDEX_LOOKBACK_SECONDS,
+        Config.TOUR_INDEX_RELOAD_SECONDS,
+    )
+    get_archiver().start()
+    get_comment_writer().start()
 
+    yield
 
-models.Base.metadata.create_all(bind=database.engine)
+    await get_comment_writer().stop()
+    await get_archiver().stop()
+    await tour_index.stop()
+    await get_local_blocklist().stop()
+    await close_redis()
+    get_password_hasher().shutdown()
+    await database.dispose_engine()
+    get_access_log().stop()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+register_all_errors(app)
+register_middleware(app)
+register_profiling(app)
 app.include_router(auth_router)
+app.include_router(tours_router)
+app.include_router(comments_router)
+app.include_router(payments_router)
+app.include_router(metrics_router)
+
 
 @app.get("/")
 def root():
-    return {"message":"API is working"}
-
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
-    async_session = async_sessionmaker()
\ No newline at end of file
+    return {"message": "API is working"}
@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+import asyncpg
+
+from src.config import Config
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
+MIGRATION_RE = re.compile(r"^(\d+)-([\w-]+)\.sql$")
+
+# any constant works, it only has to be the same for every runner
+ADVISORY_LOCK_ID = 7_311_402
+
+VERSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    checksum VARCHAR NOT NULL,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+)
+"""
+
+# 001-init.sql was run by hand before this runner existed, a database that
+# already has its tables gets it recorded instead of run again
+BASELINE_VERSION = 1
+BASELINE_TABLE = "users"
+
+# synthetic rows for check, so the planner sees production-like row
+# counts instead of empty tables; rolled back afterwards. check only runs
+# against an empty scratch database, never production
+SEED_SQL = """
+INSERT INTO roles (role) VALUES ('user');
+INSERT INTO users (role_id, email, password_hash)
+  SELECT currval('roles_id_seq'), 'seed' || g || '@example.com', 'x'
+  FROM generate_series(1, 1000) g;
+INSERT INTO tours (from_destination, to_destination, price, is_active,
+                   created_at, updated_at, deleted_at)
+  SELECT 'city' || g % 40, 'city' || g % 37, g % 500, g % 10 <> 0,
+         NOW() - g * INTERVAL '1 minute', NOW() - g * INTERVAL '1 minute',
+         CASE WHEN g % 50 = 0 THEN NOW() END
+  FROM generate_series(1, 50000) g;
+INSERT INTO comments (user_id, tour_id, message, created_at, deleted_at)
+  SELECT u.id, (SELECT MIN(id) FROM tours) + g % 1000, 'seed',
+         NOW() - g * INTERVAL '1 minute', CASE WHEN g % 20 = 0 THEN NOW() END
+  FROM generate_series(1, 50000) g
+  JOIN users u ON u.email = 'seed' || (g % 1000 + 1) || '@example.com';
+INSERT INTO payments (user_id, amount, payment_date)
+  SELECT u.id, g % 500, NOW() - g * INTERVAL '1 minute'
+  FROM generate_series(1, 50000) g
+  JOIN users u ON u.email = 'seed' || (g % 1000 + 1) || '@example.com';
+ANALYZE roles, users, comments, tours, payments;
+"""
+
+# hot queries and the index each one is expected to use
+HOT_QUERIES = {
+    "tour_listing": (
+        "SELECT id FROM tours WHERE deleted_at IS NULL AND is_active "
+        "AND (created_at, id) < (NOW(), 2147483647) "
+        "ORDER BY created_at DESC, id DESC LIMIT 21",
+        "ix_tours_active_created",
+    ),
+    "tour_index_refresh": (
+        "SELECT id FROM tours WHERE updated_at >= NOW() - INTERVAL '1 minute' "
+        "ORDER BY updated_at",
+        "ix_tours_updated_at",
+    ),
+    "tour_route": (
+        "SELECT id FROM tours WHERE deleted_at IS NULL AND is_active "
+        "AND from_destination = 'city1' AND to_destination = 'city2'",
+        "ix_tours_route",
+    ),
+    "comment_listing": (
+        "SELECT id FROM comments WHERE deleted_at IS NULL "
+        "AND (created_at, id) < (NOW(), 2147483647) "
+        "ORDER BY created_at DESC, id DESC LIMIT 21",
+        "ix_comments_created",
+    ),
+    "comment_listing_by_user": (
+        "SELECT id FROM comments WHERE deleted_at IS NULL "
+        "AND user_id = (SELECT MIN(id) FROM users) "
+        "ORDER BY created_at DESC, id DESC LIMIT 21",
+        "ix_comments_user_created",
+    ),
+    "comment_feed_by_tour": (
+        "SELECT id FROM comments WHERE deleted_at IS NULL "
+        "AND tour_id = (SELECT MIN(id) FROM tours) "
+        "AND (created_at, id) < (NOW(), 2147483647) "
+        "ORDER BY created_at DESC, id DESC LIMIT 21",
+        "ix_comments_tour_created",
+    ),
+    "payment_listing_by_user": (
+        "SELECT id FROM payments WHERE user_id = (SELECT MIN(id) FROM users) "
+        "ORDER BY payment_date DESC LIMIT 20",
+        "ix_payments_user_date",
+    ),
+}
+
+
+class Migration:
+    def __init__(self, path: Path):
+        match = MIGRATION_RE.match(path.name)
+        self.path = path
+        self.version = int(match.group(1))
+        self.name = match.group(2)
+        self.sql = path.read_text()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+
+
+def get_dsn(url: str) -> str:
+    # asyncpg wants the plain libpq style url
+    return re.sub(r"^postgres(ql)?\+\w+://", "postgresql://", url)
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    migrations = [
+        Migration(path)
+        for path in directory.glob("*.sql")
+        if MIGRATION_RE.match(path.name)
+    ]
+    migrations.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("duplicate migration version numbers")
+
+    return migrations
+
+
+async def applied_migrations(conn: asyncpg.Connection) -> dict[int, str]:
+    await conn.execute(VERSION_TABLE_SQL)
+    rows = await conn.fetch("SELECT version, checksum FROM schema_migrations")
+
+    return {row["version"]: row["checksum"] for row in rows}
+
+
+async def record(conn: asyncpg.Connection, migration: Migration) -> None:
+    await conn.execute(
+        "INSERT INTO schema_migrations (version, name, checksum) "
+        "VALUES ($1, $2, $3)",
+        migration.version,
+        migration.name,
+        migration.checksum,
+    )
+
+
+async def stamp(
+    conn: asyncpg.Connection, version: int, directory: Path = MIGRATIONS_DIR
+) -> list[int]:
+    # marks migrations up to version as applied without running them
+    stamped = []
+
+    await conn.execute("SELECT pg_advisory_lock($1)", ADVISORY_LOCK_ID)
+    try:
+        applied = await applied_migrations(conn)
+
+        async with conn.transaction():
+            for migration in load_migrations(directory):
+                if migration.version > version or migration.version in applied:
+                    continue
+                await record(conn, migration)
+                stamped.append(migration.version)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", ADVISORY_LOCK_ID)
+
+    return stamped
+
+
+async def upgrade(
+    conn: asyncpg.Connection, directory: Path = MIGRATIONS_DIR
+) -> list[int]:
+    applied_now = []
+
+    # one runner at a time, e.g. when several deploys start together
+    await conn.execute("SELECT pg_advisory_lock($1)", ADVISORY_LOCK_ID)
+    try:
+        applied = await applied_migrations(conn)
+
+        migrations = load_migrations(directory)
+        if not applied and await conn.fetchval(
+            "SELECT to_regclass($1) IS NOT NULL", BASELINE_TABLE
+        ):
+            for migration in migrations:
+                if migration.version <= BASELINE_VERSION:
+                    await record(conn, migration)
+                    applied[migration.version] = migration.checksum
+                    print(f"recorded existing {migration.path.name}")
+
+        for migration in migrations:
+            if migration.version in applied:
+                if applied[migration.version] != migration.checksum:
+                    print(
+                        f"warning: {migration.path.name} changed since it was applied",
+                        file=sys.stderr,
+                    )
+                continue
+
+            async with conn.transaction():
+                await conn.execute(migration.sql)
+                await record(conn, migration)
+
+            applied_now.append(migration.version)
+            print(f"applied {migration.path.name}")
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", ADVISORY_LOCK_ID)
+
+    return applied_now
+
+
+async def status(
+    conn: asyncpg.Connection, directory: Path = MIGRATIONS_DIR
+) -> list[dict]:
+    applied = await applied_migrations(conn)
+
+    return [
+        {
+            "version": migration.version,
+            "name": migration.name,
+            "applied": migration.version in applied,
+            "changed": migration.version in applied
+            and applied[migration.version] != migration.checksum,
+        }
+        for migration in load_migrations(directory)
+    ]
+
+
+def plan_indexes(plan: dict) -> set[str]:
+    found = set()
+
+    if "Index Name" in plan:
+        found.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found |= plan_indexes(child)
+
+    return found
+
+
+async def check_indexes(conn: asyncpg.Connection) -> dict[str, dict]:
+    results = {}
+
+    # the seed is rolled back, but it still takes locks and bloats tables
+    if await conn.fetchval("SELECT EXISTS (SELECT 1 FROM users)"):
+        raise ValueError("check needs an empty scratch database")
+
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        await conn.execute(SEED_SQL)
+
+        for name, (query, index) in HOT_QUERIES.items():
+            raw = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {query}")
+            plan = json.loads(raw)[0]["Plan"]
+            used = plan_indexes(plan)
+            results[name] = {"index": index, "used": sorted(used), "ok": index in used}
+    finally:
+        await transaction.rollback()
+
+    return results
+
+
+async def main(command: str, url: str, version: int | None = None) -> int:
+    conn = await asyncpg.connect(get_dsn(url))
+    try:
+        if command == "upgrade":
+            await upgrade(conn)
+        elif command == "stamp":
+            for stamped in await stamp(conn, version):
+                print(f"recorded {stamped:03d} as applied")
+        elif command == "status":
+            for row in await status(conn):
+                marker = "x" if row["applied"] else " "
+                changed = " (changed since applied)" if row["changed"] else ""
+                print(f"[{marker}] {row['version']:03d} {row['name']}{changed}")
+        elif command == "check":
+            try:
+                results = await check_indexes(conn)
+            except ValueError as e:
+                print(f"error: {e}", file=sys.stderr)
+                return 1
+            for name, result in results.items():
+                state = "ok" if result["ok"] else "MISSING"
+                print(
+                    f"{state:8} {name}: expects {result['index']}, "
+                    f"plan uses {result['used']}"
+                )
+            if not all(result["ok"] for result in results.values()):
+                return 1
+    finally:
+        await conn.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="apply migrations/*.sql in order",
+        epilog="check seeds synthetic rows, point it at an empty scratch "
+        "database with --database-url, never at production",
+    )
+    parser.add_argument("command", choices=["upgrade", "stamp", "status", "check"])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument(
+        "--version", type=int, help="stamp: last migration already applied by hand"
+    )
+    args = parser.parse_args()
+
+    if args.command == "check" and args.database_url is None:
+        parser.error("check needs an explicit --database-url for a scratch database")
+    if args.command == "stamp" and args.version is None:
+        parser.error("stamp needs --version")
+
+    sys.exit(
+        asyncio.run(
+            main(args.command, args.database_url or Config.DATABASE_URL, args.version)
+        )
+    )
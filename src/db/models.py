@@ -1,7 +1,20 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, TIMESTAMP, Numeric
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Boolean,
+    Date,
+    ForeignKey,
+    TIMESTAMP,
+    Numeric,
+    BigInteger,
+    JSON,
+    Table,
+)
 from sqlalchemy.sql import func
 from .database import Base
-from sqlalchemy.dialects.postgresql import ENUM
+from .soft_delete import SoftDeletable
+from sqlalchemy.dialects.postgresql import ENUM, JSONB
 from sqlalchemy.orm import relationship
 import enum
 
@@ -11,7 +24,7 @@ class RoleEnum(str, enum.Enum):
     user = "user"
 
 
-class User(Base):
+class User(SoftDeletable, Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -22,20 +35,18 @@ class User(Base):
     password_hash = Column(String, nullable=False)
     is_verified = Column(Boolean, default=False)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    deleted_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
     role = relationship("Role", back_populates="users")
     comments = relationship("Comment", back_populates="user")
     payments = relationship("Payment", back_populates="user")
 
 
-class Role(Base):
+class Role(SoftDeletable, Base):
     __tablename__ = "roles"
 
     id = Column(Integer, primary_key=True, index=True)
     role = Column(ENUM("admin", "user", name="role_enum"), unique=True, nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    deleted_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
     users = relationship("User", back_populates="role")
 
@@ -49,22 +60,26 @@ class CodeReset(Base):
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
 
 
-class Comment(Base):
+class Comment(SoftDeletable, Base):
     __tablename__ = "comments"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    tour_id = Column(Integer, ForeignKey("tours.id"), nullable=True)
+    # author's name when the comment was written, lists never join users
+    author_name = Column(String, nullable=True)
     message = Column(String)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    deleted_at = Column(TIMESTAMP(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="comments")
 
 
-class Tour(Base):
+class Tour(SoftDeletable, Base):
     __tablename__ = "tours"
 
     id = Column(Integer, primary_key=True, index=True)
+    # operator supplied natural key, bulk imports upsert on it
+    code = Column(String, unique=True, nullable=True)
     from_destination = Column(String, nullable=False)
     to_destination = Column(String, nullable=False)
     price = Column(Numeric(10, 2))
@@ -73,8 +88,9 @@ class Tour(Base):
     tour_highlights = Column(String, nullable=False)
     description = Column(String, nullable=False)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
-    deleted_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    updated_at = Column(
+        TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
 
 
 class Payment(Base):
@@ -82,7 +98,70 @@ class Payment(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    tour_id = Column(Integer, ForeignKey("tours.id"), nullable=True)
     amount = Column(Numeric(10, 2))
     payment_date = Column(TIMESTAMP(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="payments")
+
+
+# rollups kept in step with payments by PaymentService, reports read only these
+
+
+class PaymentDailyTotal(Base):
+    __tablename__ = "payment_daily_totals"
+
+    day = Column(Date, primary_key=True)
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+    payment_count = Column(Integer, nullable=False, default=0)
+
+
+class PaymentUserTotal(Base):
+    __tablename__ = "payment_user_totals"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total = Column(Numeric(14, 2), nullable=False, default=0, index=True)
+    payment_count = Column(Integer, nullable=False, default=0)
+    last_payment_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+
+class PaymentTourDailyTotal(Base):
+    __tablename__ = "payment_tour_daily_totals"
+
+    tour_id = Column(Integer, ForeignKey("tours.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    total = Column(Numeric(14, 2), nullable=False, default=0)
+    payment_count = Column(Integer, nullable=False, default=0)
+
+
+class EmailOutbox(Base):
+    # written in the same transaction as the change the email is about,
+    # src/mail_outbox.py moves the rows to the mail queue and deletes them
+    __tablename__ = "email_outbox"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    recipients = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)
+    template_id = Column(String, nullable=False)
+    params = Column(JSON().with_variant(JSONB, "postgresql"), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+
+def archive_table(model) -> Table:
+    # same columns without constraints or defaults, rows are only appended
+    table = model.__table__
+
+    return Table(
+        f"{table.name}_archive",
+        Base.metadata,
+        *(
+            Column(column.name, column.type, primary_key=column.primary_key)
+            for column in table.columns
+        ),
+        Column("archived_at", TIMESTAMP(timezone=True), server_default=func.now()),
+    )
+
+
+# src/db/archive.py moves long deleted rows here, children before parents
+ARCHIVE_TABLES = {
+    model.__tablename__: archive_table(model) for model in (Comment, Tour, User, Role)
+}
@@ -0,0 +1,73 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import AsyncGenerator
+
+from sqlalchemy import tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.errors import InvalidCursor
+
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(row) -> str:
+    payload = json.dumps([row.created_at.isoformat(), row.id])
+
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidCursor()
+
+
+def keyset_statement(model, statement=None):
+    # newest first, (created_at, id) is the keyset so ties never repeat rows
+    if statement is None:
+        statement = select(model)
+
+    # deleted rows are left out by the session, see src/db/soft_delete.py
+    return statement.order_by(model.created_at.desc(), model.id.desc())
+
+
+async def paginate(
+    session: AsyncSession,
+    model,
+    statement=None,
+    limit: int = 20,
+    cursor: str | None = None,
+):
+    statement = keyset_statement(model, statement)
+
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        statement = statement.where(
+            tuple_(model.created_at, model.id) < tuple_(created_at, row_id)
+        )
+
+    # one extra row tells us whether there is a next page
+    result = await session.exec(statement.limit(limit + 1))
+    rows = result.all()
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+
+    return rows[:limit], next_cursor
+
+
+async def stream_rows(
+    session: AsyncSession, model, statement=None, batch_size: int = STREAM_BATCH_SIZE
+) -> AsyncGenerator:
+    statement = keyset_statement(model, statement).execution_options(
+        yield_per=batch_size
+    )
+
+    # server side cursor, only batch_size rows are held in memory at once
+    result = await session.stream_scalars(statement)
+    async for row in result:
+        yield row
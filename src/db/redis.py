@@ -1,15 +1,392 @@
-import redis.asyncio import aioredis 
-from src.config import Config
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any
 
-JTI_EXPIRY = 3600 
+import redis.asyncio as aioredis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialWithJitterBackoff
+from redis.exceptions import (
+    ConnectionError as RedisConnectionError,
+    NoScriptError,
+    RedisError,
+    TimeoutError as RedisTimeoutError,
+)
+from src.config import Config, redis_options
+from src.errors import RevocationCheckUnavailable
+from src.metrics import (
+    REDIS_BATCH_SIZE,
+    REDIS_CIRCUIT_OPEN,
+    REDIS_COMMAND_SECONDS,
+    timed,
+)
+from src.profiling import traced
+
+JTI_EXPIRY = 3600
+JTI_PREFIX = "jti:"
+# revocations used to be stored under the bare jti (a uuid4). those keys are
+# still read so tokens revoked before the prefix stay revoked; the last of
+# them expires JTI_EXPIRY after the rollout, then this can go
+LEGACY_JTI_PATTERN = "????????-????-????-????-????????????"
+REVOCATION_CHANNEL = "jti-revocations"
+
+
+class CircuitOpenError(RedisConnectionError):
+    pass
+
+
+class CircuitBreaker:
+    # after `threshold` connection failures in a row every call fails fast for
+    # `reset_seconds`, then one trial call decides whether redis is back.
+    # a subclass of ConnectionError, so callers that fail open keep doing so.
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+
+        if state == "closed":
+            return
+
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return
+
+        raise CircuitOpenError("redis circuit open, failing fast")
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        REDIS_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial = False
+
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                logging.warning("redis circuit opened after %s failures", self.failures)
+            self.opened_at = time.monotonic()
+            REDIS_CIRCUIT_OPEN.set(1)
+
+    @contextmanager
+    def guard(self):
+        self.before_call()
+        try:
+            yield
+        except (RedisConnectionError, RedisTimeoutError):
+            self.record_failure()
+            raise
+        except RedisError:
+            # an error reply still means redis answered
+            self.record_success()
+            raise
+        else:
+            self.record_success()
+        finally:
+            # a cancelled trial decides nothing, the next call gets to try
+            self._trial = False
+
+
+# the shared client and everything built on it are made on first use, so
+# importing this module does not read the settings
+redis_client: "ManagedRedis | None" = None
+breaker: CircuitBreaker | None = None
+command_batcher: "CommandBatcher | None" = None
+local_blocklist: "LocalBlocklist | None" = None
+
+
+def get_breaker() -> CircuitBreaker:
+    global breaker
+
+    if breaker is None:
+        breaker = CircuitBreaker(
+            threshold=Config.REDIS_BREAKER_THRESHOLD,
+            reset_seconds=Config.REDIS_BREAKER_RESET_SECONDS,
+        )
+
+    return breaker
+
+
+class ManagedRedis(aioredis.Redis):
+    # every single command goes through the breaker. pipelines are guarded
+    # where they are executed, see CommandBatcher.
+    async def execute_command(self, *args, **options):
+        with get_breaker().guard():
+            return await super().execute_command(*args, **options)
+
+
+def create_client(url: str | None = None) -> ManagedRedis:
+    # connections are made lazily, open_redis warms the pool in the lifespan
+    pool = aioredis.BlockingConnectionPool.from_url(
+        url or Config.REDIS_URL,
+        timeout=Config.REDIS_POOL_TIMEOUT,
+        retry=Retry(
+            ExponentialWithJitterBackoff(base=0.05, cap=0.5),
+            Config.REDIS_RETRY_ATTEMPTS,
+        ),
+        **redis_options(),
+    )
+
+    return ManagedRedis(connection_pool=pool)
+
+
+class CommandBatcher:
+    # commands issued in the same event loop tick, by one request or by many
+    # concurrent ones, go to redis as a single non-transactional pipeline
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._pending: list[tuple[tuple, asyncio.Future]] = []
+        self._scheduled = False
+        self._tasks: set[asyncio.Task] = set()
+
+    async def call(self, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((args, future))
+
+        if len(self._pending) >= self.max_size:
+            self._flush_pending()
+        elif not self._scheduled:
+            self._scheduled = True
+            loop.call_soon(self._flush_pending)
+
+        return await future
+
+    async def run_script(self, script, keys: list, args: list) -> Any:
+        # EVALSHA rides along in the batch, the script is loaded on first miss
+        try:
+            return await self.call("EVALSHA", script.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            return await script(keys=keys, args=args)
+
+    def _flush_pending(self) -> None:
+        self._scheduled = False
+        batch, self._pending = self._pending, []
+
+        if batch:
+            task = asyncio.create_task(self._flush(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, batch: list[tuple[tuple, asyncio.Future]]) -> None:
+        REDIS_BATCH_SIZE.observe(len(batch))
+        pipe = get_redis().pipeline(transaction=False)
+        for args, _ in batch:
+            pipe.execute_command(*args)
+
+        try:
+            with get_breaker().guard():
+                results = await pipe.execute(raise_on_error=False)
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            await pipe.reset()
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def get_redis() -> ManagedRedis:
+    global redis_client
+
+    if redis_client is None:
+        redis_client = create_client()
+
+    return redis_client
+
+
+def get_command_batcher() -> CommandBatcher:
+    global command_batcher
+
+    if command_batcher is None:
+        command_batcher = CommandBatcher(Config.REDIS_BATCH_MAX)
+
+    return command_batcher
+
+
+async def open_redis() -> None:
+    # warm one connection so a bad url shows up at startup. the app still
+    # starts without redis, everything built on it degrades or fails open.
+    try:
+        await get_redis().ping()
+    except RedisError as e:
+        logging.warning("redis unavailable at startup: %s", e)
+
+
+async def close_redis() -> None:
+    if redis_client is not None:
+        await redis_client.aclose(close_connection_pool=True)
+
+
+class LocalBlocklist:
+    # per worker copy of the revoked jtis, kept in sync through redis pub/sub.
+    # while the subscription is down `synced` is False and lookups go to redis.
+    # `loaded` stays True once a snapshot was taken, for when redis is down.
+
+    def __init__(self, resync_interval: int):
+        self.resync_interval = resync_interval
+        self.synced = False
+        self.loaded = False
+        self._revoked: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+
+    def add(self, jti: str, expires_at: float | None = None) -> None:
+        self._revoked[jti] = expires_at or time.time() + JTI_EXPIRY
+
+    def contains(self, jti: str) -> bool:
+        expires_at = self._revoked.get(jti)
+
+        if expires_at is None:
+            return False
+
+        if expires_at <= time.time():
+            self._revoked.pop(jti, None)
+            return False
+
+        return True
+
+    async def resync(self) -> None:
+        revoked = {}
+        now = time.time()
+        client = get_redis()
+
+        # expired entries are dropped here and on lookup, nothing else prunes
+        for pattern in (f"{JTI_PREFIX}*", LEGACY_JTI_PATTERN):
+            cursor = 0
+            while True:
+                cursor, keys = await client.scan(cursor, match=pattern, count=1000)
+                # one round trip for the ttls of a whole scan page
+                if keys:
+                    async with client.pipeline(transaction=False) as pipe:
+                        for key in keys:
+                            pipe.ttl(key)
+                        ttls = await pipe.execute()
+
+                    for key, ttl in zip(keys, ttls):
+                        if ttl > 0:
+                            jti = key.decode() if isinstance(key, bytes) else key
+                            revoked[jti.removeprefix(JTI_PREFIX)] = now + ttl
+
+                if not cursor:
+                    break
+
+        self._revoked = revoked
+        self.loaded = True
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                # subscribe before the snapshot so no revocation falls in between
+                await self.resync()
+                self.synced = True
+                last_sync = time.monotonic()
+
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                    if message is not None:
+                        jti = message["data"]
+                        self.add(jti.decode() if isinstance(jti, bytes) else jti)
+
+                    if time.monotonic() - last_sync >= self.resync_interval:
+                        await self.resync()
+                        last_sync = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning("jti blocklist subscription lost: %s", e)
+                self.synced = False
+                await asyncio.sleep(1)
+            finally:
+                self.synced = False
+                await pubsub.aclose()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def get_local_blocklist() -> LocalBlocklist:
+    global local_blocklist
+
+    if local_blocklist is None:
+        local_blocklist = LocalBlocklist(
+            resync_interval=Config.BLOCKLIST_RESYNC_SECONDS
+        )
+
+    return local_blocklist
 
-token_blocklist = aioredis.from_url(Config.REDIS_URL)
 
 async def add_jti_to_blocklist(jti: str) -> None:
-    await token_blocklist.set(name=jti, value="", ex = JTI_EXPIRY)
-    
+    batcher = get_command_batcher()
+
+    with timed(REDIS_COMMAND_SECONDS, command="blocklist_add"):
+        await asyncio.gather(
+            batcher.call("SET", f"{JTI_PREFIX}{jti}", "", "EX", JTI_EXPIRY),
+            batcher.call("PUBLISH", REVOCATION_CHANNEL, jti),
+        )
+    get_local_blocklist().add(jti)
+
+
+@traced("token_in_blocklist")
 async def token_in_blocklist(jti: str) -> bool:
-    jti = await token_blocklist.get(jti)
-    
-    return jti is not None
-    
\ No newline at end of file
+    blocklist = get_local_blocklist()
+    if blocklist.synced:
+        return blocklist.contains(jti)
+
+    try:
+        with timed(REDIS_COMMAND_SECONDS, command="blocklist_get"):
+            values = await get_command_batcher().call(
+                "MGET", f"{JTI_PREFIX}{jti}", jti
+            )
+    except RedisError as e:
+        # revoking needs redis too, so the copy from before the outage is
+        # missing little. without any copy a revoked token must not pass
+        if blocklist.loaded:
+            return blocklist.contains(jti)
+        raise RevocationCheckUnavailable() from e
+
+    return any(value is not None for value in values)
@@ -0,0 +1,32 @@
+from sqlalchemy import TIMESTAMP, Column, event
+from sqlalchemy.orm import ORMExecuteState, Session, with_loader_criteria
+
+INCLUDE_DELETED = "include_deleted"
+
+
+class SoftDeletable:
+    # every ORM select through a session leaves out rows of these models
+    # with deleted_at set, relationship loads included
+    deleted_at = Column(TIMESTAMP(timezone=True), nullable=True)
+
+
+def include_deleted(statement):
+    # opt a single statement out of the filter
+    return statement.execution_options(**{INCLUDE_DELETED: True})
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _filter_deleted(execute_state: ORMExecuteState) -> None:
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get(INCLUDE_DELETED, False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                SoftDeletable,
+                lambda cls: cls.deleted_at.is_(None),
+                include_aliases=True,
+            )
+        )
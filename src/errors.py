@@ -1,9 +1,11 @@
 from typing import Any, Callable
 from fastapi.requests import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
 from fastapi import FastAPI, status
 from sqlalchemy.exc import SQLAlchemyError
 
+from src.responses import ORJSONResponse, PrebuiltResponse
+
 
 class InvalidToken(Exception):
     # response for invalid token
@@ -45,11 +47,58 @@ class AccountNotVerified(Exception):
     pass
 
 
+class InsufficientPermission(Exception):
+    # user's role is not allowed to use this endpoint
+    pass
+
+
+class HashingPoolBusy(Exception):
+    # too many password hashes are already queued
+    pass
+
+
+class RevocationCheckUnavailable(Exception):
+    # redis is down and no local copy of the revoked tokens was ever loaded
+    pass
+
+
+class TourNotFound(Exception):
+    # tour doesn't exist or was deleted
+    pass
+
+
+class InvalidCursor(Exception):
+    # pagination cursor could not be decoded
+    pass
+
+
+class InvalidDateRange(Exception):
+    # report start date is after its end date
+    pass
+
+
+class InvalidImportEncoding(Exception):
+    # import body is not utf-8, line is where decoding failed
+    def __init__(self, line: int):
+        super().__init__(line)
+        self.line = line
+
+
+class RateLimitExceeded(Exception):
+    # too many attempts, retry_after is in seconds
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
 def create_exception_handler(
     status_code: int, initial_detail: Any
-) -> Callable[[Request, Exception], JSONResponse]:
+) -> Callable[[Request, Exception], Response]:
+    # rendered once here, raising only copies the bytes and headers
+    template = ORJSONResponse(content=initial_detail, status_code=status_code)
+
     async def exception_handler(request: Request, exc: Exception):
-        return JSONResponse(content=initial_detail, status_code=status_code)
+        return PrebuiltResponse(template)
 
     return exception_handler
 
@@ -140,24 +189,115 @@ def register_all_errors(app: FastAPI):
             },
         ),
     )
+    app.add_exception_handler(
+        InsufficientPermission,
+        create_exception_handler(
+            status_code=status.HTTP_403_FORBIDDEN,
+            initial_detail={
+                "message": "you do not have enough permissions to perform this action",
+                "error_code": "insufficient_permissions",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        HashingPoolBusy,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_detail={
+                "message": "server is busy",
+                "resolution": "please try again shortly",
+                "error_code": "server_busy",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        RevocationCheckUnavailable,
+        create_exception_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_detail={
+                "message": "token revocation cannot be checked right now",
+                "resolution": "please try again shortly",
+                "error_code": "revocation_check_unavailable",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        TourNotFound,
+        create_exception_handler(
+            status_code=status.HTTP_404_NOT_FOUND,
+            initial_detail={
+                "message": "tour not found",
+                "error_code": "tour_not_found",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        InvalidCursor,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "message": "invalid pagination cursor",
+                "resolution": "start again from the first page",
+                "error_code": "invalid_cursor",
+            },
+        ),
+    )
+    app.add_exception_handler(
+        InvalidDateRange,
+        create_exception_handler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "message": "start date is after end date",
+                "error_code": "invalid_date_range",
+            },
+        ),
+    )
 
-    @app.exception_handler(500)
-    async def internal_server_error(request, exc):
-        return JSONResponse(
+    @app.exception_handler(InvalidImportEncoding)
+    async def invalid_import_encoding(request, exc: InvalidImportEncoding):
+        return ORJSONResponse(
             content={
+                "message": f"line {exc.line} is not valid utf-8",
+                "resolution": "rows before it were imported, fix the file and "
+                "send it again",
+                "error_code": "invalid_import_encoding",
+                "line": exc.line,
+            },
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    @app.exception_handler(RateLimitExceeded)
+    async def rate_limit_exceeded(request, exc: RateLimitExceeded):
+        return ORJSONResponse(
+            content={
+                "message": "too many attempts",
+                "resolution": f"try again in {exc.retry_after} seconds",
+                "error_code": "rate_limited",
+            },
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+    app.add_exception_handler(
+        500,
+        create_exception_handler(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            initial_detail={
                 "message": "oops something went wrong",
                 "error_code": "server_error",
             },
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+        ),
+    )
+
+    database_error_response = create_exception_handler(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        initial_detail={
+            "message": "oops something went wrong",
+            "error_code": "database_error",
+        },
+    )
 
     @app.exception_handler(SQLAlchemyError)
     async def database_error(request, exc):
         print(str(exc))
-        return JSONResponse(
-            content={
-                "message": "oops something went wrong",
-                "error_code": "database_error",
-            },
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+        return await database_error_response(request, exc)
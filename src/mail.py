@@ -1,28 +1,22 @@
-from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
-from src.config import Config
-from pathlib import Path
-
+from email.message import EmailMessage
+from email.utils import formataddr
 
-BASE_DIR = Path(__file__).resolve().parent
+from src.config import Config
 
-mail_config = ConnectionConfig(
-    MAIL_USERNAME=Config.MAIL_USERNAME,
-    MAIL_PASSWORD=Config.MAIL_PASSWORD,
-    MAIL_FROM=Config.MAIL_FROM,
-    MAIL_PORT=587,
-    MAIL_SERVER=Config.MAIL_SERVER,
-    MAIL_FROM_NAME=Config.MAIL_FROM_NAME,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-)
 
-mail = FastMail(config=mail_config)
+def build_message(
+    recipients: list[str], subject: str, body: str, text: str | None = None
+) -> EmailMessage:
+    # plain stdlib message for the smtp batch worker, multipart when text is given
+    message = EmailMessage()
+    message["From"] = formataddr((Config.MAIL_FROM_NAME, Config.MAIL_FROM))
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
 
+    if text is None:
+        message.set_content(body, subtype="html")
+    else:
+        message.set_content(text)
+        message.add_alternative(body, subtype="html")
 
-def create_message(recipients: list[str], subject: str, body: str):
-    message = MessageSchema(
-        recipients=recipients, subject=subject, body=body, subtype=MessageType.html
-    )
     return message
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+import redis.asyncio as aioredis
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.config import Config, redis_options
+from src.db import database
+from src.db.models import EmailOutbox
+
+logger = logging.getLogger("samanid.outbox")
+
+
+def add_email(
+    session: AsyncSession, recipients: list[str], template_id: str, params: dict
+) -> EmailOutbox:
+    # no commit here, the row goes out with the caller's transaction
+    email = EmailOutbox(recipients=recipients, template_id=template_id, params=params)
+    session.add(email)
+
+    return email
+
+
+class OutboxRelay:
+    # moves outbox rows to the redis mail queue in batches. rows are locked
+    # with SKIP LOCKED, so any number of relays can run side by side without
+    # two of them picking up the same email. a batch is pushed before it is
+    # deleted: a crash in between sends it twice, never zero times.
+
+    def __init__(self, client, batch_size: int, poll_interval: float):
+        self.client = client
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+    async def relay_once(self) -> int:
+        # web workers import this module for add_email only, the smtp stack
+        # behind mail_worker is loaded by the relay process
+        from src.mail_worker import EMAIL_QUEUE, templated_payload
+
+        async with database.async_session_maker() as session:
+            statement = (
+                select(EmailOutbox)
+                .order_by(EmailOutbox.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = (await session.exec(statement)).all()
+            if not rows:
+                return 0
+
+            payloads = [
+                json.dumps(
+                    templated_payload(row.recipients, row.template_id, row.params)
+                )
+                for row in rows
+            ]
+            await self.client.rpush(EMAIL_QUEUE, *payloads)
+
+            await session.exec(
+                delete(EmailOutbox).where(EmailOutbox.id.in_([row.id for row in rows]))
+            )
+            await session.commit()
+
+        # sqlite hands back naive timestamps
+        oldest = min(
+            row.created_at.replace(tzinfo=row.created_at.tzinfo or timezone.utc)
+            for row in rows
+        )
+        logger.info(
+            "relayed %s emails, oldest waited %.3fs",
+            len(rows),
+            (datetime.now(timezone.utc) - oldest).total_seconds(),
+        )
+
+        return len(rows)
+
+    async def run(self) -> None:
+        while True:
+            start = time.monotonic()
+            try:
+                relayed = await self.relay_once()
+            except Exception as e:
+                # the transaction rolled back, the rows are picked up next time
+                logger.warning("outbox relay failed, retrying: %s", e)
+                relayed = 0
+
+            # a full batch means there is more waiting, go again right away
+            if relayed < self.batch_size:
+                await asyncio.sleep(
+                    max(0.0, self.poll_interval - (time.monotonic() - start))
+                )
+
+
+def create_relay(client=None) -> OutboxRelay:
+    database.init_engine()
+
+    return OutboxRelay(
+        client=client or aioredis.from_url(Config.REDIS_URL, **redis_options()),
+        batch_size=Config.OUTBOX_BATCH_SIZE,
+        poll_interval=Config.OUTBOX_POLL_INTERVAL,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(create_relay().run())
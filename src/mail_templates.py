@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / "templates" / "email"
+
+# template id -> subject line
+EMAIL_TEMPLATES = {
+    "verification": "Verify your email",
+    "password_reset": "Reset your password",
+    "welcome": "Welcome to the app",
+}
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(enabled_extensions=("html",), default=False),
+    undefined=StrictUndefined,
+    auto_reload=False,
+)
+
+_compiled: dict[str, tuple] = {}
+
+
+def load_templates() -> None:
+    # compile every template once, rendering never touches the filesystem again
+    for template_id in EMAIL_TEMPLATES:
+        _compiled[template_id] = (
+            env.get_template(f"{template_id}.txt"),
+            env.get_template(f"{template_id}.html"),
+        )
+
+
+def render_email(template_id: str, params: dict) -> tuple[str, str, str]:
+    if template_id not in EMAIL_TEMPLATES:
+        raise KeyError(f"unknown email template: {template_id}")
+
+    if not _compiled:
+        load_templates()
+
+    text_template, html_template = _compiled[template_id]
+
+    return (
+        EMAIL_TEMPLATES[template_id],
+        text_template.render(**params),
+        html_template.render(**params),
+    )
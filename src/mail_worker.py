@@ -0,0 +1,399 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+import aiosmtplib
+import redis
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from src.config import Config, redis_options
+from src.mail import build_message
+from src.mail_templates import load_templates, render_email
+
+EMAIL_QUEUE = "mail:queue"
+DEAD_LETTER_QUEUE = "mail:dead"
+# emails a worker has taken off the queue but not finished, one list per worker
+PROCESSING_PREFIX = "mail:processing:"
+# renewed while a worker runs, a processing list without one is reaped
+LEASE_PREFIX = "mail:lease:"
+
+# the rest of a batch after the blocking BLMOVE of its first entry
+#   KEYS: queue, processing list
+#   ARGV: how many more to take
+CLAIM_SCRIPT = """
+local items = {}
+for i = 1, tonumber(ARGV[1]) do
+  local item = redis.call('LMOVE', KEYS[1], KEYS[2], 'LEFT', 'RIGHT')
+  if not item then
+    break
+  end
+  items[i] = item
+end
+return items
+"""
+
+# a dead worker's entries go back to the head of the queue, in order
+#   KEYS: processing list, queue, the owner's lease
+REQUEUE_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 1 then
+  return 0
+end
+local moved = 0
+while redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT') do
+  moved = moved + 1
+end
+return moved
+"""
+
+logger = logging.getLogger("samanid.mail")
+
+_sync_client: redis.Redis | None = None
+
+
+def push_payload(payload: dict) -> None:
+    # called from celery tasks, so a plain blocking client is fine here
+    global _sync_client
+
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(Config.REDIS_URL, **redis_options())
+
+    _sync_client.rpush(EMAIL_QUEUE, json.dumps(payload))
+
+
+def queue_email(recipients: list[str], subject: str, body: str) -> None:
+    push_payload({"recipients": recipients, "subject": subject, "body": body})
+
+
+def templated_payload(recipients: list[str], template_id: str, params: dict) -> dict:
+    # rendered by the worker at send time, the queue only holds the params
+    return {"recipients": recipients, "template_id": template_id, "params": params}
+
+
+def payload_to_message(payload: dict):
+    if "template_id" in payload:
+        subject, text, html = render_email(payload["template_id"], payload["params"])
+        return build_message(
+            recipients=payload["recipients"], subject=subject, body=html, text=text
+        )
+
+    return build_message(
+        recipients=payload["recipients"],
+        subject=payload["subject"],
+        body=payload["body"],
+    )
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(
+        error,
+        (
+            aiosmtplib.SMTPServerDisconnected,
+            aiosmtplib.SMTPConnectError,
+            aiosmtplib.SMTPTimeoutError,
+            OSError,
+        ),
+    ):
+        return True
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 400 <= error.code < 500
+    return False
+
+
+class SMTPConnectionPool:
+    # long lived smtp sessions, one handshake and login per connection
+
+    def __init__(
+        self,
+        size: int,
+        hostname: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        validate_certs: bool = True,
+    ):
+        self.size = size
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.validate_certs = validate_certs
+        self.connects = 0
+        self._idle: asyncio.Queue[aiosmtplib.SMTP] = asyncio.Queue()
+        self._created = 0
+
+    async def _connect(
+        self, smtp: aiosmtplib.SMTP | None = None
+    ) -> aiosmtplib.SMTP:
+        if smtp is None:
+            smtp = aiosmtplib.SMTP(
+                hostname=self.hostname,
+                port=self.port,
+                use_tls=self.use_tls,
+                start_tls=self.start_tls,
+                validate_certs=self.validate_certs,
+            )
+
+        await smtp.connect()
+        if self.username and self.password:
+            await smtp.login(self.username, self.password)
+
+        self.connects += 1
+        return smtp
+
+    async def acquire(self) -> aiosmtplib.SMTP:
+        if self._idle.empty() and self._created < self.size:
+            self._created += 1
+            try:
+                return await self._connect()
+            except Exception:
+                self._created -= 1
+                raise
+
+        smtp = await self._idle.get()
+        if not smtp.is_connected:
+            try:
+                smtp = await self._connect(smtp)
+            except Exception:
+                # keep the slot, the next acquire retries the connect
+                self._idle.put_nowait(smtp)
+                raise
+
+        return smtp
+
+    def release(self, smtp: aiosmtplib.SMTP) -> None:
+        self._idle.put_nowait(smtp)
+
+    async def close(self) -> None:
+        while not self._idle.empty():
+            smtp = self._idle.get_nowait()
+            if smtp.is_connected:
+                try:
+                    await smtp.quit()
+                except aiosmtplib.SMTPException:
+                    smtp.close()
+        self._created = 0
+
+
+class BatchMetrics:
+    def __init__(self):
+        self.batches = 0
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_batch: dict = {}
+
+    def record(
+        self, size: int, sent: int, failed: int, retries: int, seconds: float
+    ):
+        self.batches += 1
+        self.sent += sent
+        self.failed += failed
+        self.retries += retries
+        self.last_batch = {
+            "size": size,
+            "sent": sent,
+            "failed": failed,
+            "retries": retries,
+            "seconds": seconds,
+        }
+
+    def snapshot(self) -> dict:
+        return {
+            "batches": self.batches,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "last_batch": self.last_batch,
+        }
+
+
+class EmailBatchWorker:
+    # drains the redis email queue in batches over pooled smtp connections.
+    # taken entries sit in this worker's processing list until they are sent
+    # or dead lettered, so a crash mid batch loses nothing: reap() puts them
+    # back once the lease runs out. delivery is at least once.
+
+    def __init__(
+        self,
+        client,
+        pool: SMTPConnectionPool,
+        batch_size: int,
+        flush_interval: float,
+        max_retries: int,
+        retry_backoff: float,
+        lease_seconds: int,
+        worker_id: str | None = None,
+    ):
+        self.client = client
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.lease_seconds = lease_seconds
+        self.worker_id = worker_id or uuid.uuid4().hex
+        self.processing_key = f"{PROCESSING_PREFIX}{self.worker_id}"
+        self.lease_key = f"{LEASE_PREFIX}{self.worker_id}"
+        self.metrics = BatchMetrics()
+        self._claim = client.register_script(CLAIM_SCRIPT)
+        self._requeue = client.register_script(REQUEUE_SCRIPT)
+
+    async def renew_lease(self) -> None:
+        await self.client.set(self.lease_key, "", ex=self.lease_seconds)
+
+    async def next_batch(self) -> list[bytes]:
+        # wait up to flush_interval for the first message, then take what is queued
+        first = await self.client.blmove(
+            EMAIL_QUEUE, self.processing_key, self.flush_interval, "LEFT", "RIGHT"
+        )
+        if first is None:
+            return []
+
+        raw = [first]
+        if self.batch_size > 1:
+            raw.extend(
+                await self._claim(
+                    keys=[EMAIL_QUEUE, self.processing_key],
+                    args=[self.batch_size - 1],
+                )
+            )
+
+        return raw
+
+    async def requeue(self, processing_key: str) -> int:
+        worker_id = processing_key.removeprefix(PROCESSING_PREFIX)
+        return await self._requeue(
+            keys=[processing_key, EMAIL_QUEUE, f"{LEASE_PREFIX}{worker_id}"]
+        )
+
+    async def reap(self) -> int:
+        # processing lists of workers that stopped renewing their lease
+        moved = 0
+        async for key in self.client.scan_iter(match=f"{PROCESSING_PREFIX}*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            moved += await self.requeue(key)
+
+        if moved:
+            logger.warning("requeued %s emails left by dead workers", moved)
+
+        return moved
+
+    async def send_one(self, item: bytes) -> int:
+        # returns the number of retries it took
+        message = payload_to_message(json.loads(item))
+
+        for attempt in range(self.max_retries + 1):
+            smtp = None
+            try:
+                smtp = await self.pool.acquire()
+                await smtp.send_message(message)
+                return attempt
+            except Exception as e:
+                disconnected = isinstance(e, aiosmtplib.SMTPServerDisconnected)
+                if disconnected and smtp is not None:
+                    smtp.close()
+                if not is_transient(e) or attempt == self.max_retries:
+                    raise
+                logger.warning("transient smtp error, retrying: %s", e)
+            finally:
+                if smtp is not None:
+                    self.pool.release(smtp)
+
+            await asyncio.sleep(self.retry_backoff * 2**attempt)
+
+    async def send_batch(self, batch: list[bytes]) -> None:
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.send_one(item) for item in batch), return_exceptions=True
+        )
+
+        failed = [
+            item
+            for item, result in zip(batch, results)
+            if isinstance(result, BaseException)
+        ]
+        retries = sum(result for result in results if isinstance(result, int))
+
+        # dead letters and acknowledgements land together
+        async with self.client.pipeline(transaction=True) as pipe:
+            if failed:
+                pipe.rpush(DEAD_LETTER_QUEUE, *failed)
+            for item in batch:
+                pipe.lrem(self.processing_key, 1, item)
+            await pipe.execute()
+
+        seconds = time.perf_counter() - start
+        self.metrics.record(
+            len(batch), len(batch) - len(failed), len(failed), retries, seconds
+        )
+        logger.info("email batch %s", json.dumps(self.metrics.last_batch))
+
+    async def run_once(self) -> int:
+        await self.renew_lease()
+        batch = await self.next_batch()
+        if batch:
+            await self.renew_lease()
+            await self.send_batch(batch)
+
+        return len(batch)
+
+    async def run(self) -> None:
+        next_reap = time.monotonic()
+        try:
+            while True:
+                if time.monotonic() >= next_reap:
+                    await self.reap()
+                    next_reap = time.monotonic() + self.lease_seconds
+                await self.run_once()
+        finally:
+            try:
+                # what this worker still holds goes back now, not after the lease
+                await self.client.delete(self.lease_key)
+                await self.requeue(self.processing_key)
+            except RedisError as e:
+                logger.warning("emails left for the reaper: %s", e)
+            await self.pool.close()
+
+
+def create_worker(
+    client=None, pool: SMTPConnectionPool | None = None
+) -> EmailBatchWorker:
+    if pool is None:
+        pool = SMTPConnectionPool(
+            size=Config.MAIL_POOL_SIZE,
+            hostname=Config.MAIL_SERVER,
+            port=Config.MAIL_PORT,
+            username=Config.MAIL_USERNAME if Config.USE_CREDENTIALS else None,
+            password=Config.MAIL_PASSWORD if Config.USE_CREDENTIALS else None,
+            use_tls=Config.MAIL_SSL_TLS,
+            start_tls=Config.MAIL_STARTTLS,
+            validate_certs=Config.VALIDATE_CERTS,
+        )
+
+    load_templates()
+
+    # blmove blocks for up to flush_interval, the read timeout has to outlast it
+    options = redis_options()
+    options["socket_timeout"] += Config.MAIL_FLUSH_INTERVAL
+
+    return EmailBatchWorker(
+        client=client or aioredis.from_url(Config.REDIS_URL, **options),
+        pool=pool,
+        batch_size=Config.MAIL_BATCH_SIZE,
+        flush_interval=Config.MAIL_FLUSH_INTERVAL,
+        max_retries=Config.MAIL_MAX_RETRIES,
+        retry_backoff=Config.MAIL_RETRY_BACKOFF,
+        lease_seconds=Config.MAIL_LEASE_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(create_worker().run())
@@ -0,0 +1,117 @@
+import time
+from contextlib import contextmanager
+
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+registry = CollectorRegistry()
+
+# labelled by route template (/api/tours/{tour_id}), never the raw path
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    registry=registry,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    registry=registry,
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time spent waiting for a pooled database connection",
+    registry=registry,
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Database pool connections by state",
+    ["state"],
+    registry=registry,
+)
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total",
+    "Read only sessions by the database they were routed to",
+    ["target"],
+    registry=registry,
+)
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total",
+    "Rate limiter decisions by scope and outcome",
+    ["scope", "outcome"],
+    registry=registry,
+)
+COMMENT_FEED_READS = Counter(
+    "comment_feed_reads_total",
+    "Tour comment pages by where they were served from",
+    ["source"],
+    registry=registry,
+)
+COMMENT_WRITE_BATCH_SIZE = Histogram(
+    "comment_write_batch_size",
+    "Comments inserted per group commit",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+    registry=registry,
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "redis_command_duration_seconds",
+    "Redis call latency",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+    registry=registry,
+)
+REDIS_BATCH_SIZE = Histogram(
+    "redis_batch_size",
+    "Commands sent per coalesced redis pipeline",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+    registry=registry,
+)
+REDIS_CIRCUIT_OPEN = Gauge(
+    "redis_circuit_open",
+    "1 while redis calls fail fast after repeated connection errors",
+    registry=registry,
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "password_hash_duration_seconds",
+    "Password hash/verify latency including queueing for the process pool",
+    ["operation"],
+    registry=registry,
+)
+PASSWORD_HASH_PENDING = Gauge(
+    "password_hash_pending",
+    "Password hash calls queued or running in the process pool",
+    registry=registry,
+)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+@contextmanager
+def timed(histogram: Histogram, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric = histogram.labels(**labels) if labels else histogram
+        metric.observe(time.perf_counter() - start)
+
+
+def route_label(request_scope: dict) -> str:
+    route = request_scope.get("route")
+    return route.path if route is not None else UNMATCHED_ROUTE
+
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -2,24 +2,142 @@ from fastapi import FastAPI
 from fastapi.requests import Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-import time
+from logging.handlers import QueueHandler, QueueListener
+import json
 import logging
+import queue
+import random
+import sys
+import time
+
+from src.config import Config
+from src.metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS_IN_FLIGHT, route_label
+
+access_logger = logging.getLogger("samanid.access")
+access_logger.setLevel(logging.INFO)
+access_logger.propagate = False
+
+
+class JSONFormatter(logging.Formatter):
+    # runs on the listener thread, never on the event loop
+    def format(self, record: logging.LogRecord) -> str:
+        payload = dict(getattr(record, "access", None) or {})
+        payload.setdefault("message", record.getMessage())
+        payload["ts"] = record.created
+        payload["level"] = record.levelname
+        return json.dumps(payload, default=str)
+
+
+class AccessLogPipeline:
+    # request path only does a queue put, formatting and the stdout write
+    # happen in the QueueListener thread
+
+    def __init__(self, sample_rate: float, slow_ms: float):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.listener: QueueListener | None = None
+        self.handler = QueueHandler(self.queue)
+        self.logged = 0
+        self.sampled_out = 0
+        self.overhead_ns = 0
+
+    def start(self, handler: logging.Handler | None = None) -> None:
+        if self.listener is not None:
+            return
+
+        if handler is None:
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(JSONFormatter())
+
+        access_logger.addHandler(self.handler)
+        self.listener = QueueListener(self.queue, handler)
+        self.listener.start()
+
+    def stop(self) -> None:
+        if self.listener is None:
+            return
 
-logger = logging.getLogger("uvicorn.access")
-logger.disabled = True
+        self.listener.stop()
+        access_logger.removeHandler(self.handler)
+        self.listener = None
+
+    def should_log(self, status_code: int, duration_ms: float) -> bool:
+        if status_code >= 400 or duration_ms >= self.slow_ms:
+            return True
+
+        return random.random() < self.sample_rate
+
+    def log(self, record: dict) -> None:
+        start = time.perf_counter_ns()
+
+        if self.should_log(record["status"], record["duration_ms"]):
+            level = logging.ERROR if record["status"] >= 500 else logging.INFO
+            access_logger.log(level, "access", extra={"access": record})
+            self.logged += 1
+        else:
+            self.sampled_out += 1
+
+        self.overhead_ns += time.perf_counter_ns() - start
+
+    def stats(self) -> dict:
+        total = self.logged + self.sampled_out
+        return {
+            "logged": self.logged,
+            "sampled_out": self.sampled_out,
+            "avg_overhead_ns": self.overhead_ns / total if total else 0,
+        }
+
+
+_access_log = None
+
+
+def get_access_log() -> AccessLogPipeline:
+    global _access_log
+
+    if _access_log is None:
+        _access_log = AccessLogPipeline(
+            sample_rate=Config.ACCESS_LOG_SAMPLE_RATE, slow_ms=Config.ACCESS_LOG_SLOW_MS
+        )
+
+    return _access_log
 
 
 def register_middleware(app: FastAPI):
+    # structured access log replaces uvicorn's own access lines
+    logging.getLogger("uvicorn.access").disabled = True
+
     @app.middleware("http")
     async def custom_logging(request: Request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        processing_time = time.time() - start_time
+        start_time = time.perf_counter_ns()
+        status_code = 500
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+            route = route_label(request.scope)
+            client = request.client
 
-        message = f"{request.client.host}:{request.client.port} - {request.method} - {request.url.path} - {response.status_code} completed after {processing_time}"
+            HTTP_REQUEST_SECONDS.labels(
+                method=request.method, route=route, status=status_code
+            ).observe(duration_ms / 1000)
 
-        print(message)
-        return response
+            access_log = get_access_log()
+            access_log.log(
+                {
+                    "client": f"{client.host}:{client.port}" if client else None,
+                    "method": request.method,
+                    "path": request.url.path,
+                    "route": route,
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 3),
+                    "slow": duration_ms >= access_log.slow_ms,
+                }
+            )
 
     app.add_middleware(
         CORSMiddleware,
@@ -0,0 +1,114 @@
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+
+from fastapi import APIRouter, Depends, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.dependencies import RoleChecker, get_current_user
+from src.db.database import get_read_session, get_session
+from src.errors import InvalidDateRange, TourNotFound
+from src.tours.service import TourService
+
+from .schemas import (
+    DailyReport,
+    DailyTotalModel,
+    PaymentCreateModel,
+    PaymentModel,
+    UserTotalModel,
+)
+from .service import PaymentService
+
+router = APIRouter(prefix="/api/payments", tags=["Payments"])
+payment_service = PaymentService()
+admin_checker = RoleChecker(["admin"])
+tour_service = TourService()
+
+DEFAULT_REPORT_DAYS = 30
+
+
+def report_range(start: date | None, end: date | None) -> tuple[date, date]:
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+
+    if start > end:
+        raise InvalidDateRange()
+
+    return start, end
+
+
+def daily_report(start: date, end: date, rows) -> DailyReport:
+    # summed over day rows, the cost grows with the range and not the ledger
+    days = [DailyTotalModel.model_validate(row) for row in rows]
+
+    return DailyReport(
+        start=start,
+        end=end,
+        total=sum((day.total for day in days), Decimal("0")),
+        payment_count=sum(day.payment_count for day in days),
+        days=days,
+    )
+
+
+@router.post("", status_code=201, response_model=PaymentModel)
+async def create_payment(
+    payment_data: PaymentCreateModel,
+    user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    if payment_data.tour_id is not None:
+        tour = await tour_service.get_tour(payment_data.tour_id, session)
+        if tour is None:
+            raise TourNotFound()
+
+    return await payment_service.create_payment(user.id, payment_data, session)
+
+
+@router.get("/reports/daily", response_model=DailyReport)
+async def get_daily_report(
+    start: date | None = None,
+    end: date | None = None,
+    session: AsyncSession = Depends(get_read_session),
+    _: bool = Depends(admin_checker),
+):
+    start, end = report_range(start, end)
+    rows = await payment_service.get_daily_totals(start, end, session)
+
+    return daily_report(start, end, rows)
+
+
+@router.get("/reports/tours/{tour_id}", response_model=DailyReport)
+async def get_tour_report(
+    tour_id: int,
+    start: date | None = None,
+    end: date | None = None,
+    session: AsyncSession = Depends(get_read_session),
+    _: bool = Depends(admin_checker),
+):
+    start, end = report_range(start, end)
+    rows = await payment_service.get_tour_daily_totals(tour_id, start, end, session)
+
+    return daily_report(start, end, rows)
+
+
+@router.get("/reports/users", response_model=List[UserTotalModel])
+async def get_top_users(
+    limit: int = Query(default=20, ge=1, le=100),
+    session: AsyncSession = Depends(get_read_session),
+    _: bool = Depends(admin_checker),
+):
+    return await payment_service.get_top_users(limit, session)
+
+
+@router.get("/reports/users/{user_id}", response_model=UserTotalModel)
+async def get_user_report(
+    user_id: int,
+    session: AsyncSession = Depends(get_read_session),
+    _: bool = Depends(admin_checker),
+):
+    totals = await payment_service.get_user_totals(user_id, session)
+
+    if totals is None:
+        return UserTotalModel(user_id=user_id, total=Decimal("0"), payment_count=0)
+
+    return totals
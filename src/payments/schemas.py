@@ -0,0 +1,48 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class PaymentCreateModel(BaseModel):
+    amount: Decimal = Field(gt=0, max_digits=10, decimal_places=2)
+    tour_id: int | None = None
+
+
+class PaymentModel(BaseModel):
+    id: int
+    user_id: int
+    tour_id: int | None = None
+    amount: Decimal
+    payment_date: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class DailyTotalModel(BaseModel):
+    day: date
+    total: Decimal
+    payment_count: int
+
+    class Config:
+        from_attributes = True
+
+
+class DailyReport(BaseModel):
+    start: date
+    end: date
+    total: Decimal
+    payment_count: int
+    days: List[DailyTotalModel]
+
+
+class UserTotalModel(BaseModel):
+    user_id: int
+    total: Decimal
+    payment_count: int
+    last_payment_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
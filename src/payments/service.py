@@ -0,0 +1,118 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.database import dialect_greatest, dialect_insert
+from src.db.models import (
+    Payment,
+    PaymentDailyTotal,
+    PaymentTourDailyTotal,
+    PaymentUserTotal,
+)
+
+from .schemas import PaymentCreateModel
+
+
+class PaymentService:
+    async def create_payment(
+        self, user_id: int, payment_data: PaymentCreateModel, session: AsyncSession
+    ):
+        payment = Payment(
+            user_id=user_id,
+            payment_date=datetime.now(timezone.utc),
+            **payment_data.model_dump(),
+        )
+        session.add(payment)
+        await session.flush()
+
+        await self.apply_to_rollups(payment, session)
+        await session.commit()
+
+        return payment
+
+    async def apply_to_rollups(self, payment: Payment, session: AsyncSession):
+        # same transaction as the payment, so totals never drift from it.
+        # rows are always locked user -> day -> tour day to avoid deadlocks.
+        dialect = session.bind.dialect
+        insert = dialect_insert(dialect)
+        day = payment.payment_date.astimezone(timezone.utc).date()
+
+        rollups = [
+            (
+                PaymentUserTotal,
+                {"user_id": payment.user_id},
+                {"last_payment_at": payment.payment_date},
+            ),
+            (PaymentDailyTotal, {"day": day}, {}),
+        ]
+        if payment.tour_id is not None:
+            rollups.append(
+                (PaymentTourDailyTotal, {"tour_id": payment.tour_id, "day": day}, {})
+            )
+
+        for model, key, extra in rollups:
+            statement = insert(model).values(
+                **key, **extra, total=payment.amount, payment_count=1
+            )
+            statement = statement.on_conflict_do_update(
+                index_elements=list(key),
+                set_={
+                    "total": model.total + statement.excluded.total,
+                    "payment_count": model.payment_count + 1,
+                    # a payment committing late must not move these back
+                    **{
+                        column: dialect_greatest(
+                            dialect,
+                            func.coalesce(
+                                getattr(model, column), statement.excluded[column]
+                            ),
+                            statement.excluded[column],
+                        )
+                        for column in extra
+                    },
+                },
+            )
+            await session.exec(statement)
+
+    async def get_daily_totals(self, start: date, end: date, session: AsyncSession):
+        statement = (
+            select(PaymentDailyTotal)
+            .where(PaymentDailyTotal.day.between(start, end))
+            .order_by(PaymentDailyTotal.day)
+        )
+        result = await session.exec(statement)
+
+        return result.all()
+
+    async def get_tour_daily_totals(
+        self, tour_id: int, start: date, end: date, session: AsyncSession
+    ):
+        statement = (
+            select(PaymentTourDailyTotal)
+            .where(
+                PaymentTourDailyTotal.tour_id == tour_id,
+                PaymentTourDailyTotal.day.between(start, end),
+            )
+            .order_by(PaymentTourDailyTotal.day)
+        )
+        result = await session.exec(statement)
+
+        return result.all()
+
+    async def get_user_totals(self, user_id: int, session: AsyncSession):
+        statement = select(PaymentUserTotal).where(PaymentUserTotal.user_id == user_id)
+        result = await session.exec(statement)
+
+        return result.first()
+
+    async def get_top_users(self, limit: int, session: AsyncSession):
+        statement = (
+            select(PaymentUserTotal)
+            .order_by(PaymentUserTotal.total.desc(), PaymentUserTotal.user_id)
+            .limit(limit)
+        )
+        result = await session.exec(statement)
+
+        return result.all()
@@ -0,0 +1,219 @@
+import asyncio
+import cProfile
+import functools
+import hmac
+import inspect
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.requests import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp
+
+from src.config import Config
+
+PROFILE_HEADER = "X-Profile"
+
+# spans of the current request, None when the request is not profiled
+_spans: ContextVar[list | None] = ContextVar("profiling_spans", default=None)
+
+
+@contextmanager
+def span(name: str):
+    spans = _spans.get()
+
+    if spans is None:
+        yield
+        return
+
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        spans.append((name, (time.perf_counter_ns() - start) / 1_000_000))
+
+
+def traced(name: str):
+    # decorator form of span() for sync and async functions
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class StackSampler:
+    # samples the event loop thread's stack from a side thread and keeps
+    # collapsed stacks ("a;b;c count") that flamegraph tools read directly
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.items())
+
+
+class RequestProfiler:
+    def __init__(
+        self,
+        output_dir: str,
+        sample_rate: float,
+        admin_token: str | None,
+        mode: str,
+        interval: float,
+    ):
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.admin_token = admin_token
+        self.mode = mode
+        self.interval = interval
+        # the profilers see the whole thread, so only one request at a time
+        self.busy = False
+
+    def wanted(self, request: Request) -> bool:
+        header = request.headers.get(PROFILE_HEADER)
+
+        if header and self.admin_token:
+            return hmac.compare_digest(header, self.admin_token)
+
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def output_base(self, request: Request) -> Path:
+        # every file of one request shares this name, only the suffix differs
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", request.url.path).strip("-") or "root"
+        return self.output_dir / f"{time.time_ns()}-{request.method}-{slug}"
+
+    def write(self, base: Path, profiler, collapsed: str | None, spans: list) -> None:
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            if profiler is not None:
+                profiler.dump_stats(f"{base}.prof")
+            else:
+                Path(f"{base}.folded").write_text(collapsed)
+            Path(f"{base}.spans.json").write_text(json.dumps(spans))
+        except OSError as e:
+            logging.warning("could not write profile: %s", e)
+
+    async def profile(self, request: Request, call_next):
+        self.busy = True
+        spans: list = []
+        token = _spans.set(spans)
+
+        profiler = None
+        sampler = None
+        if self.mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+
+        try:
+            response = await call_next(request)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if sampler is not None:
+                sampler.stop()
+            _spans.reset(token)
+            self.busy = False
+
+        # disk writes off the event loop, other requests keep being served
+        await asyncio.to_thread(
+            self.write,
+            self.output_base(request),
+            profiler,
+            sampler.collapsed() if sampler is not None else None,
+            spans,
+        )
+
+        response.headers["Server-Timing"] = ", ".join(
+            f"{name.replace('.', '-')};dur={duration:.3f}" for name, duration in spans
+        )
+
+        return response
+
+
+_request_profiler = None
+
+
+def get_request_profiler() -> RequestProfiler:
+    global _request_profiler
+
+    if _request_profiler is None:
+        _request_profiler = RequestProfiler(
+            output_dir=Config.PROFILE_DIR,
+            sample_rate=Config.PROFILE_SAMPLE_RATE,
+            admin_token=Config.PROFILE_ADMIN_TOKEN,
+            mode=Config.PROFILE_MODE,
+            interval=Config.PROFILE_INTERVAL,
+        )
+
+    return _request_profiler
+
+
+async def profile_request(request: Request, call_next):
+    request_profiler = get_request_profiler()
+
+    if request_profiler.busy or not request_profiler.wanted(request):
+        return await call_next(request)
+
+    return await request_profiler.profile(request, call_next)
+
+
+def profiling_middleware(app: ASGIApp) -> ASGIApp:
+    # starlette builds the middleware stack on the first call, so the setting
+    # is read then and not on import. disabled, no layer is added at all.
+    if not Config.PROFILING_ENABLED:
+        return app
+
+    return BaseHTTPMiddleware(app, dispatch=profile_request)
+
+
+def register_profiling(app: FastAPI):
+    app.add_middleware(profiling_middleware)
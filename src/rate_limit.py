@@ -0,0 +1,202 @@
+import logging
+import math
+import time
+import uuid
+from typing import Callable
+
+from fastapi.requests import Request
+from redis.exceptions import RedisError
+
+from src.cache import TTLCache
+from src.config import Config
+from src.db import redis as redis_module
+from src.errors import RateLimitExceeded
+from src.metrics import RATE_LIMIT_DECISIONS, REDIS_COMMAND_SECONDS, timed
+
+KEY_PREFIX = "ratelimit:"
+LOCAL_BLOCK_SIZE = 10000
+
+# sliding window log, one sorted set of attempt timestamps per key.
+# every key is checked before any is recorded, so a request rejected by one
+# limit does not use up the others. returns the ms to wait for each key,
+# all zeros when the attempt was allowed.
+#   KEYS: one per limit
+#   ARGV: member, then limit, window (ms) and record (0 or 1) for each key
+SLIDING_WINDOW_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local waits = {}
+local blocked = false
+
+for i, key in ipairs(KEYS) do
+  local limit = tonumber(ARGV[3 * i - 1])
+  local window = tonumber(ARGV[3 * i])
+  redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+  local count = redis.call('ZCARD', key)
+  waits[i] = 0
+  if count >= limit then
+    local oldest = redis.call('ZRANGE', key, count - limit, count - limit, 'WITHSCORES')
+    waits[i] = math.max(1, tonumber(oldest[2]) + window - now)
+    blocked = true
+  end
+end
+
+if not blocked then
+  for i, key in ipairs(KEYS) do
+    if ARGV[3 * i + 1] == '1' then
+      redis.call('ZADD', key, now, ARGV[1])
+      redis.call('PEXPIRE', key, ARGV[3 * i])
+    end
+  end
+end
+
+return waits
+"""
+
+
+def client_ip(request: Request) -> str:
+    # behind a proxy uvicorn --proxy-headers puts the real client here
+    return request.client.host if request.client else "unknown"
+
+
+class RateLimit:
+    # dependency limiting a route per client ip and, optionally, per value of
+    # a json body field (the email being logged into). keys that redis has
+    # rejected are remembered locally until they free up, so a flood is shed
+    # in the worker without a round trip per request. limits are (count,
+    # window seconds) callables, read per request rather than on import.
+    # with field_failures_only every request is checked against the field
+    # limit but only those reported through record_failure count toward it.
+
+    def __init__(
+        self,
+        scope: str,
+        ip_limit: Callable[[], tuple[int, int]],
+        field: str | None = None,
+        field_limit: Callable[[], tuple[int, int]] | None = None,
+        field_failures_only: bool = False,
+    ):
+        self.scope = scope
+        self.ip_limit = ip_limit
+        self.field = field
+        self.field_limit = field_limit
+        self.field_failures_only = field_failures_only
+        self.blocked = TTLCache(LOCAL_BLOCK_SIZE)
+        self._script = None
+
+    def field_key(self, value: str) -> str:
+        return f"{KEY_PREFIX}{self.scope}:{self.field}:{value.strip().lower()}"
+
+    async def limits(self, request: Request) -> list[tuple[str, int, int, bool]]:
+        # (key, limit, window, whether this request counts toward it)
+        ip_key = f"{KEY_PREFIX}{self.scope}:ip:{client_ip(request)}"
+        limits = [(ip_key, *self.ip_limit(), True)]
+
+        if self.field is not None:
+            try:
+                body = await request.json()
+            except ValueError:
+                body = None
+            value = body.get(self.field) if isinstance(body, dict) else None
+            if isinstance(value, str) and value.strip():
+                limits.append(
+                    (
+                        self.field_key(value),
+                        *self.field_limit(),
+                        not self.field_failures_only,
+                    )
+                )
+
+        return limits
+
+    def local_wait(self, keys: list[str]) -> float:
+        now = time.time()
+        waits = [self.blocked.get(key) for key in keys]
+
+        return max((until - now for until in waits if until), default=0.0)
+
+    async def remote_waits(
+        self, limits: list[tuple[str, int, int, bool]]
+    ) -> list[int]:
+        client = redis_module.get_redis()
+        if self._script is None or self._script.registered_client is not client:
+            self._script = client.register_script(SLIDING_WINDOW_SCRIPT)
+
+        args = [uuid.uuid4().hex]
+        for _, limit, window, record in limits:
+            args += [limit, window * 1000, int(record)]
+
+        # pipelined with whatever else this tick sends, blocklist checks included
+        with timed(REDIS_COMMAND_SECONDS, command="rate_limit"):
+            return await redis_module.get_command_batcher().run_script(
+                self._script, keys=[key for key, *_ in limits], args=args
+            )
+
+    async def record_failure(self, value: str) -> None:
+        # counts a failed attempt toward the field limit
+        if not Config.RATE_LIMIT_ENABLED:
+            return
+
+        try:
+            limit, window = self.field_limit()
+            await self.remote_waits([(self.field_key(value), limit, window, True)])
+        except RedisError as e:
+            logging.warning("rate limiter unavailable: %s", e)
+
+    async def __call__(self, request: Request) -> None:
+        if not Config.RATE_LIMIT_ENABLED:
+            return
+
+        limits = await self.limits(request)
+        keys = [key for key, *_ in limits]
+
+        wait = self.local_wait(keys)
+        if wait > 0:
+            RATE_LIMIT_DECISIONS.labels(
+                scope=self.scope, outcome="local_limited"
+            ).inc()
+            raise RateLimitExceeded(math.ceil(wait))
+
+        try:
+            waits = await self.remote_waits(limits)
+        except RedisError as e:
+            # fail open, an outage should not lock everybody out of login
+            logging.warning("rate limiter unavailable: %s", e)
+            RATE_LIMIT_DECISIONS.labels(scope=self.scope, outcome="error").inc()
+            return
+
+        now = time.time()
+        for key, key_wait in zip(keys, waits):
+            if key_wait:
+                until = now + int(key_wait) / 1000
+                self.blocked.set(key, until, until)
+
+        wait = max(int(key_wait) for key_wait in waits) / 1000
+        if wait > 0:
+            RATE_LIMIT_DECISIONS.labels(scope=self.scope, outcome="limited").inc()
+            raise RateLimitExceeded(math.ceil(wait))
+
+        RATE_LIMIT_DECISIONS.labels(scope=self.scope, outcome="allowed").inc()
+
+
+login_rate_limit = RateLimit(
+    "login",
+    ip_limit=lambda: (Config.LOGIN_IP_LIMIT, Config.LOGIN_IP_WINDOW),
+    field="email",
+    field_limit=lambda: (Config.LOGIN_EMAIL_LIMIT, Config.LOGIN_EMAIL_WINDOW),
+    # only wrong passwords count, logging in successfully never locks an email
+    field_failures_only=True,
+)
+
+password_reset_rate_limit = RateLimit(
+    "password_reset",
+    ip_limit=lambda: (
+        Config.PASSWORD_RESET_IP_LIMIT,
+        Config.PASSWORD_RESET_IP_WINDOW,
+    ),
+    field="email",
+    field_limit=lambda: (
+        Config.PASSWORD_RESET_EMAIL_LIMIT,
+        Config.PASSWORD_RESET_EMAIL_WINDOW,
+    ),
+)
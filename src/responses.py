@@ -0,0 +1,21 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+
+
+class ORJSONResponse(JSONResponse):
+    # for handlers that build plain dicts. routes with a response_model keep
+    # fastapi's default class, which already serializes through pydantic.
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+class PrebuiltResponse(Response):
+    # copy of a response rendered ahead of time, only the header list is
+    # copied because middleware may add headers to it
+    def __init__(self, template: Response):
+        self.status_code = template.status_code
+        self.body = template.body
+        self.background = None
+        self.raw_headers = list(template.raw_headers)
@@ -0,0 +1,98 @@
+import asyncio
+import io
+import json
+import logging
+import random
+
+from src.tests.conf_tests import bench_client
+
+from src.middleware import AccessLogPipeline, JSONFormatter, get_access_log
+
+
+def record(status: int = 200, duration_ms: float = 1.0, path: str = "/") -> dict:
+    return {
+        "client": "127.0.0.1:5000",
+        "method": "GET",
+        "path": path,
+        "route": path,
+        "status": status,
+        "duration_ms": duration_ms,
+        "slow": False,
+    }
+
+
+def test_sampling_keeps_errors_and_slow_requests():
+    random.seed(7)
+    pipeline = AccessLogPipeline(sample_rate=0.25, slow_ms=100)
+
+    assert all(pipeline.should_log(status, 1) for status in (400, 404, 500, 503))
+    assert pipeline.should_log(200, 100)
+
+    sampled = sum(pipeline.should_log(200, 1) for _ in range(10_000))
+    assert 2300 < sampled < 2700
+
+    pipeline.sample_rate = 0
+    assert not any(pipeline.should_log(200, 1) for _ in range(1000))
+
+    for _ in range(3):
+        pipeline.log(record())
+    pipeline.log(record(status=500))
+    assert pipeline.stats()["logged"] == 1
+    assert pipeline.stats()["sampled_out"] == 3
+
+
+def started_pipeline() -> tuple[AccessLogPipeline, io.StringIO]:
+    output = io.StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(JSONFormatter())
+
+    pipeline = AccessLogPipeline(sample_rate=1.0, slow_ms=1000)
+    pipeline.start(handler)
+    return pipeline, output
+
+
+def test_records_are_queued_as_json_and_flushed_on_stop():
+    pipeline, output = started_pipeline()
+    try:
+        pipeline.log(record(path="/api/tours"))
+        pipeline.log(record(status=502, duration_ms=12.5))
+        for n in range(500):
+            pipeline.log(record(path=f"/n/{n}"))
+    finally:
+        # stop drains the queue before the listener thread exits
+        pipeline.stop()
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert len(lines) == 502
+    assert set(lines[0]) == {*record(), "message", "ts", "level"}
+    assert lines[0]["path"] == "/api/tours"
+    assert (lines[0]["level"], lines[0]["message"]) == ("INFO", "access")
+    assert (lines[1]["level"], lines[1]["status"]) == ("ERROR", 502)
+    assert lines[-1]["path"] == "/n/499"
+
+    # stopped, records no longer reach the old handler
+    pipeline.log(record())
+    assert len(output.getvalue().splitlines()) == 502
+
+
+async def run_request_logging():
+    async with bench_client() as (client, _):
+        access_log = get_access_log()
+        logged = []
+        log = access_log.log
+        access_log.log = logged.append
+        try:
+            response = await client.get("/api/tours/999999")
+        finally:
+            access_log.log = log
+
+    assert response.status_code == 404
+    (entry,) = logged
+    assert entry["route"] == "/api/tours/{tour_id}"
+    assert entry["path"] == "/api/tours/999999"
+    assert (entry["method"], entry["status"]) == ("GET", 404)
+    assert entry["duration_ms"] > 0
+
+
+def test_requests_are_logged_with_their_route():
+    asyncio.run(run_request_logging())
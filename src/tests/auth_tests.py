@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from src.tests.conf_tests import bench_client
+
+from src.auth.hashing import get_password_hasher
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+BASELINE_FILE = BASELINE_DIR / "auth_flow.json"
+
+STEPS = ["signup", "verify", "login", "me", "refresh", "logout"]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def pool_cpu_seconds() -> float:
+    # cpu burnt in the hashing processes, read from /proc where available
+    executor = get_password_hasher()._executor
+    if executor is None:
+        return 0.0
+
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    for pid in list(executor._processes or {}):
+        try:
+            fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / ticks
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+class StepResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.errors = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def summary(self) -> dict:
+        count = len(self.latencies) + self.errors
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "throughput_rps": round(count / self.wall_seconds, 2)
+            if self.wall_seconds
+            else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50), 3),
+            "p95_ms": round(percentile(self.latencies, 95), 3),
+            "p99_ms": round(percentile(self.latencies, 99), 3),
+            "mean_ms": round(statistics.fmean(self.latencies), 3)
+            if self.latencies
+            else 0.0,
+            "cpu_ms_per_request": round(self.cpu_seconds / count * 1000, 3)
+            if count
+            else 0.0,
+        }
+
+
+async def run_step(
+    name: str, users: list[dict], concurrency: int, call
+) -> StepResult:
+    # every user runs this step before the next step starts, so cpu and
+    # throughput are attributed to one endpoint at a time
+    result = StepResult(name)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(user: dict):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok = await call(user)
+            except Exception:
+                ok = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if ok:
+                result.latencies.append(elapsed_ms)
+            else:
+                result.errors += 1
+
+    cpu_start = time.process_time() + pool_cpu_seconds()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(user) for user in users))
+    result.wall_seconds = time.perf_counter() - wall_start
+    result.cpu_seconds = time.process_time() + pool_cpu_seconds() - cpu_start
+
+    return result
+
+
+async def run_auth_flow(users: int = 50, concurrency: int = 10) -> dict:
+    async with bench_client() as (client, sent_emails):
+        accounts = [
+            {
+                "email": f"bench{i}@example.com",
+                "password": "bench-password",
+                "full_name": f"Bench User {i}",
+                "phone_number": f"+99890{i:07d}",
+            }
+            for i in range(users)
+        ]
+
+        async def signup(user):
+            response = await client.post(
+                "/api/auth/signup",
+                json={
+                    "email": user["email"],
+                    "password": user["password"],
+                    "full_name": user["full_name"],
+                    "phone_number": user["phone_number"],
+                },
+            )
+            return response.status_code == 201
+
+        async def verify(user):
+            link = sent_emails.last_link("verification", user["email"])
+            token = link.rsplit("/", 1)[1]
+            response = await client.post(f"/api/auth/verify/{token}")
+            return response.status_code == 200
+
+        async def login(user):
+            response = await client.post(
+                "/api/auth/login",
+                json={"email": user["email"], "password": user["password"]},
+            )
+            if response.status_code != 200:
+                return False
+            body = response.json()
+            user["access_token"] = body["acess_token"]
+            user["refresh_token"] = body["refresh_token"]
+            return True
+
+        async def me(user):
+            response = await client.get(
+                "/api/auth/me",
+                headers={"Authorization": f"Bearer {user['access_token']}"},
+            )
+            return response.status_code == 200
+
+        async def refresh(user):
+            response = await client.get(
+                "/api/auth/refresh_token",
+                headers={"Authorization": f"Bearer {user['refresh_token']}"},
+            )
+            return response.status_code == 200
+
+        async def logout(user):
+            response = await client.get(
+                "/api/auth/logout",
+                headers={"Authorization": f"Bearer {user['access_token']}"},
+            )
+            return response.status_code == 200
+
+        calls = {
+            "signup": signup,
+            "verify": verify,
+            "login": login,
+            "me": me,
+            "refresh": refresh,
+            "logout": logout,
+        }
+
+        report = {}
+        for step in STEPS:
+            result = await run_step(step, accounts, concurrency, calls[step])
+            report[step] = result.summary()
+
+    return {
+        "users": users,
+        "concurrency": concurrency,
+        "python": sys.version.split()[0],
+        "steps": report,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+
+    for step, stats in current["steps"].items():
+        before = baseline["steps"].get(step)
+        if before is None:
+            continue
+
+        if before["p95_ms"] and stats["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{step}: p95 {stats['p95_ms']}ms vs baseline {before['p95_ms']}ms"
+            )
+        if stats["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{step}: {stats['throughput_rps']} req/s vs baseline "
+                f"{before['throughput_rps']} req/s"
+            )
+        if stats["errors"] > before["errors"]:
+            regressions.append(f"{step}: {stats['errors']} errors")
+
+    return regressions
+
+
+def test_auth_flow_benchmark():
+    report = asyncio.run(run_auth_flow(users=20, concurrency=5))
+
+    for step in STEPS:
+        assert report["steps"][step]["errors"] == 0, (step, report["steps"][step])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="auth flow benchmark")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_auth_flow(users=args.users, concurrency=args.concurrency))
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        return
+
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
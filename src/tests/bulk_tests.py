@@ -0,0 +1,125 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from src.tests.conf_tests import (
+    bench_client,
+    create_scratch_database,
+    create_user,
+    use_fake_redis,
+)
+
+from src.db import database, models
+from src.tours import bulk
+
+FEED = (
+    "code,from_destination,to_destination,price,is_active,"
+    "number_of_destinations,tour_highlights,description\n"
+    'T1,Bukhara,Samarkand,120.00,true,2,Registan,"two cities, one\nday"\n'
+    "T2,Khiva,Bukhara,80.50,true,2,Ichan Kala,\n"
+    "T3,Tashkent,Khiva,-5,true,2,,\n"
+)
+
+
+async def run_import_export():
+    async with bench_client() as (client, _):
+        _, headers = await create_user("admin@example.com", role="admin")
+        _, user_headers = await create_user("user@example.com")
+
+        response = await client.post(
+            "/api/tours/import", content=FEED.encode(), headers=user_headers
+        )
+        assert response.status_code == 403
+
+        response = await client.post(
+            "/api/tours/import", content=FEED.encode(), headers=headers
+        )
+        assert response.status_code == 200, response.text
+        report = response.json()
+        assert (report["inserted"], report["invalid"]) == (2, 1)
+        assert report["errors"][0]["line"] == 5
+
+        # same feed again, nothing changes
+        response = await client.post(
+            "/api/tours/import", content=FEED.encode(), headers=headers
+        )
+        assert response.json()["unchanged"] == 2
+
+        response = await client.post(
+            "/api/tours/import?format=ndjson",
+            content=b'{"code": "T2", "from_destination": "Khiva", '
+            b'"to_destination": "Nukus", "number_of_destinations": 2}\n',
+            headers=headers,
+        )
+        assert response.json()["updated"] == 1
+
+        # undecodable bytes are reported with their line, not as a 500
+        response = await client.post(
+            "/api/tours/import",
+            content=FEED.encode() + b"T4,Nukus,Khiva,1,true,2,\xff,\n",
+            headers=headers,
+        )
+        assert response.status_code == 400
+        assert response.json()["line"] == 6
+
+        response = await client.get("/api/tours/export?format=csv")
+        lines = response.text.splitlines()
+        assert lines[0].startswith("id,code,")
+        assert sum("Nukus" in line for line in lines) == 1
+
+
+def test_tour_import_export():
+    asyncio.run(run_import_export())
+
+
+async def chunks(data: bytes, size: int = 7):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+async def run_copy_import():
+    # the COPY path needs a real server, the test is skipped without one
+    url = await create_scratch_database("samanid_bulk_test")
+    use_fake_redis()
+
+    await database.dispose_engine()
+    engine = database.init_engine(url, [])
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+
+        report = await bulk.import_tours(chunks(FEED.encode()), "csv", batch_size=1)
+        assert (report.inserted, report.invalid) == (2, 1)
+        assert report.errors[0].line == 5
+
+        report = await bulk.import_tours(chunks(FEED.encode()), "csv")
+        assert (report.inserted, report.updated, report.unchanged) == (0, 0, 2)
+
+        report = await bulk.import_tours(
+            chunks(
+                b'{"code": "T2", "from_destination": "Khiva", '
+                b'"to_destination": "Nukus", "number_of_destinations": 2}\n'
+            ),
+            "ndjson",
+        )
+        assert report.updated == 1
+
+        async with database.async_session_maker() as session:
+            count = await session.scalar(select(func.count()).select_from(models.Tour))
+            description = await session.scalar(
+                select(models.Tour.description).where(models.Tour.code == "T1")
+            )
+        assert count == 2
+        assert description == "two cities, one\nday"
+
+        exported = b"".join([chunk async for chunk in bulk.export_tours_csv()])
+        lines = exported.decode().splitlines()
+        assert lines[0].startswith("id,code,")
+        assert sum("Nukus" in line for line in lines) == 1
+    finally:
+        # later tests build the sqlite engine again
+        await database.dispose_engine()
+
+
+def test_tour_import_copy():
+    asyncio.run(run_copy_import())
@@ -0,0 +1,178 @@
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, select
+
+from src.tests.conf_tests import bench_client, create_user
+
+from src.comments.feed import (
+    ID_WIDTH,
+    feed_keys,
+    get_comment_feed,
+    get_comment_writer,
+    new_comment,
+)
+from src.comments.schemas import CommentModel
+from src.db import database, models
+from src.db import redis as redis_module
+from src.metrics import registry
+
+
+def write_batches() -> float:
+    return registry.get_sample_value("comment_write_batch_size_count") or 0
+
+
+async def create_tour() -> models.Tour:
+    async with database.async_session_maker() as session:
+        tour = models.Tour(
+            from_destination="Bukhara",
+            to_destination="Khiva",
+            price=Decimal("10.00"),
+            is_active=True,
+            number_of_destinations=2,
+            tour_highlights="",
+            description="",
+        )
+        session.add(tour)
+        await session.commit()
+        return tour
+
+
+async def keyset_ids(tour_id: int) -> list[int]:
+    async with database.async_session_maker() as session:
+        statement = (
+            select(models.Comment.id)
+            .where(models.Comment.tour_id == tour_id)
+            .order_by(models.Comment.created_at.desc(), models.Comment.id.desc())
+        )
+        return list((await session.execute(statement)).scalars())
+
+
+async def run_comment_feed():
+    async with bench_client() as (client, _):
+        user_id, headers = await create_user("writer@example.com")
+        tour = await create_tour()
+        url = f"/api/comments/tours/{tour.id}"
+
+        statements = []
+        event.listen(
+            database.engine.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+
+        # concurrent posts share transactions
+        batches = write_batches()
+        responses = await asyncio.gather(
+            *(
+                client.post(url, json={"message": f"comment {i}"}, headers=headers)
+                for i in range(25)
+            )
+        )
+        assert all(response.status_code == 201 for response in responses)
+        assert len({response.json()["id"] for response in responses}) == 25
+        assert write_batches() - batches < 25
+
+        # a row the database rejects fails its own request, not the batch
+        other = await create_tour()
+        comments = [
+            new_comment(user_id, "writer", other.id, f"batched {i}") for i in range(5)
+        ]
+        comments[2].user_id = None
+        batches = write_batches()
+        results = await asyncio.gather(
+            *(get_comment_writer().submit(comment) for comment in comments),
+            return_exceptions=True,
+        )
+        assert write_batches() - batches == 1
+        assert isinstance(results[2], Exception)
+        assert [result.message for result in results[:2] + results[3:]] == [
+            "batched 0",
+            "batched 1",
+            "batched 3",
+            "batched 4",
+        ]
+
+        response = await client.post(
+            "/api/comments/tours/999999", json={"message": "lost"}, headers=headers
+        )
+        assert response.status_code == 404
+
+        # first read loads the list from the database, later ones never do
+        first = (await client.get(url)).json()
+        assert len(first["results"]) == 20 and first["next_cursor"]
+
+        response = await client.post(url, json={"message": "newest"}, headers=headers)
+        statements.clear()
+        page = (await client.get(url)).json()
+        assert [s for s in statements if "FROM comments" in s] == []
+        assert page["results"][0]["message"] == "newest"
+        assert page["results"][0]["author_name"] == "writer"
+
+        # a push for a comment the list already holds is dropped
+        await get_comment_feed().push(CommentModel.model_validate(response.json()))
+        newest = feed_keys(tour.id)[0]
+        assert await redis_module.redis_client.zcard(newest) == 26
+
+        # older pages are cached as they are read
+        older = await client.get(url, params={"cursor": page["next_cursor"]})
+        assert len(older.json()["results"]) == 6
+        assert older.json()["next_cursor"] is None
+        statements.clear()
+        again = await client.get(url, params={"cursor": page["next_cursor"]})
+        assert again.content == older.content
+        assert statements == []
+
+        # a worker with a slow clock pushes a comment dated before some that
+        # are already in the set. it goes where the keyset puts it, so page
+        # two neither skips nor repeats anything.
+        before = datetime.fromisoformat(page["results"][5]["created_at"])
+        async with database.async_session_maker() as session:
+            late = models.Comment(
+                user_id=user_id,
+                author_name="writer",
+                tour_id=tour.id,
+                message="late",
+                created_at=before - timedelta(microseconds=1),
+            )
+            session.add(late)
+            await session.commit()
+        await get_comment_feed().push(CommentModel.model_validate(late))
+
+        first = (await client.get(url)).json()
+        second = (
+            await client.get(url, params={"cursor": first["next_cursor"]})
+        ).json()
+        ids = [comment["id"] for comment in first["results"] + second["results"]]
+        assert ids == await keyset_ids(tour.id)
+        assert first["results"][6]["message"] == "late"
+
+        # pushes keep the set expiring, also when the fill found nothing
+        assert await redis_module.redis_client.ttl(newest) > 0
+        empty = await create_tour()
+        empty_url = f"/api/comments/tours/{empty.id}"
+        assert (await client.get(empty_url)).json()["results"] == []
+        response = await client.post(
+            empty_url, json={"message": "first"}, headers=headers
+        )
+        assert await redis_module.redis_client.ttl(feed_keys(empty.id)[0]) > 0
+
+        # the duplicate check looks at members with the same score, another
+        # comment written in the same microsecond still goes in
+        first = CommentModel.model_validate(response.json())
+        twin = first.model_copy(update={"id": first.id + 1})
+        await get_comment_feed().push(twin)
+        await get_comment_feed().push(twin)
+        await get_comment_feed().push(first)
+        newest = feed_keys(empty.id)[0]
+        members = await redis_module.redis_client.zrange(newest, 0, -1)
+        ids = [
+            CommentModel.model_validate_json(member[ID_WIDTH + 1 :]).id
+            for member in members
+        ]
+        assert ids == [first.id, twin.id]
+
+
+def test_comment_feed():
+    asyncio.run(run_comment_feed())
@@ -0,0 +1,139 @@
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+# settings are read on first use, the stand-in environment goes in before that
+_db_dir = tempfile.mkdtemp(prefix="samanid-bench-")
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{Path(_db_dir) / 'bench.db'}"
+)
+os.environ.setdefault("JWT_SECRET", "bench-secret-key-with-enough-length")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("MAIL_USERNAME", "bench")
+os.environ.setdefault("MAIL_PASSWORD", "bench")
+os.environ.setdefault("MAIL_FROM", "bench@example.com")
+os.environ.setdefault("MAIL_PORT", "1025")
+os.environ.setdefault("MAIL_SERVER", "localhost")
+os.environ.setdefault("MAIL_FROM_NAME", "Samanid Travel")
+os.environ.setdefault("DOMAIN", "localhost")
+os.environ.setdefault("ACCESS_LOG_SAMPLE_RATE", "0")
+os.environ.setdefault("ACCESS_LOG_SLOW_MS", "60000")
+# the benchmark logs every user in from one address
+os.environ.setdefault("LOGIN_IP_LIMIT", "1000000")
+
+import asyncpg  # noqa: E402
+import fakeredis  # noqa: E402
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from src.auth import routes as auth_routes  # noqa: E402
+from src.auth.cache import get_principal_cache, get_token_cache  # noqa: E402
+from src.auth.utils import create_access_token  # noqa: E402
+from src.db import database, models  # noqa: E402
+from src.db import redis as redis_module  # noqa: E402
+from src.db.main import app  # noqa: E402
+from src.tours.cache import get_tour_cache  # noqa: E402
+
+BASE_URL = "http://localhost"
+# server for the postgres only paths, tests needing it skip without one
+POSTGRES_URL = os.environ.get(
+    "POSTGRES_TEST_URL", "postgresql://postgres@localhost/postgres"
+)
+
+
+class SentEmails:
+    # records what the routes write to the email outbox
+    def __init__(self, enqueue):
+        self.enqueue = enqueue
+        self.calls: list[tuple] = []
+
+    def __call__(self, session, recipients: list[str], template_id: str, params: dict):
+        self.calls.append((recipients, template_id, params))
+        self.enqueue(session, recipients, template_id, params)
+
+    def last_link(self, template_id: str, email: str) -> str:
+        for recipients, sent_template, params in reversed(self.calls):
+            if sent_template == template_id and email in recipients:
+                return params["link"]
+        raise LookupError(f"no {template_id} email for {email}")
+
+
+def use_fake_redis():
+    client = fakeredis.FakeAsyncRedis()
+    # everything built on redis reaches the client through get_redis()
+    redis_module.redis_client = client
+    redis_module.get_breaker().record_success()
+    return client
+
+
+@asynccontextmanager
+async def bench_client():
+    # app against sqlite + fakeredis, lifespan included, no network
+    use_fake_redis()
+    # users are recreated with new ids, nothing cached may outlive the db
+    get_principal_cache().clear()
+    get_token_cache().clear()
+    get_tour_cache().l1.clear()
+    original_enqueue = auth_routes.enqueue_email
+    sent_emails = SentEmails(original_enqueue)
+    auth_routes.enqueue_email = sent_emails
+
+    engine = database.init_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with database.async_session_maker() as session:
+        session.add_all([models.Role(role="user"), models.Role(role="admin")])
+        await session.commit()
+
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url=BASE_URL) as client:
+                yield client, sent_emails
+    finally:
+        auth_routes.enqueue_email = original_enqueue
+        await database.dispose_engine()
+
+
+async def create_user(email: str, role: str = "user") -> tuple[int, dict]:
+    # verified user straight in the database, returns its id and auth headers
+    async with database.async_session_maker() as session:
+        role_row = (
+            await session.execute(select(models.Role).where(models.Role.role == role))
+        ).scalar_one()
+        user = models.User(
+            role_id=role_row.id,
+            full_name=email.split("@")[0],
+            phone_number=email,
+            email=email,
+            password_hash="unused",
+            is_verified=True,
+        )
+        session.add(user)
+        await session.commit()
+
+    token = create_access_token(user_data={"email": email, "user_uid": str(user.id)})
+    return user.id, {"Authorization": f"Bearer {token}"}
+
+
+async def create_scratch_database(name: str) -> str:
+    # a database of its own, so a test never touches existing tables
+    try:
+        conn = await asyncpg.connect(
+            POSTGRES_URL.replace("postgresql+asyncpg://", "postgresql://", 1)
+        )
+    except (OSError, asyncpg.PostgresError) as e:
+        pytest.skip(f"postgres not available: {e}")
+
+    try:
+        await conn.execute(f"DROP DATABASE IF EXISTS {name}")
+        await conn.execute(f"CREATE DATABASE {name}")
+    finally:
+        await conn.close()
+
+    url = make_url(POSTGRES_URL).set(database=name)
+    return url.render_as_string(hide_password=False)
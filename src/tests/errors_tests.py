@@ -0,0 +1,87 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from fastapi.responses import JSONResponse
+
+from src.tests import conf_tests  # noqa: F401  stand-in env for the settings
+
+from src.errors import InvalidToken, create_exception_handler
+
+STATUS_CODE = 401
+DETAIL = {
+    "message": "Token is invalid Or expired",
+    "resolution": "Please get new token",
+    "error_code": "invalid_token",
+}
+
+
+def legacy_exception_handler(status_code: int, initial_detail: dict):
+    # what every handler did before: a new JSONResponse and json.dumps per raise
+    async def exception_handler(request, exc):
+        return JSONResponse(content=initial_detail, status_code=status_code)
+
+    return exception_handler
+
+
+async def time_handler(handler, iterations: int) -> float:
+    exc = InvalidToken()
+
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        await handler(None, exc)
+
+    return (time.perf_counter_ns() - start) / iterations
+
+
+async def measure(iterations: int = 100_000) -> dict:
+    handlers = {
+        "before": legacy_exception_handler(STATUS_CODE, DETAIL),
+        "after": create_exception_handler(STATUS_CODE, DETAIL),
+    }
+
+    # warm up, then best of three
+    report = {}
+    for name, handler in handlers.items():
+        await time_handler(handler, 1000)
+        runs = [await time_handler(handler, iterations) for _ in range(3)]
+        report[name] = {"ns_per_error": round(min(runs))}
+
+    report["speedup"] = round(
+        report["before"]["ns_per_error"] / report["after"]["ns_per_error"], 2
+    )
+
+    return {"iterations": iterations, "python": sys.version.split()[0], **report}
+
+
+def test_prebuilt_error_matches_legacy_response():
+    async def responses():
+        legacy = await legacy_exception_handler(STATUS_CODE, DETAIL)(None, None)
+        handler = create_exception_handler(STATUS_CODE, DETAIL)
+        first = await handler(None, None)
+        second = await handler(None, None)
+        return legacy, first, second
+
+    legacy, first, second = asyncio.run(responses())
+
+    assert json.loads(first.body) == json.loads(legacy.body)
+    assert first.status_code == legacy.status_code
+    assert sorted(first.raw_headers) == sorted(legacy.raw_headers)
+
+    # middleware adding a header to one response must not leak into the next
+    first.headers["X-Request-Id"] = "1"
+    assert "x-request-id" not in second.headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="error response micro-benchmark")
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(measure(args.iterations)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
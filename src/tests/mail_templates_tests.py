@@ -0,0 +1,56 @@
+import pytest
+from jinja2 import UndefinedError
+
+from src import mail_templates
+from src.mail_templates import EMAIL_TEMPLATES, load_templates, render_email
+
+LINK = "https://example.com/verify/abc?next=/a&b=<c>"
+
+
+@pytest.mark.parametrize("template_id", ["verification", "password_reset"])
+def test_link_templates_render(template_id):
+    subject, text, html = render_email(template_id, {"link": LINK})
+
+    assert subject == EMAIL_TEMPLATES[template_id]
+    assert text.startswith(subject)
+    # plain text keeps the link as is, html escapes it inside the attribute
+    assert LINK in text
+    assert 'href="https://example.com/verify/abc?next=/a&amp;b=&lt;c&gt;"' in html
+    assert html.startswith("<!DOCTYPE html>")
+    assert f"<h1>{subject}</h1>" in html
+
+
+def test_welcome_renders_without_params():
+    subject, text, html = render_email("welcome", {})
+
+    assert subject == "Welcome to the app"
+    assert text.strip() == subject
+    assert "<h1>Welcome to the app</h1>" in html
+
+
+def test_unknown_template_or_missing_param_fails_loudly():
+    with pytest.raises(KeyError):
+        render_email("newsletter", {})
+
+    # StrictUndefined, a missing link is an error and not an empty href
+    with pytest.raises(UndefinedError):
+        render_email("verification", {})
+
+
+def test_rendering_uses_the_precompiled_templates():
+    load_templates()
+    assert set(mail_templates._compiled) == set(EMAIL_TEMPLATES)
+
+    for template_id in EMAIL_TEMPLATES:
+        render_email(template_id, {"link": LINK})
+
+    # base.html included, nothing is read from disk again
+    loader = mail_templates.env.loader
+    reads = []
+    loader.get_source = lambda *args: reads.append(args[1])
+    try:
+        for template_id in EMAIL_TEMPLATES:
+            render_email(template_id, {"link": LINK})
+    finally:
+        del loader.get_source
+    assert reads == []
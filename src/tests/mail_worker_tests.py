@@ -0,0 +1,111 @@
+import asyncio
+import json
+import socket
+
+import fakeredis
+from aiosmtpd.controller import Controller
+
+from src.tests import conf_tests  # noqa: F401  stand-in env for the settings
+
+from src.mail_worker import (
+    DEAD_LETTER_QUEUE,
+    EMAIL_QUEUE,
+    LEASE_PREFIX,
+    PROCESSING_PREFIX,
+    EmailBatchWorker,
+    SMTPConnectionPool,
+)
+
+
+class Inbox:
+    # aiosmtpd handler, answers with the queued replies before accepting
+    def __init__(self):
+        self.subjects: list[str] = []
+        self.peers: set = set()
+        self.replies: list[str] = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.peers.add(session.peer)
+        if self.replies:
+            return self.replies.pop(0)
+
+        for line in envelope.content.decode().splitlines():
+            if line.startswith("Subject: "):
+                self.subjects.append(line.removeprefix("Subject: "))
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def payload(i: int) -> str:
+    return json.dumps(
+        {"recipients": [f"user{i}@example.com"], "subject": f"mail {i}", "body": "hi"}
+    )
+
+
+async def run_mail_worker(inbox: Inbox, port: int):
+    client = fakeredis.FakeAsyncRedis()
+    pool = SMTPConnectionPool(size=2, hostname="127.0.0.1", port=port)
+    worker = EmailBatchWorker(
+        client,
+        pool,
+        batch_size=10,
+        flush_interval=0.1,
+        max_retries=2,
+        retry_backoff=0.01,
+        lease_seconds=30,
+    )
+
+    try:
+        await client.rpush(EMAIL_QUEUE, *(payload(i) for i in range(6)))
+        inbox.replies = ["451 try again later"]
+        assert await worker.run_once() == 6
+        assert sorted(inbox.subjects) == [f"mail {i}" for i in range(6)]
+        assert worker.metrics.batches == 1
+        assert worker.metrics.retries == 1
+        # sent entries are acknowledged
+        assert await client.llen(EMAIL_QUEUE) == 0
+        assert await client.llen(worker.processing_key) == 0
+
+        # a permanent failure is dead lettered and acknowledged as well
+        await client.rpush(EMAIL_QUEUE, payload(6))
+        inbox.replies = ["550 no such user"]
+        assert await worker.run_once() == 1
+        assert await client.lrange(DEAD_LETTER_QUEUE, 0, -1) == [payload(6).encode()]
+        assert await client.llen(worker.processing_key) == 0
+
+        # both batches went over the same two pooled connections
+        assert pool.connects == 2
+        assert len(inbox.peers) == 2
+
+        # a crashed worker's entries go back in order, a live one's stay
+        await client.rpush(f"{PROCESSING_PREFIX}crashed", payload(7), payload(8))
+        await client.rpush(f"{PROCESSING_PREFIX}alive", payload(9))
+        await client.set(f"{LEASE_PREFIX}alive", "", ex=30)
+        assert await worker.reap() == 2
+        assert await client.lrange(EMAIL_QUEUE, 0, -1) == [
+            payload(7).encode(),
+            payload(8).encode(),
+        ]
+        assert await client.llen(f"{PROCESSING_PREFIX}alive") == 1
+
+        assert await worker.run_once() == 2
+        assert inbox.subjects[-2:] == ["mail 7", "mail 8"]
+    finally:
+        await pool.close()
+        await client.aclose()
+
+
+def test_mail_worker():
+    inbox = Inbox()
+    port = free_port()
+    controller = Controller(inbox, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        asyncio.run(run_mail_worker(inbox, port))
+    finally:
+        controller.stop()
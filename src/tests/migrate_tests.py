@@ -0,0 +1,157 @@
+import asyncio
+import tempfile
+from pathlib import Path
+
+import asyncpg
+import pytest
+
+from src.tests.conf_tests import create_scratch_database
+
+from src.db import migrate
+
+
+def write_migrations(files: dict[str, str]) -> Path:
+    directory = Path(tempfile.mkdtemp(prefix="samanid-migrations-"))
+    for name, sql in files.items():
+        (directory / name).write_text(sql)
+    return directory
+
+
+def test_migrations_load_in_version_order():
+    directory = write_migrations(
+        {
+            "10-last.sql": "",
+            "2-second.sql": "",
+            "001-first.sql": "",
+            "notes.txt": "",
+            "draft.sql": "",
+        }
+    )
+    assert [m.version for m in migrate.load_migrations(directory)] == [1, 2, 10]
+
+    (directory / "02-again.sql").write_text("")
+    with pytest.raises(ValueError):
+        migrate.load_migrations(directory)
+
+    # every file the repo ships follows the naming scheme
+    shipped = migrate.load_migrations()
+    assert [m.path.name for m in shipped] == sorted(
+        path.name for path in migrate.MIGRATIONS_DIR.glob("*.sql")
+    )
+
+
+async def connect(url: str) -> asyncpg.Connection:
+    return await asyncpg.connect(migrate.get_dsn(url))
+
+
+async def run_upgrade():
+    directory = write_migrations(
+        {
+            "1-create.sql": "CREATE TABLE things (id INT PRIMARY KEY);",
+            "2-column.sql": "ALTER TABLE things ADD COLUMN name VARCHAR;",
+            "3-seed.sql": "INSERT INTO things (id, name) VALUES (1, 'a');",
+        }
+    )
+    url = await create_scratch_database("samanid_migrate_test")
+    conn = await connect(url)
+    other = await connect(url)
+    try:
+        # later files depend on earlier ones, so order matters
+        assert await migrate.upgrade(conn, directory) == [1, 2, 3]
+        assert await migrate.upgrade(conn, directory) == []
+        rows = await conn.fetch(
+            "SELECT version, name FROM schema_migrations ORDER BY version"
+        )
+        assert [tuple(row) for row in rows] == [
+            (1, "create"),
+            (2, "column"),
+            (3, "seed"),
+        ]
+
+        # a failing file leaves neither its changes nor a version row
+        (directory / "4-broken.sql").write_text(
+            "INSERT INTO things (id) VALUES (2); SELECT missing FROM things;"
+        )
+        with pytest.raises(asyncpg.PostgresError):
+            await migrate.upgrade(conn, directory)
+        assert await conn.fetchval("SELECT COUNT(*) FROM things") == 1
+        assert (await migrate.status(conn, directory))[-1]["applied"] is False
+        (directory / "4-broken.sql").unlink()
+
+        # edits to an applied file are reported, not run again
+        (directory / "2-column.sql").write_text("SELECT 1;")
+        rows = await migrate.status(conn, directory)
+        assert [(row["applied"], row["changed"]) for row in rows] == [
+            (True, False),
+            (True, True),
+            (True, False),
+        ]
+        assert await migrate.upgrade(conn, directory) == []
+
+        # a second runner waits for the lock instead of applying alongside
+        (directory / "4-more.sql").write_text("INSERT INTO things VALUES (4, 'd');")
+        await other.execute("SELECT pg_advisory_lock($1)", migrate.ADVISORY_LOCK_ID)
+        runner = asyncio.create_task(migrate.upgrade(conn, directory))
+        await asyncio.sleep(0.2)
+        assert not runner.done()
+        assert await other.fetchval("SELECT COUNT(*) FROM things") == 1
+
+        await other.execute("SELECT pg_advisory_unlock($1)", migrate.ADVISORY_LOCK_ID)
+        assert await asyncio.wait_for(runner, 5) == [4]
+        assert await other.fetchval("SELECT COUNT(*) FROM things") == 2
+    finally:
+        await other.close()
+        await conn.close()
+
+
+def test_upgrade_applies_in_order_once():
+    asyncio.run(run_upgrade())
+
+
+async def run_baseline():
+    url = await create_scratch_database("samanid_migrate_test")
+    conn = await connect(url)
+    try:
+        # 001 run by hand, as on the databases that predate the runner
+        shipped = migrate.load_migrations()
+        await conn.execute(shipped[0].sql)
+
+        applied = await migrate.upgrade(conn)
+        assert applied == [m.version for m in shipped[1:]]
+        assert all(row["applied"] for row in await migrate.status(conn))
+
+        # the migrated schema is empty, so check may seed it
+        results = await migrate.check_indexes(conn)
+        assert set(results) == set(migrate.HOT_QUERIES)
+        assert await conn.fetchval("SELECT COUNT(*) FROM tours") == 0
+
+        await conn.execute(
+            "INSERT INTO users (email, password_hash) VALUES ('a@b.c', 'x')"
+        )
+        with pytest.raises(ValueError):
+            await migrate.check_indexes(conn)
+    finally:
+        await conn.close()
+
+
+def test_upgrade_records_hand_run_init():
+    asyncio.run(run_baseline())
+
+
+async def run_stamp():
+    url = await create_scratch_database("samanid_migrate_test")
+    conn = await connect(url)
+    try:
+        shipped = migrate.load_migrations()
+        await conn.execute(shipped[0].sql)
+        await conn.execute(shipped[1].sql)
+
+        assert await migrate.stamp(conn, 2) == [1, 2]
+        assert await migrate.stamp(conn, 2) == []
+        assert await migrate.upgrade(conn) == [m.version for m in shipped[2:]]
+    finally:
+        await conn.close()
+
+
+def test_stamp_records_without_running():
+    asyncio.run(run_stamp())
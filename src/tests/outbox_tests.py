@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import func, select
+
+from src.tests.conf_tests import bench_client
+
+from src.db import database, models
+from src.db import redis as redis_module
+from src.mail_outbox import OutboxRelay
+from src.mail_worker import EMAIL_QUEUE
+
+
+class BrokenQueue:
+    async def rpush(self, *args):
+        raise RedisConnectionError("redis went away")
+
+
+async def outbox_count() -> int:
+    async with database.async_session_maker() as session:
+        return (
+            await session.execute(select(func.count()).select_from(models.EmailOutbox))
+        ).scalar_one()
+
+
+async def run_outbox_relay():
+    async with bench_client() as (client, _):
+        response = await client.post(
+            "/api/auth/signup",
+            json={
+                "email": "outbox@example.com",
+                "password": "outbox-password",
+                "full_name": "Outbox User",
+                "phone_number": "+998900000001",
+            },
+        )
+        assert response.status_code == 201
+        response = await client.post(
+            "/api/auth/password-reset-request", json={"email": "outbox@example.com"}
+        )
+        assert response.status_code == 200
+        assert await outbox_count() == 2
+
+        # a failed push leaves the rows for the next attempt
+        with pytest.raises(RedisConnectionError):
+            await OutboxRelay(BrokenQueue(), 10, 0.1).relay_once()
+        assert await outbox_count() == 2
+
+        queue = redis_module.redis_client
+        relay = OutboxRelay(queue, batch_size=10, poll_interval=0.1)
+        assert await relay.relay_once() == 2
+        assert await relay.relay_once() == 0
+        assert await outbox_count() == 0
+
+        payloads = [json.loads(item) for item in await queue.lrange(EMAIL_QUEUE, 0, -1)]
+        assert [p["template_id"] for p in payloads] == ["verification", "password_reset"]
+        assert payloads[0]["recipients"] == ["outbox@example.com"]
+
+
+def test_outbox_relay():
+    asyncio.run(run_outbox_relay())
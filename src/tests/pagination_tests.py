@@ -0,0 +1,103 @@
+import asyncio
+import base64
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from src.tests.conf_tests import bench_client
+
+from src.db import database, models
+from src.db.pagination import decode_cursor, encode_cursor, stream_rows
+from src.errors import InvalidCursor
+
+
+def b64(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_cursor_round_trip():
+    row = models.Tour(id=42, created_at=datetime(2026, 3, 1, 12, 30, 15, 123456))
+    assert decode_cursor(encode_cursor(row)) == (row.created_at, 42)
+
+    for garbage in ("not a cursor!", b64({}), b64(["yesterday", 1]), b64([1])):
+        with pytest.raises(InvalidCursor):
+            decode_cursor(garbage)
+
+
+async def create_tours() -> tuple[list[int], int]:
+    # five timestamps shared by five tours each, so pages split inside ties
+    start = datetime(2026, 1, 1)
+    async with database.async_session_maker() as session:
+        tours = [
+            models.Tour(
+                from_destination="Bukhara",
+                to_destination="Khiva",
+                price=Decimal("10.00"),
+                is_active=n != 3,
+                number_of_destinations=2,
+                tour_highlights="",
+                description="",
+                created_at=start + timedelta(minutes=n % 5),
+                deleted_at=datetime(2026, 2, 1) if n == 7 else None,
+            )
+            for n in range(27)
+        ]
+        session.add_all(tours)
+        await session.commit()
+
+        # newest first, id breaks the ties
+        tours.sort(key=lambda tour: (tour.created_at, tour.id), reverse=True)
+        visible = [tour.id for tour in tours if tour.deleted_at is None]
+        inactive = next(tour.id for tour in tours if not tour.is_active)
+        return visible, inactive
+
+
+async def walk(client, limit: int) -> list[list[int]]:
+    pages = []
+    cursor = None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/tours", params=params)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages.append([tour["id"] for tour in body["results"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+async def run_keyset_pages():
+    async with bench_client() as (client, _):
+        visible, inactive = await create_tours()
+        ordered = [tour_id for tour_id in visible if tour_id != inactive]
+
+        pages = await walk(client, 7)
+        assert [len(page) for page in pages] == [7, 7, 7, 4]
+        assert sum(pages, []) == ordered
+
+        # an exact multiple ends without an empty trailing page
+        pages = await walk(client, 5)
+        assert [len(page) for page in pages] == [5] * 5
+        assert sum(pages, []) == ordered
+
+        for cursor in ("garbage", b64(["2026-01-01T00:00:00", "x"])):
+            response = await client.get("/api/tours", params={"cursor": cursor})
+            assert response.status_code == 400
+            assert response.json()["error_code"] == "invalid_cursor"
+
+        # the export streams inactive tours too, deleted ones never
+        response = await client.get("/api/tours/export")
+        assert response.headers["content-type"] == "application/x-ndjson"
+        exported = [json.loads(line)["id"] for line in response.text.splitlines()]
+        assert exported == visible
+
+        # batches smaller than the table still yield every row once, in order
+        async with database.async_session_maker() as session:
+            rows = stream_rows(session, models.Tour, batch_size=4)
+            assert [tour.id async for tour in rows] == visible
+
+
+def test_keyset_pagination():
+    asyncio.run(run_keyset_pages())
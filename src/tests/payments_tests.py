@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import func, select
+
+from src.tests.conf_tests import bench_client, create_user
+
+from src.db import database, models
+from src.payments.service import PaymentService
+
+
+async def run_payment_rollups():
+    async with bench_client() as (client, _):
+        users = [await create_user(f"payer{i}@example.com") for i in range(3)]
+        user_ids = [user_id for user_id, _ in users]
+        headers = [user_headers for _, user_headers in users]
+        _, admin_headers = await create_user("admin@example.com", role="admin")
+
+        amounts = [Decimal("10.50"), Decimal("20.00"), Decimal("5.25")]
+        responses = await asyncio.gather(
+            *(
+                client.post(
+                    "/api/payments",
+                    json={"amount": str(amount)},
+                    headers=headers[n % len(headers)],
+                )
+                for n, amount in enumerate(amounts * 4)
+            )
+        )
+        assert all(response.status_code == 201 for response in responses)
+
+        report = (
+            await client.get("/api/payments/reports/daily", headers=admin_headers)
+        ).json()
+        assert Decimal(report["total"]) == sum(amounts) * 4
+        assert report["payment_count"] == 12
+
+        # the rollups agree with a full scan of the ledger
+        async with database.async_session_maker() as session:
+            ledger_total = (
+                await session.execute(select(func.sum(models.Payment.amount)))
+            ).scalar_one()
+        assert Decimal(str(ledger_total)) == Decimal(report["total"])
+
+        top = (
+            await client.get("/api/payments/reports/users", headers=admin_headers)
+        ).json()
+        assert [row["user_id"] for row in top] == [user_ids[1], user_ids[0], user_ids[2]]
+        assert Decimal(top[0]["total"]) == Decimal("80.00")
+
+        response = await client.get(
+            "/api/payments/reports/daily?start=2026-02-01&end=2026-01-01",
+            headers=admin_headers,
+        )
+        assert response.status_code == 400
+
+
+def test_payment_rollups():
+    asyncio.run(run_payment_rollups())
+
+
+async def run_late_payment():
+    async with bench_client():
+        user_id, _ = await create_user("late@example.com")
+        now = datetime.now(timezone.utc)
+
+        # the earlier payment's transaction commits second
+        async with database.async_session_maker() as session:
+            for payment_date in (now, now - timedelta(minutes=5)):
+                payment = models.Payment(
+                    user_id=user_id, amount=Decimal("1.00"), payment_date=payment_date
+                )
+                await PaymentService().apply_to_rollups(payment, session)
+            await session.commit()
+
+            totals = await session.get(models.PaymentUserTotal, user_id)
+        assert totals.payment_count == 2
+        assert totals.last_payment_at.replace(tzinfo=None) == now.replace(tzinfo=None)
+
+
+def test_last_payment_never_moves_back():
+    asyncio.run(run_late_payment())
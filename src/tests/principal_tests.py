@@ -0,0 +1,56 @@
+import asyncio
+
+from sqlalchemy import event
+
+from src.tests.conf_tests import bench_client, create_user
+
+from src.auth.routes import user_service
+from src.db import database
+
+
+async def run_principal_cache():
+    async with bench_client() as (client, _):
+        user_id, headers = await create_user("traveller@example.com")
+        _, admin_headers = await create_user("admin@example.com", role="admin")
+
+        statements = []
+        sync_engine = database.engine.sync_engine
+        event.listen(
+            sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+
+        # first request loads user and role in one query, the next ones none
+        response = await client.get("/api/auth/me", headers=headers)
+        assert response.status_code == 200
+        assert len([s for s in statements if "FROM users" in s]) == 1
+        assert "JOIN roles" in statements[-1]
+
+        statements.clear()
+        for _ in range(3):
+            assert (await client.get("/api/auth/me", headers=headers)).status_code == 200
+        assert statements == []
+
+        # role checks come from the cached principal too
+        response = await client.patch(
+            "/api/tours/1", json={"price": "1.00"}, headers=headers
+        )
+        assert response.status_code == 403
+        response = await client.patch(
+            "/api/tours/1", json={"price": "1.00"}, headers=admin_headers
+        )
+        assert response.status_code == 404
+
+        # update_user drops the cached principal
+        async with database.async_session_maker() as session:
+            user = await user_service.get_user_by_email("traveller@example.com", session)
+            await user_service.update_user(user, {"full_name": "Renamed"}, session)
+
+        response = await client.get("/api/auth/me", headers=headers)
+        assert response.json()["full_name"] == "Renamed"
+        assert response.json()["id"] == user_id
+
+
+def test_principal_cache():
+    asyncio.run(run_principal_cache())
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import pstats
+import tempfile
+import threading
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from src.tests import conf_tests  # noqa: F401  stand-in env for the settings
+
+from src.profiling import PROFILE_HEADER, RequestProfiler, span
+
+
+def profiled_app(profiler: RequestProfiler) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/slow")
+    async def slow():
+        with span("db.query"):
+            await asyncio.sleep(0.02)
+        with span("render"):
+            sum(range(10_000))
+        return {"ok": True}
+
+    app.add_middleware(BaseHTTPMiddleware, dispatch=profiler.profile)
+    return app
+
+
+async def get(app: FastAPI, headers: dict | None = None) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get("/api/slow", headers=headers)
+
+
+def profiler(mode: str) -> RequestProfiler:
+    output_dir = tempfile.mkdtemp(prefix="samanid-profiles-")
+    return RequestProfiler(
+        output_dir=output_dir,
+        sample_rate=1.0,
+        admin_token="secret",
+        mode=mode,
+        interval=0.001,
+    )
+
+
+def test_sampled_request_writes_profile_files():
+    request_profiler = profiler("sample")
+    writers = []
+    write = request_profiler.write
+
+    def recording_write(*args):
+        writers.append(threading.get_ident())
+        write(*args)
+
+    request_profiler.write = recording_write
+    response = asyncio.run(get(profiled_app(request_profiler)))
+
+    assert response.status_code == 200
+    # written from a worker thread, not the one running the event loop
+    assert writers and threading.get_ident() not in writers
+    timings = response.headers["Server-Timing"].split(", ")
+    assert [timing.split(";")[0] for timing in timings] == ["db-query", "render"]
+    assert float(timings[0].split("dur=")[1]) >= 20
+
+    files = sorted(Path(request_profiler.output_dir).iterdir())
+    assert [path.name.split("-", 1)[1] for path in files] == [
+        "GET-api-slow.folded",
+        "GET-api-slow.spans.json",
+    ]
+    # collapsed stacks, "frame;frame;frame count" per line
+    collapsed = files[0].read_text()
+    assert collapsed
+    for line in collapsed.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert ";" in stack and int(count) > 0
+    spans = json.loads(files[1].read_text())
+    assert [name for name, _ in spans] == ["db.query", "render"]
+    assert request_profiler.busy is False
+
+
+def test_cprofile_mode_writes_stats():
+    request_profiler = profiler("cprofile")
+    response = asyncio.run(get(profiled_app(request_profiler)))
+
+    assert "db-query" in response.headers["Server-Timing"]
+    (prof,) = Path(request_profiler.output_dir).glob("*.prof")
+    assert pstats.Stats(str(prof)).total_calls > 0
+
+
+def test_profile_header_needs_the_admin_token():
+    request_profiler = profiler("sample")
+    request_profiler.sample_rate = 0.0
+
+    class Request:
+        def __init__(self, headers):
+            self.headers = headers
+
+    assert request_profiler.wanted(Request({PROFILE_HEADER: "secret"}))
+    assert not request_profiler.wanted(Request({PROFILE_HEADER: "guess"}))
+    assert not request_profiler.wanted(Request({}))
@@ -0,0 +1,70 @@
+import asyncio
+
+from src.tests.conf_tests import bench_client, create_user
+
+from src.auth.utils import generate_hash_password
+from src.config import Config
+from src.db import database, models
+from src.metrics import RATE_LIMIT_DECISIONS
+from src.rate_limit import login_rate_limit
+
+
+def decisions(outcome: str) -> float:
+    return RATE_LIMIT_DECISIONS.labels(scope="login", outcome=outcome)._value.get()
+
+
+async def run_login_rate_limit():
+    login_rate_limit.blocked.clear()
+    attempt = {"email": "victim@example.com", "password": "wrong-password"}
+
+    async with bench_client() as (client, _):
+        for _ in range(Config.LOGIN_EMAIL_LIMIT):
+            response = await client.post("/api/auth/login", json=attempt)
+            assert response.status_code == 400, response.text
+
+        limited_before = decisions("limited")
+        response = await client.post("/api/auth/login", json=attempt)
+        assert response.status_code == 429
+        retry_after = int(response.headers["Retry-After"])
+        assert 0 < retry_after <= Config.LOGIN_EMAIL_WINDOW
+        assert decisions("limited") == limited_before + 1
+
+        # the worker now rejects this email without asking redis
+        local_before = decisions("local_limited")
+        response = await client.post(
+            "/api/auth/login", json={**attempt, "email": "Victim@Example.com"}
+        )
+        assert response.status_code == 429
+        assert decisions("local_limited") == local_before + 1
+
+        # other emails from the same address are unaffected
+        response = await client.post(
+            "/api/auth/login", json={**attempt, "email": "someone@example.com"}
+        )
+        assert response.status_code == 400
+
+        # successful logins do not count toward the email limit
+        user_id, _ = await create_user("regular@example.com")
+        async with database.async_session_maker() as session:
+            user = await session.get(models.User, user_id)
+            user.password_hash = generate_hash_password("right-password")
+            await session.commit()
+        login = {"email": "regular@example.com", "password": "right-password"}
+        for _ in range(Config.LOGIN_EMAIL_LIMIT + 1):
+            response = await client.post("/api/auth/login", json=login)
+            assert response.status_code == 200, response.text
+
+        # while failures still do, after the successful ones
+        for _ in range(Config.LOGIN_EMAIL_LIMIT):
+            response = await client.post(
+                "/api/auth/login", json={**login, "password": "wrong-password"}
+            )
+            assert response.status_code == 400
+        response = await client.post("/api/auth/login", json=login)
+        assert response.status_code == 429
+
+    login_rate_limit.blocked.clear()
+
+
+def test_login_rate_limit():
+    asyncio.run(run_login_rate_limit())
@@ -0,0 +1,181 @@
+import asyncio
+import time
+import uuid
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+
+from src.tests.conf_tests import bench_client, create_user, use_fake_redis
+
+from src.db import redis as redis_module
+from src.db.redis import (
+    CircuitBreaker,
+    CircuitOpenError,
+    JTI_PREFIX,
+    LocalBlocklist,
+    add_jti_to_blocklist,
+    create_client,
+    token_in_blocklist,
+)
+from src.errors import RevocationCheckUnavailable
+
+
+async def run_batched_commands():
+    client = use_fake_redis()
+    await client.set("a", "1")
+
+    pipelines = []
+    original_pipeline = client.pipeline
+
+    def counting_pipeline(*args, **kwargs):
+        pipelines.append(1)
+        return original_pipeline(*args, **kwargs)
+
+    client.pipeline = counting_pipeline
+    script = client.register_script("return #KEYS")
+
+    batcher = redis_module.get_command_batcher()
+    results = await asyncio.gather(
+        *(batcher.call("GET", key) for key in ["a", "b"] * 10),
+        batcher.run_script(script, keys=["x", "y"], args=[]),
+    )
+    # one round trip for everything issued in the same tick
+    assert results[:2] == [b"1", None]
+    assert results[-1] == 2
+    # the first EVALSHA missed, the script was loaded outside the batch
+    assert len(pipelines) == 1
+
+    # errors stay with the command that caused them
+    await client.set("s", "text")
+    with pytest.raises(Exception):
+        await batcher.call("INCR", "s")
+    assert await batcher.call("INCR", "n") == 1
+
+
+def test_batched_commands():
+    asyncio.run(run_batched_commands())
+
+
+async def run_breaker():
+    # nothing listens on port 1, connects are refused right away
+    client = create_client("redis://127.0.0.1:1/0")
+    redis_module.breaker = CircuitBreaker(threshold=2, reset_seconds=0.2)
+
+    try:
+        for _ in range(2):
+            with pytest.raises(RedisConnectionError) as e:
+                await client.get("key")
+            assert not isinstance(e.value, CircuitOpenError)
+
+        start = time.perf_counter()
+        with pytest.raises(CircuitOpenError):
+            await client.get("key")
+        assert time.perf_counter() - start < 0.01
+
+        # after the reset period one trial call goes through, and fails again
+        await asyncio.sleep(0.25)
+        with pytest.raises(RedisConnectionError) as e:
+            await client.get("key")
+        assert not isinstance(e.value, CircuitOpenError)
+        assert redis_module.breaker.state == "open"
+    finally:
+        # rebuilt from the settings on next use
+        redis_module.breaker = None
+        await client.aclose(close_connection_pool=True)
+
+
+def test_circuit_breaker():
+    asyncio.run(run_breaker())
+
+
+def test_breaker_trial_ends_on_any_outcome():
+    breaker = CircuitBreaker(threshold=1, reset_seconds=0)
+
+    # an error reply from the trial call closes the circuit
+    breaker.record_failure()
+    with pytest.raises(ResponseError):
+        with breaker.guard():
+            raise ResponseError("WRONGTYPE")
+    assert breaker.state == "closed"
+
+    # a cancelled trial leaves it half open for the next caller
+    breaker.record_failure()
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.guard():
+            raise asyncio.CancelledError()
+    assert breaker.state == "half_open"
+
+    with breaker.guard():
+        pass
+    assert breaker.state == "closed"
+
+
+async def run_blocklist_outage():
+    async with bench_client() as (client, _):
+        _, headers = await create_user("outage@example.com")
+        fake = redis_module.redis_client
+        blocklist = redis_module.get_local_blocklist()
+
+        # nothing listens on port 1, every lookup fails, then the circuit opens
+        redis_module.redis_client = create_client("redis://127.0.0.1:1/0")
+        redis_module.breaker = CircuitBreaker(threshold=2, reset_seconds=60)
+        blocklist.synced = False
+        loaded, blocklist.loaded = blocklist.loaded, False
+        try:
+            for _ in range(3):
+                with pytest.raises(RevocationCheckUnavailable):
+                    await token_in_blocklist("some-jti")
+            assert redis_module.breaker.state == "open"
+
+            # fails closed, as an error the client can retry on
+            response = await client.get("/api/auth/me", headers=headers)
+            assert response.status_code == 503
+            assert response.json()["error_code"] == "revocation_check_unavailable"
+
+            # a copy loaded before the outage answers instead
+            local = LocalBlocklist(resync_interval=60)
+            local.loaded = True
+            local.add("revoked-jti")
+            redis_module.local_blocklist = local
+            assert await token_in_blocklist("revoked-jti") is True
+            assert await token_in_blocklist("other-jti") is False
+        finally:
+            await redis_module.redis_client.aclose(close_connection_pool=True)
+            redis_module.redis_client = fake
+            redis_module.breaker = None
+            redis_module.local_blocklist = blocklist
+            blocklist.loaded = loaded
+
+
+def test_blocklist_lookup_during_redis_outage():
+    asyncio.run(run_blocklist_outage())
+
+
+async def run_legacy_revocations():
+    client = use_fake_redis()
+    legacy, current, other = (str(uuid.uuid4()) for _ in range(3))
+    # written before the jti: prefix, under the bare jti
+    await client.set(legacy, "", ex=600)
+    await client.set("tours:detail:1", "not a jti")
+
+    blocklist = redis_module.get_local_blocklist()
+    redis_module.local_blocklist = LocalBlocklist(resync_interval=60)
+    try:
+        await add_jti_to_blocklist(current)
+        assert await client.exists(f"{JTI_PREFIX}{current}")
+
+        # redis lookups see both key schemes
+        assert await token_in_blocklist(legacy) is True
+        assert await token_in_blocklist(current) is True
+        assert await token_in_blocklist(other) is False
+
+        local = LocalBlocklist(resync_interval=60)
+        await local.resync()
+        assert set(local._revoked) == {legacy, current}
+        assert local.contains(legacy) and not local.contains(other)
+    finally:
+        redis_module.local_blocklist = blocklist
+
+
+def test_blocklist_reads_keys_from_before_the_prefix():
+    asyncio.run(run_legacy_revocations())
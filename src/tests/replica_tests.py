@@ -0,0 +1,100 @@
+import asyncio
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import text
+
+from src.tests.conf_tests import create_scratch_database
+
+from src.db import database, models
+from src.metrics import registry
+
+
+async def create_db(url: str, description: str) -> None:
+    engine = database.create_engine(url)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+        await conn.execute(
+            models.Tour.__table__.insert().values(
+                from_destination="Bukhara",
+                to_destination="Samarkand",
+                number_of_destinations=2,
+                tour_highlights="",
+                description=description,
+            )
+        )
+    await engine.dispose()
+
+
+async def read_description(primary: bool = False) -> str:
+    async with database.read_session(primary=primary) as session:
+        result = await session.execute(text("SELECT description FROM tours"))
+        return result.scalar_one()
+
+
+async def run_replica_routing():
+    directory = Path(tempfile.mkdtemp(prefix="samanid-replicas-"))
+    primary_url = f"sqlite+aiosqlite:///{directory / 'primary.db'}"
+    replica_url = f"sqlite+aiosqlite:///{directory / 'replica.db'}"
+    # sqlite cannot open a file in a missing directory, so this one is down
+    broken_url = f"sqlite+aiosqlite:///{directory / 'missing' / 'replica.db'}"
+
+    await create_db(primary_url, "primary")
+    await create_db(replica_url, "replica")
+
+    database.init_engine(primary_url, [replica_url, broken_url])
+    try:
+        await database.replicas.check()
+        assert database.replicas.healthy == [True, False]
+
+        # round robin never lands on the broken replica
+        assert [await read_description() for _ in range(4)] == ["replica"] * 4
+        assert await read_description(primary=True) == "primary"
+
+        database.replicas.mark_down(0, RuntimeError("test"))
+        assert await read_description() == "primary"
+
+        await database.replicas.check()
+        assert await read_description() == "replica"
+
+        assert not database.is_pinned("user@example.com")
+        database.pin_to_primary("user@example.com")
+        assert database.is_pinned("user@example.com")
+    finally:
+        await database.dispose_engine()
+
+
+def test_reads_route_to_healthy_replicas():
+    asyncio.run(run_replica_routing())
+
+
+def checkouts() -> float:
+    return registry.get_sample_value("db_pool_checkout_duration_seconds_count") or 0
+
+
+async def run_lazy_sessions():
+    url = await create_scratch_database("samanid_pool_test")
+    database.init_engine(url, [])
+    try:
+        pool = database.engine.pool
+        assert isinstance(pool, database.TimedQueuePool)
+        before = checkouts()
+
+        # a request that never queries never takes a connection
+        async for session in database.get_session():
+            assert pool.checkedout() == 0
+            await session.execute(text("SELECT 1"))
+            assert pool.checkedout() == 1
+        assert pool.checkedout() == 0
+
+        async with database.read_session() as session:
+            assert pool.checkedout() == 0
+            await session.execute(text("SELECT 1"))
+
+        assert checkouts() == before + 2
+    finally:
+        await database.dispose_engine()
+
+
+def test_sessions_connect_lazily():
+    asyncio.run(run_lazy_sessions())
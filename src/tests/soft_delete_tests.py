@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import func, select as sa_select
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+
+from src.tests.conf_tests import bench_client, create_user
+
+from src.db import database, models
+from src.db.archive import Archiver
+from src.db.soft_delete import include_deleted
+
+
+def tour(code: str, **fields) -> models.Tour:
+    return models.Tour(
+        code=code,
+        from_destination="Bukhara",
+        to_destination="Khiva",
+        price=Decimal("10.00"),
+        is_active=True,
+        number_of_destinations=2,
+        tour_highlights="",
+        description="",
+        **fields,
+    )
+
+
+async def count(table) -> int:
+    async with database.async_session_maker() as session:
+        return (
+            await session.execute(sa_select(func.count()).select_from(table))
+        ).scalar_one()
+
+
+async def run_soft_delete():
+    async with bench_client() as (client, _):
+        user_id, _ = await create_user("reader@example.com")
+        _, admin_headers = await create_user("admin@example.com", role="admin")
+        long_ago = datetime.now(timezone.utc) - timedelta(days=90)
+
+        async with database.async_session_maker() as session:
+            kept, deleted, paid = tour("KEPT"), tour("GONE"), tour("PAID")
+            session.add_all([kept, deleted, paid])
+            session.add_all(
+                [
+                    models.Comment(user_id=user_id, message="live"),
+                    models.Comment(user_id=user_id, message="old", deleted_at=long_ago),
+                ]
+            )
+            await session.flush()
+            session.add(models.Payment(user_id=user_id, tour_id=paid.id, amount=1))
+            await session.commit()
+            kept_id, deleted_id, paid_id = kept.id, deleted.id, paid.id
+
+        response = await client.delete(f"/api/tours/{deleted_id}", headers=admin_headers)
+        assert response.status_code == 204
+
+        # every read path leaves the deleted tour out without asking for it
+        assert (await client.get(f"/api/tours/{deleted_id}")).status_code == 404
+        listed = [t["id"] for t in (await client.get("/api/tours")).json()["results"]]
+        assert deleted_id not in listed and kept_id in listed
+
+        async with database.async_session_maker() as session:
+            user = (
+                await session.exec(
+                    select(models.User)
+                    .options(selectinload(models.User.comments))
+                    .where(models.User.id == user_id)
+                )
+            ).one()
+            assert [c.message for c in user.comments] == ["live"]
+
+            everything = (await session.exec(include_deleted(select(models.Tour)))).all()
+            assert {t.id for t in everything} == {kept_id, deleted_id, paid_id}
+
+            for tour_id in (deleted_id, paid_id):
+                row = await session.get(
+                    models.Tour, tour_id, execution_options={"include_deleted": True}
+                )
+                row.deleted_at = long_ago
+            await session.commit()
+
+        moved = await Archiver(after_days=30, batch_size=1, interval=0).run_once()
+        # the paid tour is still referenced by its payment and stays put
+        assert moved == {"comments": 1, "tours": 1, "users": 0, "roles": 0}
+        assert await count(models.ARCHIVE_TABLES["tours"]) == 1
+        assert await count(models.Tour.__table__) == 2
+        assert await count(models.Comment.__table__) == 1
+
+
+def test_soft_delete():
+    asyncio.run(run_soft_delete())
@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from src.tests import conf_tests  # noqa: F401  stand-in env the probes inherit
+
+ROOT = Path(__file__).resolve().parents[2]
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines" / "startup.json"
+
+TARGETS = {
+    "web": "src.db.main",
+    "celery": "src.celery_tasks",
+}
+
+# none of these should be paid for by a web worker before its first request
+LAZY_MODULES = ["celery", "passlib", "fastapi_mail", "aiosmtplib"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def cold_import(module: str) -> dict:
+    # fresh interpreter each run so nothing is already imported
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(runs: int = 5) -> dict:
+    report = {}
+
+    for name, module in TARGETS.items():
+        samples = [cold_import(module)["seconds"] * 1000 for _ in range(runs)]
+        report[name] = {
+            "module": module,
+            "runs": runs,
+            "median_ms": round(statistics.median(samples), 1),
+            "min_ms": round(min(samples), 1),
+            "max_ms": round(max(samples), 1),
+        }
+
+    return {"python": sys.version.split()[0], "startup": report}
+
+
+def test_web_startup_skips_heavy_modules():
+    loaded = set(cold_import(TARGETS["web"])["modules"])
+
+    assert not loaded & set(LAZY_MODULES), loaded & set(LAZY_MODULES)
+
+
+def test_web_imports_without_settings():
+    # empty environment and no .env in the working directory: importing the
+    # app must not parse the settings, only the lifespan does
+    probe = (
+        "import src.db.main, src.celery_tasks\n"
+        "from src.config import get_settings\n"
+        "assert get_settings.cache_info().currsize == 0\n"
+    )
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            [sys.executable, "-c", probe],
+            cwd=cwd,
+            env={"PYTHONPATH": str(ROOT), "PYTHONDONTWRITEBYTECODE": "1"},
+            capture_output=True,
+            text=True,
+        )
+
+    assert result.returncode == 0, result.stderr
+
+
+def main():
+    parser = argparse.ArgumentParser(description="cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    report = measure(args.runs)
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        return
+
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())["startup"]
+        regressions = [
+            f"{name}: {stats['median_ms']}ms vs baseline "
+            f"{baseline[name]['median_ms']}ms"
+            for name, stats in report["startup"].items()
+            if name in baseline
+            and stats["median_ms"]
+            > baseline[name]["median_ms"] * (1 + args.tolerance)
+        ]
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import asyncio
+from contextlib import asynccontextmanager
+from decimal import Decimal
+
+from src.tests.conf_tests import bench_client, create_user, use_fake_redis
+
+from src.db import database, models
+from src.db import redis as redis_module
+from src.tours.cache import (
+    PRIMARY_KEY,
+    TourCache,
+    detail_key,
+    get_tour_cache,
+    list_key,
+)
+
+
+async def run_single_flight():
+    use_fake_redis()
+    cache = TourCache(ttl=60, l1_ttl=60, l1_maxsize=10, primary_ttl=5)
+    loads = 0
+
+    async def load():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.05)
+        return b"payload", ["tour:1"]
+
+    values = await asyncio.gather(
+        *(cache.get_or_load(detail_key(1), load) for _ in range(20))
+    )
+    assert values == [b"payload"] * 20
+    assert loads == 1
+
+    # a loader that fails reaches every waiter and is not cached
+    async def fail():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.05)
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(
+        *(cache.get_or_load(detail_key(2), fail) for _ in range(5)),
+        return_exceptions=True,
+    )
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert loads == 2
+    assert detail_key(2) not in cache._inflight
+
+
+def test_tour_cache_single_flight():
+    asyncio.run(run_single_flight())
+
+
+async def run_l1_expiry():
+    client = use_fake_redis()
+    cache = TourCache(ttl=60, l1_ttl=0.1, l1_maxsize=10, primary_ttl=5)
+
+    async def load():
+        return b"v1", ["tour:1"]
+
+    assert await cache.get_or_load(detail_key(1), load) == b"v1"
+
+    # redis changes behind the worker, l1 keeps serving until it expires
+    await client.set(detail_key(1), b"v2")
+    assert await cache.get_or_load(detail_key(1), load) == b"v1"
+    await asyncio.sleep(0.15)
+    assert await cache.get_or_load(detail_key(1), load) == b"v2"
+
+
+def test_tour_cache_l1_expires():
+    asyncio.run(run_l1_expiry())
+
+
+async def create_tours() -> list[int]:
+    async with database.async_session_maker() as session:
+        tours = [
+            models.Tour(
+                from_destination="Bukhara",
+                to_destination=destination,
+                price=Decimal("10.00"),
+                is_active=True,
+                number_of_destinations=2,
+                tour_highlights="",
+                description="",
+            )
+            for destination in ("Khiva", "Samarkand")
+        ]
+        session.add_all(tours)
+        await session.commit()
+        return [tour.id for tour in tours]
+
+
+async def cached_keys(client) -> set[str]:
+    keys = {key.decode() for key in await client.keys("tours:*")}
+    return keys - {PRIMARY_KEY}
+
+
+@asynccontextmanager
+async def record_reads():
+    # which database each cache fill was sent to
+    reads = []
+    read_session = database.read_session
+
+    @asynccontextmanager
+    async def recording(primary: bool = False):
+        reads.append("primary" if primary else "replica")
+        async with read_session(primary=primary) as session:
+            yield session
+
+    database.read_session = recording
+    try:
+        yield reads
+    finally:
+        database.read_session = read_session
+
+
+async def run_invalidation():
+    async with bench_client() as (client, _):
+        redis = redis_module.get_redis()
+        _, headers = await create_user("admin@example.com", role="admin")
+        first, second = await create_tours()
+
+        async with record_reads() as reads:
+            assert (await client.get("/api/tours")).status_code == 200
+            for tour_id in (first, second):
+                assert (await client.get(f"/api/tours/{tour_id}")).status_code == 200
+        assert reads == ["replica"] * 3
+
+        page = list_key(20, None)
+        assert await cached_keys(redis) == {
+            page,
+            detail_key(first),
+            detail_key(second),
+            "tours:tag:list",
+            f"tours:tag:tour:{first}",
+            f"tours:tag:tour:{second}",
+        }
+
+        # an explicit null on a required column is a 422, not a 500
+        response = await client.patch(
+            f"/api/tours/{first}", json={"from_destination": None}, headers=headers
+        )
+        assert response.status_code == 422
+        response = await client.patch(
+            f"/api/tours/{first}", json={"price": None}, headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()["price"] is None
+
+        # the patched tour's keys and the page showing it, nothing else
+        assert await cached_keys(redis) == {
+            detail_key(second),
+            "tours:tag:list",
+            f"tours:tag:tour:{second}",
+        }
+        assert get_tour_cache().l1.get(detail_key(first)) is None
+        assert get_tour_cache().l1.get(detail_key(second)) is not None
+
+        # right after a change every fill goes to the primary, until it expires
+        async with record_reads() as reads:
+            response = await client.get(f"/api/tours/{first}")
+            assert response.json()["price"] is None
+            assert await redis.ttl(PRIMARY_KEY) > 0
+            await redis.delete(PRIMARY_KEY)
+            assert (await client.get("/api/tours")).status_code == 200
+        assert reads == ["primary", "replica"]
+
+        response = await client.delete(f"/api/tours/{second}", headers=headers)
+        assert response.status_code == 204
+        assert await cached_keys(redis) == {
+            detail_key(first),
+            "tours:tag:list",
+            f"tours:tag:tour:{first}",
+        }
+        assert (await client.get(f"/api/tours/{second}")).status_code == 404
+
+
+def test_tour_cache_invalidation():
+    asyncio.run(run_invalidation())
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import delete, update
+
+from src.tests.conf_tests import bench_client
+
+from src.db import database, models
+from src.tours.index import TourIndex, tour_index
+from src.tours.schemas import TourModel
+
+
+def tour(tour_id: int, price: str | None, **fields) -> TourModel:
+    values = {
+        "from_destination": "Bukhara",
+        "to_destination": "Khiva",
+        "is_active": True,
+        "number_of_destinations": 2,
+        "tour_highlights": "",
+        "description": "",
+    }
+    values.update(fields)
+    return TourModel(
+        id=tour_id, price=Decimal(price) if price is not None else None, **values
+    )
+
+
+def ids(results) -> list[int]:
+    return [result.id for result in results]
+
+
+def test_tour_index_search():
+    index = TourIndex()
+    index.upsert(tour(1, "30.00", tour_highlights="Old city walls"))
+    index.upsert(tour(2, "10.00", description="desert camels"))
+    index.upsert(tour(3, None, to_destination="Samarkand", description="old mosques"))
+    index.upsert(tour(4, "20.00", from_destination="Tashkent"))
+    index.upsert(tour(5, "5.00", is_active=False))
+    index.upsert(tour(6, "15.00"), deleted=True)
+
+    # priced by price then unpriced, inactive and deleted left out
+    assert index.search() == (4, [index.tours[i] for i in (2, 4, 1, 3)])
+    assert ids(index.search(limit=2, offset=2)[1]) == [1, 3]
+
+    assert ids(index.search(q="OLD")[1]) == [1, 3]
+    assert ids(index.search(q="old walls")[1]) == [1]
+    assert index.search(q="nowhere") == (0, [])
+
+    _, results = index.search(min_price=Decimal("10"), max_price=Decimal("20"))
+    assert ids(results) == [2, 4]
+    assert ids(index.search(q="old", max_price=Decimal("100"))[1]) == [1]
+
+    assert ids(index.search(from_destination=" bukhara ")[1]) == [2, 1, 3]
+    assert ids(index.search(to_destination="samarkand")[1]) == [3]
+    _, results = index.search(from_destination="Bukhara", to_destination="Khiva")
+    assert ids(results) == [2, 1]
+
+    # an update moves the tour in every part of the index
+    index.upsert(tour(1, "1.00", tour_highlights="new"))
+    assert ids(index.search()[1]) == [1, 2, 4, 3]
+    assert ids(index.search(q="walls")[1]) == []
+
+    index.remove(2)
+    assert ids(index.search(q="desert")[1]) == []
+    assert len(index) == 3
+
+
+async def add_tour(code: str, updated_at: datetime) -> int:
+    async with database.async_session_maker() as session:
+        row = models.Tour(
+            code=code,
+            from_destination="Bukhara",
+            to_destination="Khiva",
+            price=Decimal("10.00"),
+            is_active=True,
+            number_of_destinations=2,
+            tour_highlights=code,
+            description="",
+            updated_at=updated_at,
+        )
+        session.add(row)
+        await session.commit()
+        return row.id
+
+
+async def execute(statement) -> None:
+    async with database.async_session_maker() as session:
+        await session.execute(statement)
+        await session.commit()
+
+
+async def run_tour_index_refresh():
+    async with bench_client():
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        first = await add_tour("first", now)
+        await tour_index.refresh(lookback=60)
+        assert first in tour_index.tours
+
+        # stamped before the last seen row, as a slow transaction would be
+        late = await add_tour("late", now - timedelta(seconds=30))
+        await tour_index.refresh()
+        assert late not in tour_index.tours
+        await tour_index.refresh(lookback=60)
+        assert late in tour_index.tours
+
+        # beyond the lookback, only the full reload finds it
+        stale = await add_tour("stale", now - timedelta(seconds=600))
+        await tour_index.refresh(lookback=60)
+        assert stale not in tour_index.tours
+        await tour_index.reload()
+        assert stale in tour_index.tours
+
+        await execute(
+            update(models.Tour)
+            .where(models.Tour.id == first)
+            .values(deleted_at=now, updated_at=now + timedelta(seconds=1))
+        )
+        await tour_index.refresh(lookback=60)
+        assert first not in tour_index.tours
+
+        # rows gone from the table leave with the next reload
+        await execute(delete(models.Tour).where(models.Tour.id == late))
+        await tour_index.reload()
+        assert sorted(tour_index.tours) == [stale]
+        assert ids(tour_index.search(q="stale")[1]) == [stale]
+        assert tour_index.search(q="late") == (0, [])
+
+
+def test_tour_index_refresh():
+    asyncio.run(run_tour_index_refresh())
@@ -0,0 +1,431 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import time
+from typing import Any, AsyncIterator
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.config import Config
+from src.db import database
+from src.db.models import Tour
+from src.db.pagination import stream_rows
+from src.errors import InvalidImportEncoding
+
+from .cache import LIST_TAG, get_tour_cache, tour_tag
+from .schemas import TourImportReport, TourImportRow, TourModel
+
+IMPORT_COLUMNS = [
+    "code",
+    "from_destination",
+    "to_destination",
+    "price",
+    "is_active",
+    "number_of_destinations",
+    "tour_highlights",
+    "description",
+]
+EXPORT_COLUMNS = ["id", *IMPORT_COLUMNS, "created_at", "updated_at"]
+
+MAX_REPORTED_ERRORS = 100
+# sqlite caps bound parameters per statement
+FALLBACK_CHUNK_SIZE = 500
+# chunks buffered between COPY and a slow client
+EXPORT_QUEUE_SIZE = 16
+FILE_CHUNK_SIZE = 64 * 1024
+
+CREATE_IMPORT_TABLE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS tours_import (
+    code varchar,
+    from_destination varchar,
+    to_destination varchar,
+    price numeric(10, 2),
+    is_active boolean,
+    number_of_destinations integer,
+    tour_highlights varchar,
+    description text
+) ON COMMIT DELETE ROWS
+"""
+
+# rows whose values did not change are skipped, so re-sent feeds do not
+# bump updated_at or invalidate caches
+UPSERT_SQL = f"""
+INSERT INTO tours ({", ".join(IMPORT_COLUMNS)})
+SELECT {", ".join(IMPORT_COLUMNS)} FROM tours_import
+ON CONFLICT (code) DO UPDATE SET
+    {", ".join(f"{c} = EXCLUDED.{c}" for c in IMPORT_COLUMNS[1:])},
+    updated_at = NOW()
+WHERE ({", ".join(f"tours.{c}" for c in IMPORT_COLUMNS[1:])})
+    IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in IMPORT_COLUMNS[1:])})
+RETURNING id, (xmax = 0) AS inserted
+"""
+
+EXPORT_SQL = f"""
+SELECT {", ".join(EXPORT_COLUMNS)} FROM tours
+WHERE deleted_at IS NULL
+ORDER BY id
+"""
+
+row_adapter = TypeAdapter(list[TourImportRow])
+
+
+def decode_line(number: int, line: bytes) -> str:
+    try:
+        return line.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        raise InvalidImportEncoding(number) from None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, str]]:
+    buffer = b""
+    number = 0
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, decode_line(number, line)
+
+    if buffer.strip():
+        yield number + 1, decode_line(number + 1, buffer)
+
+
+async def iter_csv_records(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, Any]]:
+    header = None
+    pending: list[str] = []
+    start = 0
+
+    async for number, line in iter_lines(chunks):
+        if not pending:
+            start = number
+        pending.append(line)
+
+        # a quoted field may span lines, the record ends once quotes balance
+        record = "\n".join(pending)
+        if record.count('"') % 2:
+            continue
+        pending = []
+
+        if not record.strip():
+            continue
+
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        if len(values) != len(header):
+            yield start, ValueError(
+                f"expected {len(header)} fields, got {len(values)}"
+            )
+            continue
+
+        # empty cells fall back to the schema defaults
+        yield start, {
+            name: value for name, value in zip(header, values) if value != ""
+        }
+
+    if pending:
+        yield start, ValueError("unterminated quoted field")
+
+
+async def iter_ndjson_records(
+    chunks: AsyncIterator[bytes],
+) -> AsyncIterator[tuple[int, Any]]:
+    async for number, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+
+async def iter_batches(
+    chunks: AsyncIterator[bytes], fmt: str, batch_size: int
+) -> AsyncIterator[list[tuple[int, Any]]]:
+    records = iter_csv_records(chunks) if fmt == "csv" else iter_ndjson_records(chunks)
+    batch = []
+
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def validate_batch(
+    batch: list[tuple[int, Any]],
+) -> tuple[list[TourImportRow], list[dict]]:
+    errors = [
+        {"line": line, "error": str(raw)}
+        for line, raw in batch
+        if isinstance(raw, Exception)
+    ]
+    parsed = [(line, raw) for line, raw in batch if not isinstance(raw, Exception)]
+
+    # one pydantic call for the whole batch, per row only when it fails
+    try:
+        rows = row_adapter.validate_python([raw for _, raw in parsed])
+    except ValidationError as e:
+        failed: dict[int, str] = {}
+        for error in e.errors():
+            index, *field = error["loc"]
+            failed.setdefault(index, f"{'.'.join(map(str, field))}: {error['msg']}")
+
+        rows = []
+        for index, (line, raw) in enumerate(parsed):
+            if index in failed:
+                errors.append({"line": line, "error": failed[index]})
+            else:
+                rows.append(TourImportRow.model_validate(raw))
+
+    errors.sort(key=lambda error: error["line"])
+
+    # ON CONFLICT cannot touch one row twice per statement, last one wins
+    return list({row.code: row for row in rows}.values()), errors
+
+
+class CopyWriter:
+    # postgres: COPY the batch into a temp table, then one upsert statement
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def prepare(self) -> None:
+        await self.conn.execute(CREATE_IMPORT_TABLE_SQL)
+
+    async def write(self, rows: list[TourImportRow]) -> tuple[int, list[int]]:
+        records = [tuple(getattr(row, c) for c in IMPORT_COLUMNS) for row in rows]
+
+        async with self.conn.transaction():
+            await self.conn.copy_records_to_table(
+                "tours_import", records=records, columns=IMPORT_COLUMNS
+            )
+            result = await self.conn.fetch(UPSERT_SQL)
+
+        inserted = sum(1 for row in result if row["inserted"])
+        updated_ids = [row["id"] for row in result if not row["inserted"]]
+
+        return inserted, updated_ids
+
+
+class InsertWriter:
+    # fallback for other drivers: executemany batches of one upsert statement
+
+    def __init__(self, conn: AsyncConnection):
+        self.conn = conn
+
+        table = Tour.__table__
+        statement = database.dialect_insert(conn.dialect)(table)
+        # built once so it is compiled once, not per batch
+        self.statement = statement.on_conflict_do_update(
+            index_elements=[table.c.code],
+            set_={
+                **{c: statement.excluded[c] for c in IMPORT_COLUMNS[1:]},
+                "updated_at": func.now(),
+            },
+            where=or_(
+                *(
+                    table.c[c].is_distinct_from(statement.excluded[c])
+                    for c in IMPORT_COLUMNS[1:]
+                )
+            ),
+        ).returning(table.c.id, table.c.code)
+
+    async def prepare(self) -> None:
+        pass
+
+    async def write(self, rows: list[TourImportRow]) -> tuple[int, list[int]]:
+        inserted = 0
+        updated_ids = []
+
+        async with self.conn.begin():
+            for start in range(0, len(rows), FALLBACK_CHUNK_SIZE):
+                chunk = rows[start : start + FALLBACK_CHUNK_SIZE]
+                existing = set(
+                    (
+                        await self.conn.execute(
+                            select(Tour.code).where(
+                                Tour.code.in_([row.code for row in chunk])
+                            )
+                        )
+                    ).scalars()
+                )
+
+                result = await self.conn.execute(
+                    self.statement, [row.model_dump() for row in chunk]
+                )
+                for tour_id, code in result:
+                    if code in existing:
+                        updated_ids.append(tour_id)
+                    else:
+                        inserted += 1
+
+        return inserted, updated_ids
+
+
+async def create_writer(conn: AsyncConnection):
+    if conn.dialect.driver == "asyncpg":
+        raw = await conn.get_raw_connection()
+        writer = CopyWriter(raw.driver_connection)
+    else:
+        writer = InsertWriter(conn)
+
+    await writer.prepare()
+    return writer
+
+
+async def import_tours(
+    chunks: AsyncIterator[bytes], fmt: str = "csv", batch_size: int | None = None
+) -> TourImportReport:
+    if database.engine is None:
+        database.init_engine()
+
+    rows = inserted = updated = invalid = 0
+    errors: list[dict] = []
+    start = time.perf_counter()
+
+    async with database.engine.connect() as conn:
+        writer = await create_writer(conn)
+
+        async for batch in iter_batches(
+            chunks, fmt, batch_size or Config.TOUR_IMPORT_BATCH_SIZE
+        ):
+            valid, batch_errors = validate_batch(batch)
+            rows += len(batch)
+            invalid += len(batch_errors)
+            errors.extend(batch_errors[: MAX_REPORTED_ERRORS - len(errors)])
+
+            if not valid:
+                continue
+
+            batch_inserted, updated_ids = await writer.write(valid)
+            inserted += batch_inserted
+            updated += len(updated_ids)
+
+            if batch_inserted or updated_ids:
+                await get_tour_cache().invalidate(
+                    LIST_TAG, *(tour_tag(tour_id) for tour_id in updated_ids)
+                )
+
+    seconds = time.perf_counter() - start
+
+    return TourImportReport(
+        rows=rows,
+        inserted=inserted,
+        updated=updated,
+        # duplicates within a batch and rows the upsert skipped
+        unchanged=rows - invalid - inserted - updated,
+        invalid=invalid,
+        errors=errors,
+        seconds=round(seconds, 3),
+        rows_per_second=round(rows / seconds, 1) if seconds else 0.0,
+    )
+
+
+async def copy_export(conn) -> AsyncIterator[bytes]:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=EXPORT_QUEUE_SIZE)
+
+    async def produce():
+        try:
+            await conn.copy_from_query(
+                EXPORT_SQL, output=queue.put, format="csv", header=True
+            )
+        finally:
+            await queue.put(None)
+
+    # COPY pushes into a bounded queue, so it waits for the consumer instead
+    # of buffering the table
+    task = asyncio.create_task(produce())
+    try:
+        while (chunk := await queue.get()) is not None:
+            yield chunk
+        await task
+    finally:
+        task.cancel()
+
+
+async def export_tours_csv() -> AsyncIterator[bytes]:
+    async with database.read_session() as session:
+        conn = await session.connection()
+
+        if conn.dialect.driver == "asyncpg":
+            raw = await conn.get_raw_connection()
+            async for chunk in copy_export(raw.driver_connection):
+                yield chunk
+            return
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(EXPORT_COLUMNS)
+
+        async for tour in stream_rows(session, Tour):
+            data = TourModel.model_validate(tour).model_dump(mode="json")
+            writer.writerow(
+                ["" if data[c] is None else data[c] for c in EXPORT_COLUMNS]
+            )
+            if buffer.tell() >= FILE_CHUNK_SIZE:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue().encode()
+
+
+async def file_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") if path != "-" else sys.stdin.buffer as f:
+        while chunk := f.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+async def main(args) -> int:
+    try:
+        if args.command == "import":
+            fmt = args.format or (
+                "ndjson" if args.path.endswith(".ndjson") else "csv"
+            )
+            try:
+                report = await import_tours(
+                    file_chunks(args.path), fmt, args.batch_size
+                )
+            except InvalidImportEncoding as e:
+                print(f"line {e.line} is not valid utf-8", file=sys.stderr)
+                return 1
+            print(report.model_dump_json(indent=2))
+            return 1 if report.invalid else 0
+
+        with open(args.path, "wb") if args.path != "-" else sys.stdout.buffer as out:
+            async for chunk in export_tours_csv():
+                out.write(chunk)
+        return 0
+    finally:
+        await database.dispose_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bulk tour import/export")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import")
+    import_parser.add_argument("path", help="csv or ndjson file, - for stdin")
+    import_parser.add_argument("--format", choices=["csv", "ndjson"])
+    import_parser.add_argument("--batch-size", type=int)
+
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument(
+        "path", nargs="?", default="-", help="csv output file, - for stdout"
+    )
+
+    sys.exit(asyncio.run(main(parser.parse_args())))
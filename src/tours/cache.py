@@ -0,0 +1,134 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from src.cache import TTLCache
+from src.config import Config
+from src.db import redis as redis_module
+from src.metrics import REDIS_COMMAND_SECONDS, timed
+
+KEY_PREFIX = "tours:"
+
+
+def detail_key(tour_id: int) -> str:
+    return f"{KEY_PREFIX}detail:{tour_id}"
+
+
+def list_key(limit: int, cursor: str | None) -> str:
+    return f"{KEY_PREFIX}list:{limit}:{cursor or ''}"
+
+
+def tour_tag(tour_id: int) -> str:
+    return f"tour:{tour_id}"
+
+
+LIST_TAG = "list"
+# set on every invalidation, fills read the primary while it lives
+PRIMARY_KEY = f"{KEY_PREFIX}primary"
+
+
+class TourCache:
+    # read-through cache for serialized tour payloads.
+    # L1 is a short lived per worker dict, L2 is redis. every redis key is
+    # recorded in one set per tag so a tour change deletes exactly its keys.
+
+    def __init__(self, ttl: int, l1_ttl: int, l1_maxsize: int, primary_ttl: int):
+        self.ttl = ttl
+        self.l1_ttl = l1_ttl
+        self.primary_ttl = primary_ttl
+        self.l1 = TTLCache(maxsize=l1_maxsize)
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def tag_key(tag: str) -> str:
+        return f"{KEY_PREFIX}tag:{tag}"
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[tuple[bytes, list[str]] | None]]
+    ) -> bytes | None:
+        # loader returns the serialized payload and the tags it depends on
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+
+        with timed(REDIS_COMMAND_SECONDS, command="tour_cache_get"):
+            value = await redis_module.get_redis().get(key)
+        if value is not None:
+            self.l1.set(key, value, time.time() + self.l1_ttl)
+            return value
+
+        # single flight, concurrent misses wait on the first loader
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        # mark the result retrieved when nobody else was waiting on it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            loaded = await loader()
+            value = None
+            if loaded is not None:
+                value, tags = loaded
+                await self.store(key, value, tags)
+            future.set_result(value)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        return value
+
+    async def store(self, key: str, value: bytes, tags: list[str]) -> None:
+        pipe = redis_module.get_redis().pipeline(transaction=False)
+        pipe.set(key, value, ex=self.ttl)
+        for tag in tags:
+            pipe.sadd(self.tag_key(tag), key)
+            pipe.expire(self.tag_key(tag), self.ttl)
+        with timed(REDIS_COMMAND_SECONDS, command="tour_cache_store"):
+            await pipe.execute()
+
+        self.l1.set(key, value, time.time() + self.l1_ttl)
+
+    async def needs_primary(self) -> bool:
+        # a change was just invalidated, the replicas may not have it yet and
+        # a fill from one would cache the old row for the whole ttl
+        with timed(REDIS_COMMAND_SECONDS, command="tour_cache_primary"):
+            return bool(await redis_module.get_redis().exists(PRIMARY_KEY))
+
+    async def invalidate(self, *tags: str) -> None:
+        tag_keys = [self.tag_key(tag) for tag in tags]
+        client = redis_module.get_redis()
+
+        with timed(REDIS_COMMAND_SECONDS, command="tour_cache_invalidate"):
+            # in redis rather than a per worker pin, every worker's fills
+            # have to move to the primary. set before the keys go
+            await client.set(PRIMARY_KEY, 1, ex=self.primary_ttl)
+            members = await client.sunion(tag_keys) if tag_keys else set()
+            keys = [key.decode() if isinstance(key, bytes) else key for key in members]
+
+            if keys or tag_keys:
+                await client.delete(*keys, *tag_keys)
+
+        # other workers drop their copy when the l1 ttl runs out
+        for key in keys:
+            self.l1.pop(key)
+
+
+_tour_cache = None
+
+
+def get_tour_cache() -> TourCache:
+    global _tour_cache
+
+    if _tour_cache is None:
+        _tour_cache = TourCache(
+            ttl=Config.TOUR_CACHE_TTL_SECONDS,
+            l1_ttl=Config.TOUR_CACHE_L1_TTL_SECONDS,
+            l1_maxsize=Config.TOUR_CACHE_L1_SIZE,
+            primary_ttl=Config.DB_PRIMARY_PIN_SECONDS,
+        )
+
+    return _tour_cache
@@ -0,0 +1,268 @@
+import asyncio
+import bisect
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from src.db import database
+
+from .schemas import TourModel
+from .service import TourService
+
+TOKEN_RE = re.compile(r"\w+")
+
+tour_service = TourService()
+
+
+def tokenize(text: str | None) -> set[str]:
+    if not text:
+        return set()
+
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+def normalize_destination(destination: str | None) -> str:
+    return (destination or "").strip().lower()
+
+
+class TourIndex:
+    # in-memory search index over active, non deleted tours
+
+    def __init__(self):
+        self.tours: dict[int, TourModel] = {}
+        self.tokens: dict[str, set[int]] = defaultdict(set)
+        self.prices: list[tuple[Decimal, int]] = []
+        self.unpriced: set[int] = set()
+        self.routes: dict[tuple[str, str], set[int]] = defaultdict(set)
+        self.from_destinations: dict[str, set[int]] = defaultdict(set)
+        self.to_destinations: dict[str, set[int]] = defaultdict(set)
+        self.last_updated_at: datetime | None = None
+        self._tokens_by_tour: dict[int, set[str]] = {}
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self.tours)
+
+    def upsert(self, tour: TourModel, deleted: bool = False) -> None:
+        self.remove(tour.id)
+
+        if deleted or not tour.is_active:
+            return
+
+        self.tours[tour.id] = tour
+
+        tokens = (
+            tokenize(tour.tour_highlights)
+            | tokenize(tour.description)
+            | tokenize(tour.from_destination)
+            | tokenize(tour.to_destination)
+        )
+        self._tokens_by_tour[tour.id] = tokens
+        for token in tokens:
+            self.tokens[token].add(tour.id)
+
+        if tour.price is not None:
+            bisect.insort(self.prices, (tour.price, tour.id))
+        else:
+            self.unpriced.add(tour.id)
+
+        origin = normalize_destination(tour.from_destination)
+        destination = normalize_destination(tour.to_destination)
+        self.routes[(origin, destination)].add(tour.id)
+        self.from_destinations[origin].add(tour.id)
+        self.to_destinations[destination].add(tour.id)
+
+    def remove(self, tour_id: int) -> None:
+        tour = self.tours.pop(tour_id, None)
+
+        if tour is None:
+            return
+
+        for token in self._tokens_by_tour.pop(tour_id, set()):
+            self._discard(self.tokens, token, tour_id)
+
+        if tour.price is not None:
+            position = bisect.bisect_left(self.prices, (tour.price, tour_id))
+            if position < len(self.prices) and self.prices[position][1] == tour_id:
+                del self.prices[position]
+        else:
+            self.unpriced.discard(tour_id)
+
+        origin = normalize_destination(tour.from_destination)
+        destination = normalize_destination(tour.to_destination)
+        self._discard(self.routes, (origin, destination), tour_id)
+        self._discard(self.from_destinations, origin, tour_id)
+        self._discard(self.to_destinations, destination, tour_id)
+
+    @staticmethod
+    def _discard(index: dict, key, tour_id: int) -> None:
+        ids = index.get(key)
+
+        if ids is None:
+            return
+
+        ids.discard(tour_id)
+        if not ids:
+            del index[key]
+
+    def _price_range(self, min_price: Decimal | None, max_price: Decimal | None):
+        start = 0
+        end = len(self.prices)
+
+        if min_price is not None:
+            start = bisect.bisect_left(self.prices, (min_price, -1))
+        if max_price is not None:
+            end = bisect.bisect_right(self.prices, (max_price, float("inf")))
+
+        return self.prices[start:end]
+
+    def search(
+        self,
+        q: str | None = None,
+        min_price: Decimal | None = None,
+        max_price: Decimal | None = None,
+        from_destination: str | None = None,
+        to_destination: str | None = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> tuple[int, list[TourModel]]:
+        candidates: list[set[int]] = []
+
+        for token in tokenize(q):
+            candidates.append(self.tokens.get(token, set()))
+
+        origin = normalize_destination(from_destination)
+        destination = normalize_destination(to_destination)
+        if origin and destination:
+            candidates.append(self.routes.get((origin, destination), set()))
+        elif origin:
+            candidates.append(self.from_destinations.get(origin, set()))
+        elif destination:
+            candidates.append(self.to_destinations.get(destination, set()))
+
+        price_filtered = min_price is not None or max_price is not None
+
+        if candidates:
+            # intersect starting from the smallest set
+            candidates.sort(key=len)
+            ids = set(candidates[0])
+            for other in candidates[1:]:
+                ids &= other
+                if not ids:
+                    break
+
+            matches = [self.tours[tour_id] for tour_id in ids]
+            if price_filtered:
+                matches = [
+                    tour
+                    for tour in matches
+                    if tour.price is not None
+                    and (min_price is None or tour.price >= min_price)
+                    and (max_price is None or tour.price <= max_price)
+                ]
+            matches.sort(key=lambda tour: (tour.price is None, tour.price or 0, tour.id))
+
+            return len(matches), matches[offset : offset + limit]
+
+        if price_filtered:
+            ordered = self._price_range(min_price, max_price)
+        else:
+            ordered = self.prices
+
+        # price slice is already ordered, only the requested page is built
+        page = [self.tours[tour_id] for _, tour_id in ordered[offset : offset + limit]]
+        total = len(ordered)
+
+        if not price_filtered and self.unpriced:
+            # tours without a price sort after every priced one
+            unpriced = sorted(self.unpriced)
+            start = max(offset - len(ordered), 0)
+            page += [
+                self.tours[tour_id]
+                for tour_id in unpriced[start : start + limit - len(page)]
+            ]
+            total += len(unpriced)
+
+        return total, page
+
+    def apply(self, rows) -> None:
+        for row in rows:
+            self.upsert(TourModel.model_validate(row), deleted=row.deleted_at is not None)
+
+            if row.updated_at is not None and (
+                self.last_updated_at is None or row.updated_at > self.last_updated_at
+            ):
+                self.last_updated_at = row.updated_at
+
+    def clear(self) -> None:
+        self.tours.clear()
+        self.tokens.clear()
+        self.prices.clear()
+        self.unpriced.clear()
+        self.routes.clear()
+        self.from_destinations.clear()
+        self.to_destinations.clear()
+        self.last_updated_at = None
+        self._tokens_by_tour.clear()
+
+    async def _load(self, since: datetime | None):
+        if database.async_session_maker is None:
+            database.init_engine()
+
+        async with database.async_session_maker() as session:
+            return await tour_service.get_tours_updated_since(since, session)
+
+    async def refresh(self, lookback: float = 0) -> None:
+        # updated_at is stamped when the writing transaction starts, so a slow
+        # one commits behind rows already seen, reach back to pick it up
+        since = self.last_updated_at
+        if since is not None:
+            since -= timedelta(seconds=lookback)
+
+        self.apply(await self._load(since))
+
+    async def reload(self) -> None:
+        # full rebuild for whatever still fell outside the lookback
+        rows = await self._load(None)
+
+        # no await between clear and apply, searches never see a partial index
+        self.clear()
+        self.apply(rows)
+
+    async def _refresh_forever(
+        self, interval: int, lookback: float, reload_interval: int
+    ) -> None:
+        next_reload = time.monotonic() + reload_interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if reload_interval and time.monotonic() >= next_reload:
+                    await self.reload()
+                    next_reload = time.monotonic() + reload_interval
+                else:
+                    await self.refresh(lookback)
+            except Exception as e:
+                logging.warning("tour index refresh failed: %s", e)
+
+    def start(
+        self, interval: int, lookback: float = 0, reload_interval: int = 0
+    ) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(
+                self._refresh_forever(interval, lookback, reload_interval)
+            )
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+tour_index = TourIndex()
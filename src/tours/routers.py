@@ -0,0 +1,166 @@
+from decimal import Decimal
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.auth.dependencies import RoleChecker
+from src.db import database
+from src.db.database import get_session
+from src.errors import TourNotFound
+
+from . import bulk
+from .cache import LIST_TAG, detail_key, get_tour_cache, list_key, tour_tag
+from .index import tour_index
+from .schemas import (
+    TourListResponse,
+    TourImportReport,
+    TourModel,
+    TourSearchResponse,
+    TourUpdateModel,
+)
+from .service import TourService
+
+router = APIRouter(prefix="/api/tours", tags=["Tours"])
+tour_service = TourService()
+admin_checker = RoleChecker(["admin"])
+
+
+@router.get("", response_model=TourListResponse)
+async def list_tours(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+):
+    # cache fills read a replica, or the primary shortly after a change
+    async def load():
+        primary = await get_tour_cache().needs_primary()
+        async with database.read_session(primary=primary) as session:
+            tours, next_cursor = await tour_service.get_tours_page(
+                limit, cursor, session
+            )
+        page = TourListResponse(
+            results=[TourModel.model_validate(tour) for tour in tours],
+            next_cursor=next_cursor,
+        )
+        return page.model_dump_json().encode(), [
+            LIST_TAG,
+            *(tour_tag(tour.id) for tour in tours),
+        ]
+
+    body = await get_tour_cache().get_or_load(list_key(limit, cursor), load)
+
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/export")
+async def export_tours(format: Literal["ndjson", "csv"] = "ndjson"):
+    if format == "csv":
+        return StreamingResponse(bulk.export_tours_csv(), media_type="text/csv")
+
+    async def rows():
+        # own session, the response outlives the request dependencies
+        async with database.read_session() as session:
+            async for tour in tour_service.stream_tours(session):
+                yield TourModel.model_validate(tour).model_dump_json() + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+@router.post("/import", response_model=TourImportReport)
+async def import_tours(
+    request: Request,
+    format: Literal["csv", "ndjson"] = "csv",
+    _: bool = Depends(admin_checker),
+):
+    # the body is parsed as it arrives, a large feed is never held in memory
+    return await bulk.import_tours(request.stream(), format)
+
+
+@router.get("/search", response_model=TourSearchResponse)
+async def search_tours(
+    q: str | None = None,
+    min_price: Decimal | None = Query(default=None, ge=0),
+    max_price: Decimal | None = Query(default=None, ge=0),
+    from_destination: str | None = None,
+    to_destination: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+):
+    total, results = tour_index.search(
+        q=q,
+        min_price=min_price,
+        max_price=max_price,
+        from_destination=from_destination,
+        to_destination=to_destination,
+        limit=limit,
+        offset=offset,
+    )
+
+    return {"total": total, "results": results}
+
+
+@router.get("/{tour_id}", response_model=TourModel)
+async def get_tour(tour_id: int):
+    async def load():
+        primary = await get_tour_cache().needs_primary()
+        async with database.read_session(primary=primary) as session:
+            tour = await tour_service.get_tour(tour_id, session)
+        if tour is None:
+            return None
+        return TourModel.model_validate(tour).model_dump_json().encode(), [
+            tour_tag(tour_id)
+        ]
+
+    body = await get_tour_cache().get_or_load(detail_key(tour_id), load)
+
+    if body is None:
+        raise TourNotFound()
+
+    return Response(content=body, media_type="application/json")
+
+
+@router.patch("/{tour_id}", response_model=TourModel)
+async def update_tour(
+    tour_id: int,
+    tour_data: TourUpdateModel,
+    session: AsyncSession = Depends(get_session),
+    _: bool = Depends(admin_checker),
+):
+    tour = await tour_service.get_tour(tour_id, session)
+
+    if tour is None:
+        raise TourNotFound()
+
+    changes = tour_data.model_dump(exclude_unset=True)
+    tour = await tour_service.update_tour(tour, changes, session)
+
+    tags = [tour_tag(tour_id)]
+    if "is_active" in changes:
+        # the tour joins or leaves listing pages it is not tagged on yet
+        tags.append(LIST_TAG)
+    await get_tour_cache().invalidate(*tags)
+
+    updated = TourModel.model_validate(tour)
+    tour_index.upsert(updated)
+
+    return updated
+
+
+@router.delete("/{tour_id}", status_code=204)
+async def delete_tour(
+    tour_id: int,
+    session: AsyncSession = Depends(get_session),
+    _: bool = Depends(admin_checker),
+):
+    tour = await tour_service.get_tour(tour_id, session)
+
+    if tour is None:
+        raise TourNotFound()
+
+    await tour_service.delete_tour(tour, session)
+
+    await get_tour_cache().invalidate(tour_tag(tour_id))
+    tour_index.remove(tour_id)
+
+    return Response(status_code=204)
@@ -0,0 +1,84 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+from pydantic import BaseModel, Field, field_validator
+
+
+class TourModel(BaseModel):
+    id: int
+    code: str | None = None
+    from_destination: str
+    to_destination: str
+    price: Decimal | None = None
+    is_active: bool
+    number_of_destinations: int
+    tour_highlights: str
+    description: str
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class TourSearchResponse(BaseModel):
+    total: int
+    results: List[TourModel]
+
+
+class TourListResponse(BaseModel):
+    results: List[TourModel]
+    next_cursor: str | None = None
+
+
+class TourImportRow(BaseModel):
+    code: str = Field(min_length=1, max_length=64)
+    from_destination: str = Field(min_length=1)
+    to_destination: str = Field(min_length=1)
+    price: Decimal | None = Field(default=None, ge=0, max_digits=10, decimal_places=2)
+    is_active: bool = False
+    number_of_destinations: int = Field(ge=0)
+    tour_highlights: str = ""
+    description: str = ""
+
+
+class TourImportError(BaseModel):
+    line: int
+    error: str
+
+
+class TourImportReport(BaseModel):
+    rows: int
+    inserted: int
+    updated: int
+    unchanged: int
+    invalid: int
+    errors: List[TourImportError]
+    seconds: float
+    rows_per_second: float
+
+
+class TourUpdateModel(BaseModel):
+    # omitted fields are left as they are, only price may be set to null
+    from_destination: str | None = None
+    to_destination: str | None = None
+    price: Decimal | None = Field(default=None, ge=0, max_digits=10, decimal_places=2)
+    is_active: bool | None = None
+    number_of_destinations: int | None = Field(default=None, ge=0)
+    tour_highlights: str | None = None
+    description: str | None = None
+
+    @field_validator(
+        "from_destination",
+        "to_destination",
+        "is_active",
+        "number_of_destinations",
+        "tour_highlights",
+        "description",
+    )
+    @classmethod
+    def not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.models import Tour
+from src.db.pagination import paginate, stream_rows
+from src.db.soft_delete import include_deleted
+
+
+class TourService:
+    async def get_tour(self, tour_id: int, session: AsyncSession):
+        statement = select(Tour).where(Tour.id == tour_id)
+        result = await session.exec(statement)
+
+        return result.first()
+
+    async def update_tour(self, tour: Tour, tour_data: dict, session: AsyncSession):
+        for k, v in tour_data.items():
+            setattr(tour, k, v)
+
+        await session.commit()
+        await session.refresh(tour)
+
+        return tour
+
+    async def delete_tour(self, tour: Tour, session: AsyncSession):
+        now = datetime.now(timezone.utc)
+        tour.deleted_at = now
+        tour.updated_at = now
+
+        await session.commit()
+
+        return tour
+
+    async def get_tours_updated_since(
+        self, since: datetime | None, session: AsyncSession
+    ):
+        # deleted tours too, the search index has to drop them
+        statement = include_deleted(select(Tour).order_by(Tour.updated_at))
+
+        if since is not None:
+            # >= so rows sharing the last seen timestamp are not skipped
+            statement = statement.where(Tour.updated_at >= since)
+
+        result = await session.exec(statement)
+
+        return result.all()
+
+    async def get_tours_page(
+        self, limit: int, cursor: str | None, session: AsyncSession
+    ):
+        statement = select(Tour).where(Tour.is_active.is_(True))
+
+        return await paginate(session, Tour, statement, limit=limit, cursor=cursor)
+
+    def stream_tours(self, session: AsyncSession):
+        return stream_rows(session, Tour)